@@ -0,0 +1,113 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from func_utils import describe_error
+from pipeline import translate_block
+
+# asyncio front-end. Parsing and translation are CPU bound, so they run in a
+# pool of worker processes and the event loop only awaits their results.
+#
+#   async with AsyncTranslator(workers=4) as translator:
+#     print(await translator.translate("b = a + 3;"))
+#     async for index, translation, error in translator.translate_many(sources):
+#       ...
+#
+# At most max_pending translations are submitted to the pool at a time, the
+# others wait (translate) or are not even taken from the input yet
+# (translate_many), so memory stays bounded however many sources are pushed.
+# Cancelling a translation that has not started removes it from the pool, a
+# translation already running in a worker is left to finish and discarded.
+
+
+def _translate_file(filepath, simplify):
+  with open(filepath, 'r') as fin:
+    return translate_block(fin.read(), simplify, filepath)
+
+
+class AsyncTranslator(object):
+  def __init__(self, workers=None, max_pending=None):
+    self.workers = workers or os.cpu_count() or 1
+    # Twice the number of workers keeps every worker busy while the next
+    # translation is being handed over.
+    self.max_pending = max_pending or 2 * self.workers
+    self.executor = None
+    self.semaphore = None
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *exc):
+    self.close()
+
+  def close(self):
+    if self.executor is not None:
+      self.executor.shutdown(wait=False, cancel_futures=True)
+      self.executor = None
+
+  async def _run(self, function, *args):
+    # The pool and the semaphore are created lazily, inside the running loop.
+    if self.executor is None:
+      self.executor = ProcessPoolExecutor(self.workers)
+    if self.semaphore is None:
+      self.semaphore = asyncio.Semaphore(self.max_pending)
+    async with self.semaphore:
+      return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+  async def translate(self, source, simplify=True, filepath=''):
+    """ Translate a code block. Errors are raised as in translate_block. """
+    return await self._run(translate_block, source, simplify, filepath)
+
+  async def translate_file(self, filepath, simplify=True):
+    """ Translate the code block in filepath, read by the worker process. """
+    return await self._run(_translate_file, filepath, simplify)
+
+  async def _job(self, index, source, simplify):
+    try:
+      return (index, await self.translate(source, simplify), None)
+    except asyncio.CancelledError:
+      raise
+    except Exception as e:
+      return (index, None, describe_error(e))
+
+  async def translate_many(self, sources, simplify=True):
+    """ Translate the code blocks of sources (an iterable or an async
+        iterable) and yield (index, translation, error) as the
+        translations complete. Sources are only taken from the input when
+        there is room in the pool; leaving the loop early cancels the
+        translations still pending.
+    """
+    pending = set()
+    try:
+      index = 0
+      async for source in _aiter(sources):
+        if len(pending) >= self.max_pending:
+          done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+          for task in done:
+            yield task.result()
+        pending.add(asyncio.ensure_future(self._job(index, source, simplify)))
+        index += 1
+      while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+          yield task.result()
+    finally:
+      for task in pending:
+        task.cancel()
+
+
+async def _aiter(iterable):
+  if hasattr(iterable, '__aiter__'):
+    async for item in iterable:
+      yield item
+  else:
+    for item in iterable:
+      yield item
+
+
+async def translate(source, simplify=True, translator=None):
+  """ Translate one code block with translator, or with a pool of its own. """
+  if translator is not None:
+    return await translator.translate(source, simplify)
+  async with AsyncTranslator(workers=1) as translator:
+    return await translator.translate(source, simplify)
@@ -0,0 +1,212 @@
+import time
+
+from func_utils import describe_error
+from pipeline import STAGES, translate_block
+
+# Batch translation of code block files in worker processes with per-input
+# limits. Each input gets at most `timeout` seconds of wall-clock time and
+# each worker at most `memory_limit` bytes of memory on top of what it uses
+# when it starts. An input that goes over its time limit (or crashes its
+# worker) gets its worker killed and replaced, and is reported with the stage
+# it was in; the other inputs of the batch are not affected.
+#
+# The code blocks of a corpus file (see corpus.py) are handed out as their
+# number in the corpus: each worker maps the file and reads them from it, so
+# they are not sent through the pipes.
+
+# Stage names, indexed by the value the workers share with the batch runner.
+_STAGES = ("read",) + STAGES
+
+
+def _limit_memory(memory_limit):
+  import resource
+  try:
+    with open('/proc/self/statm') as fin:
+      current = int(fin.read().split()[0]) * resource.getpagesize()
+  except (IOError, ValueError):
+    current = 0
+  soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+  limit = current + memory_limit
+  if hard != resource.RLIM_INFINITY:
+    limit = min(limit, hard)
+  resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+# A job is (index, filepath, None) for a file, and (index, corpus path, block
+# number) for a block of a corpus, whose source is not sent back.
+def _work(conn, stage, simplify, memory_limit, options):
+  if memory_limit:
+    _limit_memory(memory_limit)
+
+  def set_stage(name):
+    stage.value = _STAGES.index(name)
+
+  # corpus path -> Corpus
+  corpora = {}
+  while True:
+    job = conn.recv()
+    if job is None:
+      break
+    index, filepath, block = job
+    set_stage("read")
+    source, translation, error = None, None, None
+    start = time.perf_counter()
+    try:
+      if block is None:
+        with open(filepath, 'r') as fin:
+          source = fin.read()
+        name = filepath
+      else:
+        if not filepath in corpora:
+          from corpus import Corpus
+          corpora[filepath] = Corpus(filepath)
+        name, source = corpora[filepath].name(block), corpora[filepath].source(block)
+      start = time.perf_counter()
+      translation = translate_block(source, simplify, name, set_stage, **options)
+    except MemoryError:
+      error = "MemoryError: over the memory limit in stage {}".format(_STAGES[stage.value])
+    except Exception as e:
+      error = "{} (stage {})".format(describe_error(e), _STAGES[stage.value])
+    conn.send((index, source if block is None else None, translation, time.perf_counter() - start, error))
+  for corpus in corpora.values():
+    corpus.close()
+
+
+class _Worker(object):
+  def __init__(self, context, simplify, memory_limit, options):
+    self.conn, child_conn = context.Pipe()
+    self.stage = context.Value('i', 0, lock=False)
+    self.process = context.Process(target=_work, args=(child_conn, self.stage, simplify, memory_limit, options))
+    self.process.daemon = True
+    self.process.start()
+    child_conn.close()
+    # (index, filepath, block, start time) of the input being translated
+    self.job = None
+
+  def stage_name(self):
+    return _STAGES[self.stage.value]
+
+  def kill(self):
+    self.process.kill()
+    self.process.join()
+    self.conn.close()
+
+  def stop(self):
+    try:
+      self.conn.send(None)
+    except (IOError, OSError):
+      pass
+    self.process.join()
+    self.conn.close()
+
+
+def _read(filepath):
+  try:
+    with open(filepath, 'r') as fin:
+      return fin.read()
+  except (IOError, OSError, UnicodeDecodeError):
+    return None
+
+
+class BatchTranslator(object):
+  def __init__(self, workers=1, timeout=None, memory_limit=None, simplify=True, **options):
+    self.workers = max(1, workers or 1)
+    self.timeout = timeout
+    self.memory_limit = memory_limit
+    self.simplify = simplify
+    # Passed on to FunctionalTranslator
+    self.options = options
+
+  def translate(self, filepaths):
+    """ Translate the code block files in filepaths. Yields (filepath,
+        source, translation, elapsed seconds, error) in the order of
+        filepaths.
+    """
+    return self._translate((filepath, None) for filepath in filepaths)
+
+  def translate_corpus(self, corpus_path):
+    """ Translate the code blocks of the corpus file corpus_path (see
+        corpus.py). Yields (block name, source, translation, elapsed seconds,
+        error) in the order of the corpus.
+    """
+    from corpus import Corpus
+    with Corpus(corpus_path) as corpus:
+      for result in self._translate(((corpus_path, block) for block in range(len(corpus))), corpus):
+        yield result
+
+  # Translates the (filepath, block) inputs, see _work.
+  def _translate(self, inputs, corpus=None):
+    import multiprocessing
+    from multiprocessing.connection import wait
+
+    # Name and source of an input
+    def read(filepath, block):
+      if block is None:
+        return filepath, _read(filepath)
+      return corpus.name(block), corpus.source(block)
+
+    context = multiprocessing.get_context()
+    jobs = ((index,) + item for index, item in enumerate(inputs))
+    idle = [_Worker(context, self.simplify, self.memory_limit, self.options) for _ in range(self.workers)]
+    busy = {}
+    results = {}
+    next_index = 0
+    remaining = True
+    try:
+      while remaining or busy:
+        # Hand out inputs to the idle workers.
+        while remaining and idle:
+          job = next(jobs, None)
+          if job is None:
+            remaining = False
+            break
+          worker = idle.pop()
+          worker.job = job + (time.monotonic(),)
+          worker.conn.send(job)
+          busy[worker.conn] = worker
+        if not busy:
+          break
+
+        timeout = None
+        if self.timeout is not None:
+          deadline = min(worker.job[3] for worker in busy.values()) + self.timeout
+          timeout = max(0, deadline - time.monotonic())
+
+        for conn in wait(list(busy), timeout):
+          worker = busy.pop(conn)
+          try:
+            index, source, translation, elapsed, error = conn.recv()
+            filepath, block = worker.job[1:3]
+            name = filepath
+            if block is not None:
+              name, source = read(filepath, block)
+            results[index] = (name, source, translation, elapsed, error)
+            idle.append(worker)
+          except (EOFError, OSError):
+            # The worker died while translating, e.g. killed for memory.
+            index, filepath, block, start = worker.job
+            worker.process.join(1)
+            error = "Worker died (exit code {}) in stage {}".format(worker.process.exitcode, worker.stage_name())
+            worker.kill()
+            results[index] = read(filepath, block) + (None, time.monotonic() - start, error)
+            idle.append(_Worker(context, self.simplify, self.memory_limit, self.options))
+
+        if self.timeout is not None:
+          now = time.monotonic()
+          for conn, worker in list(busy.items()):
+            index, filepath, block, start = worker.job
+            if now - start >= self.timeout:
+              error = "Timeout: over {}s in stage {}".format(self.timeout, worker.stage_name())
+              del busy[conn]
+              worker.kill()
+              results[index] = read(filepath, block) + (None, now - start, error)
+              idle.append(_Worker(context, self.simplify, self.memory_limit, self.options))
+
+        while next_index in results:
+          yield results.pop(next_index)
+          next_index += 1
+    finally:
+      for worker in idle:
+        worker.stop()
+      for worker in busy.values():
+        worker.kill()
@@ -0,0 +1,232 @@
+import argparse
+import gc
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+# Complexity-regression fuzzer for the translator.
+#
+#   python3 bench/fuzz.py [--axis AXIS ...] [--degree 1.25] [--max-size 2048]
+#
+# For each size axis, random minic programs (assignments, if, for, while,
+# arrays, ternaries) are grown along that axis only, keeping everything else
+# small. Each program is translated end to end (parse, c_ast_to_minic,
+# FunctionalTranslator, str) and the time and peak memory are fitted against
+# the size on a log-log scale. An axis whose fitted exponent is above the
+# allowed degree is flagged, and the script exits with status 1. The time of
+# an axis above the degree is measured a second time, and the axis is only
+# flagged if it is above on both.
+#
+# The allowed degree is --degree for the axes whose translation is linear in
+# their size. The translation of nested loops can be quadratic in the depth:
+# each loop passes and returns the variables of all the loops inside it, so
+# when the loops write different variables the output itself has the square of
+# the depth in names (on the default seed they mostly share them, and the
+# growth stays close to linear). Those axes are allowed their own degree plus
+# the slack of --degree above 1 (see GROWTH).
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pipeline import translate_block
+
+VARIABLES = ['a', 'b', 'c', 'd', 'e', 'x', 'y', 'z', 's', 't']
+ARRAYS = ['arr', 'buf']
+OPERATORS = ['+', '-', '*', '<', '==', '&&']
+
+
+class Generator(object):
+  def __init__(self, seed):
+    self.random = random.Random(seed)
+
+  def variable(self):
+    return self.random.choice(VARIABLES)
+
+  def operand(self):
+    choice = self.random.random()
+    if choice < 0.2:
+      return str(self.random.randint(0, 9))
+    if choice < 0.35:
+      return "{}[{}]".format(self.random.choice(ARRAYS), self.variable())
+    return self.variable()
+
+  def expression(self, size=2):
+    expr = self.operand()
+    for _ in range(size - 1):
+      expr = "{} {} {}".format(expr, self.random.choice(OPERATORS), self.operand())
+    return expr
+
+  def assignment(self, size=2):
+    if self.random.random() < 0.2:
+      lhs = "{}[{}]".format(self.random.choice(ARRAYS), self.variable())
+    else:
+      lhs = self.variable()
+    return "{} = {};".format(lhs, self.expression(size))
+
+  def statements(self, n):
+    return "\n".join(self.assignment() for _ in range(n))
+
+  def if_(self, body, orelse=None):
+    code = "if ({}) {{\n{}\n}}".format(self.expression(), body)
+    if orelse is not None:
+      code += " else {{\n{}\n}}".format(orelse)
+    return code
+
+  def for_(self, body, counter='i'):
+    return "for ({0} = 0; {0} < n; {0}++) {{\n{1}\n}}".format(counter, body)
+
+  def while_(self, body):
+    return "while ({}) {{\n{}\n{}\n}}".format(self.expression(), body, self.assignment())
+
+  def ternary(self, n):
+    expr = self.operand()
+    for _ in range(n):
+      expr = "{} ? {} : ({})".format(self.expression(), self.operand(), expr)
+    return "{} = {};".format(self.variable(), expr)
+
+
+# Each axis builds a program of the given size, growing one dimension only.
+def _statements(gen, n):
+  return gen.statements(n)
+
+def _expression(gen, n):
+  return gen.assignment(n)
+
+def _if_sequence(gen, n):
+  return "\n".join(gen.if_(gen.statements(2), gen.statements(2)) for _ in range(n))
+
+def _if_nesting(gen, n):
+  code = gen.statements(2)
+  for _ in range(n):
+    code = gen.if_(code, gen.statements(1))
+  return code
+
+def _loop_sequence(gen, n):
+  return "\n".join(gen.for_(gen.statements(2)) if k % 2 else gen.while_(gen.statements(2)) for k in range(n))
+
+def _loop_nesting(gen, n):
+  code = gen.statements(2)
+  for depth in range(n):
+    code = gen.for_(code, "i{}".format(depth))
+  return code
+
+def _loop_body(gen, n):
+  return gen.for_(gen.statements(n))
+
+def _variables(gen, n):
+  return "\n".join("v{} = v{} + {};".format(k, k // 2, gen.operand()) for k in range(n))
+
+def _ternary(gen, n):
+  return gen.ternary(n)
+
+
+AXES = {
+  'statements': (_statements, 4096),
+  'expression': (_expression, 1024),
+  'if_sequence': (_if_sequence, 1024),
+  'if_nesting': (_if_nesting, 64),
+  'loop_sequence': (_loop_sequence, 512),
+  'loop_nesting': (_loop_nesting, 32),
+  'loop_body': (_loop_body, 4096),
+  'variables': (_variables, 2048),
+  'ternary': (_ternary, 256),
+}
+
+# Growth of the translation of the axes that are not linear in their size
+GROWTH = {
+  'loop_nesting': 2,
+}
+
+
+def elapsed(source, simplify):
+  gc.collect()
+  start = time.perf_counter()
+  translate_block(source, simplify)
+  return time.perf_counter() - start
+
+
+def peak_memory(source, simplify):
+  tracemalloc.start()
+  translate_block(source, simplify)
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return peak
+
+
+# Least-squares slope of log(y) against log(x): the exponent k of y ~ x^k.
+def exponent(sizes, values):
+  xs = [math.log(size) for size in sizes]
+  ys = [math.log(max(value, 1e-9)) for value in values]
+  mean_x, mean_y = statistics.mean(xs), statistics.mean(ys)
+  return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum((x - mean_x) ** 2 for x in xs)
+
+
+def run_axis(axis, max_size, seed, simplify, repeats, verbose):
+  build, axis_max = AXES[axis]
+  sizes = []
+  size = 4
+  while size <= min(max_size, axis_max):
+    sizes.append(size)
+    size *= 2
+  sources = [build(Generator(seed), size) for size in sizes]
+  # The time of each size is the fastest of its runs, since the noise of the
+  # machine only adds time. The runs of the sizes are interleaved so that a
+  # slow period does not slow down all the runs of one size.
+  times = [float('inf')] * len(sizes)
+  for _ in range(repeats):
+    for i, source in enumerate(sources):
+      times[i] = min(times[i], elapsed(source, simplify))
+  peaks = [peak_memory(source, simplify) for source in sources]
+  if verbose:
+    for size, seconds, peak in zip(sizes, times, peaks):
+      print("  {:<14} size {:>5}: {:>9.2f} ms {:>9.1f} KB".format(axis, size, seconds * 1000, peak / 1024.0))
+  # Small sizes are dominated by constant costs, only fit the larger half (at
+  # least three sizes).
+  half = max(0, min(len(sizes) // 2, len(sizes) - 3))
+  return exponent(sizes[half:], times[half:]), exponent(sizes[half:], peaks[half:]), sizes[-1]
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--axis', action='append', choices=sorted(AXES), help="axes to fuzz (default: all)")
+  parser.add_argument('--degree', type=float, default=1.25, help="maximum allowed growth exponent (default: %(default)s)")
+  parser.add_argument('--max-size', type=int, default=2048)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--repeats', type=int, default=5)
+  parser.add_argument('--no-simplify', dest='simplify', action='store_false')
+  parser.add_argument('-v', '--verbose', action='store_true')
+  args = parser.parse_args()
+
+  # Nesting axes translate recursively.
+  sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000))
+
+  print("{:<14} {:>8} {:>10} {:>10}".format('axis', 'max size', 'time exp', 'memory exp'))
+  flagged = []
+  for axis in args.axis or sorted(AXES):
+    try:
+      time_exp, memory_exp, size = run_axis(axis, args.max_size, args.seed, args.simplify, args.repeats, args.verbose)
+    except RecursionError:
+      print("{:<14} recursion limit reached".format(axis))
+      flagged.append(axis)
+      continue
+    degree = args.degree - 1 + GROWTH.get(axis, 1)
+    if time_exp > degree:
+      # A slow period of the machine can still raise the time exponent of an
+      # axis, while a real growth is there on every run: measure it again.
+      time_exp = min(time_exp, run_axis(axis, args.max_size, args.seed, args.simplify, args.repeats, args.verbose)[0])
+    over = time_exp > degree or memory_exp > degree
+    print("{:<14} {:>8} {:>10.2f} {:>10.2f}{}".format(axis, size, time_exp, memory_exp, "  FLAGGED" if over else ""))
+    if over:
+      flagged.append(axis)
+
+  if flagged:
+    print("growth above degree {} on: {}".format(args.degree, ', '.join(flagged)))
+  return 1 if flagged else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
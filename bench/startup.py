@@ -0,0 +1,106 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Startup-time benchmark for the command line entry points.
+#
+#   python3 bench/startup.py [-n runs] [--budget-ms ms]
+#
+# Prints the cumulative import time of each module (in a fresh interpreter,
+# from python -X importtime) and the wall time of a cold one-file
+# translation (run.py -f) above bare interpreter startup. Exits with status 1
+# if that overhead exceeds the budget, or if run.py -f loads a module that
+# only the other modes need.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+  'func_ast',
+  'minic.minic_ast',
+  'minic.c_ast_to_minic',
+  'transform_func',
+  'preprocess',
+  'pipeline',
+  'translation_unit',
+  'server',
+  'async_translate',
+  'run',
+]
+
+# Modules that a one-file translation must not import.
+NOT_FOR_ONE_FILE = [
+  'multiprocessing', 'concurrent', 'asyncio', 'socketserver', 'json',
+  'hashlib', 'translation_unit', 'server', 'async_translate', 'corpus',
+]
+
+INPUT = os.path.join('inputs', 'final_inputs', 'p3_input6')
+
+
+def _importtime(args):
+  result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=ROOT,
+    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+  # import time: self [us] | cumulative | imported package
+  times = {}
+  for line in result.stderr.splitlines():
+    if line.startswith('import time:') and '|' in line:
+      _, cumulative, name = line.split('|')
+      if cumulative.strip().isdigit():
+        times.setdefault(name.strip(), int(cumulative))
+  return times
+
+
+def import_times(runs):
+  return dict((module, statistics.median(_importtime(['-c', 'import ' + module])[module] / 1000.0
+    for _ in range(runs))) for module in MODULES)
+
+
+def wall_time(args, runs):
+  times = []
+  for _ in range(runs):
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+    times.append((time.perf_counter() - start) * 1000.0)
+  return statistics.median(times)
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('-n', '--runs', type=int, default=5)
+  parser.add_argument('--budget-ms', type=float, default=200.0,
+    help='maximum time of run.py -f above bare interpreter startup')
+  args = parser.parse_args()
+
+  print('{:<24} {:>10}'.format('module', 'import ms'))
+  for module, ms in import_times(args.runs).items():
+    print('{:<24} {:>10.1f}'.format(module, ms))
+
+  try:
+    bare = wall_time(['-c', 'pass'], args.runs)
+    one_file = wall_time(['run.py', '-f', INPUT], args.runs)
+    loaded = _importtime(['run.py', '-f', INPUT])
+  finally:
+    out_c = os.path.join(ROOT, INPUT + '_out.c')
+    if os.path.exists(out_c):
+      os.remove(out_c)
+  overhead = one_file - bare
+  print('\ninterpreter startup      {:>10.1f} ms'.format(bare))
+  print('run.py -f                {:>10.1f} ms ({:.1f} ms above startup, budget {:.1f} ms)'.format(
+    one_file, overhead, args.budget_ms))
+
+  failed = False
+  unexpected = [module for module in NOT_FOR_ONE_FILE
+    if any(name == module or name.startswith(module + '.') for name in loaded)]
+  if unexpected:
+    print('run.py -f imports {}'.format(', '.join(unexpected)))
+    failed = True
+  if overhead > args.budget_ms:
+    print('run.py -f is over its startup budget')
+    failed = True
+  return 1 if failed else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -2,21 +2,18 @@ import sys
 import os
 sys.path.extend(['.', '..'])
 
-from pycparser import parse_file
-from minic.c_ast_to_minic import transform
-from transform_func import *
-from func_utils import function_wrapper
+# The translator is only imported in the main block, and the blocks go through
+# the pipeline (in-process preprocessing, no _out.c files) like run.py -d.
 
 if __name__ == "__main__":
+  from pipeline import translate_block
+  from run import directory_inputs
   directory_path = "./inputs/checkin6_inputs"
-  directory = os.fsencode(directory_path)
-  for file in os.listdir(directory):
-    filename = os.fsdecode(file)
-    if not filename.endswith("_out.c"):
-      output_c = function_wrapper(os.path.join(directory_path, filename))
-      mast = transform(parse_file(output_c))
-      print("File: {} \nInput:".format(filename))
-      with open(os.path.join(directory_path, filename), 'r') as fin:
-        print(fin.read())
-      ftranslator = FunctionalTranslator(mast, False)
-      print("Output:\n{}\n----------".format(ftranslator))
\ No newline at end of file
+  for filepath in directory_inputs(directory_path):
+    filename = os.path.basename(filepath)
+    with open(filepath, 'r') as fin:
+      source = fin.read()
+    translation = translate_block(source, False, filepath)
+    print("File: {} \nInput:".format(filename))
+    print(source)
+    print("Output:\n{}\n----------".format(translation))
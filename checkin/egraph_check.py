@@ -0,0 +1,114 @@
+import sys
+import random
+sys.path.extend(['.', '..'])
+
+# Regression check of the e-graph optimizer (--egraph): every expression it
+# returns is evaluated against the original one on random inputs (see
+# func_eval.py), for random expressions over a few variables and for the
+# translations of the code blocks of ./inputs.
+#
+#   python3 checkin/egraph_check.py [--expressions N] [--nodes N] [--seeds N] [--seed S] [-v]
+#
+# The optimizer runs without a time limit, so that the check does not depend
+# on the machine, and with a smaller node limit than --egraph to keep it
+# short. Inputs where the original expression divides by zero are not
+# compared (the optimizer may drop a division whose value is not used). The
+# script exits with status 1 if any expression differs.
+
+VARIABLES = ['a', 'b', 'c']
+OPERATORS = ['+', '+', '-', '*', '/', '%', '<', '>', '<=', '>=', '==', '!=', '&&', '||']
+CONSTANTS = ['0', '1', '2', '3']
+
+
+def random_expression(rnd, depth):
+  import func_ast as func
+  if depth == 0 or rnd.random() < 0.2:
+    if rnd.random() < 0.6:
+      return func.ID(rnd.choice(VARIABLES))
+    return func.Constant(rnd.choice(CONSTANTS))
+  kind = rnd.random()
+  if kind < 0.6:
+    return func.BinaryOp(rnd.choice(OPERATORS), random_expression(rnd, depth - 1), random_expression(rnd, depth - 1))
+  if kind < 0.75:
+    return func.UnaryOp(rnd.choice(['-', '!']), random_expression(rnd, depth - 1))
+  if kind < 0.85:
+    return func.If(random_expression(rnd, depth - 1), random_expression(rnd, depth - 1),
+      random_expression(rnd, depth - 1))
+  if kind < 0.92:
+    return func.ArrayRef(func.ID(rnd.choice(VARIABLES)), random_expression(rnd, depth - 1))
+  if kind < 0.96:
+    return func.FuncCall(func.ID('f'), func.ArgsList([random_expression(rnd, depth - 1)]))
+  # Parentheses
+  return func.ReturnTuple([random_expression(rnd, depth - 1)])
+
+
+# The first seed where expr and optimized evaluate differently, as (seed,
+# expected, got), or None.
+def difference(expr, optimized, seeds):
+  from func_eval import Evaluator, OutOfSteps, Value
+  for seed in range(seeds):
+    env = {}
+    for name in VARIABLES:
+      rnd = random.Random('{}/{}'.format(seed, name))
+      env[name] = Value(rnd.randint(-3, 5), rnd.randint(0, 1 << 20))
+    try:
+      expected = Evaluator().eval(expr, env)
+    except (ZeroDivisionError, OutOfSteps):
+      continue
+    try:
+      got = Evaluator().eval(optimized, env)
+    except (ZeroDivisionError, OutOfSteps) as e:
+      got = e.__class__.__name__
+    if expected != got:
+      return seed, expected, got
+  return None
+
+
+if __name__ == "__main__":
+  import argparse
+  from egraph import EGraphOptimizer
+  from func_eval import evaluate
+  from ssa_check import input_files, minic_tree
+  from transform_func import FunctionalTranslator
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--expressions', type=int, default=500, help="random expressions (default: %(default)s)")
+  parser.add_argument('--depth', type=int, default=4, help="depth of the random expressions (default: %(default)s)")
+  parser.add_argument('--nodes', type=int, default=500, help="node limit of the e-graphs (default: %(default)s)")
+  parser.add_argument('--seeds', type=int, default=10, help="random inputs per expression (default: %(default)s)")
+  parser.add_argument('--seed', type=int, default=0, help="seed of the random expressions")
+  parser.add_argument('-v', '--verbose', action='store_true')
+  args = parser.parse_args()
+  sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+  failed = 0
+  rnd = random.Random(args.seed)
+  for i in range(args.expressions):
+    expr = random_expression(rnd, args.depth)
+    optimized = EGraphOptimizer(max_nodes=args.nodes, time_limit=None).optimize(expr)
+    found = difference(expr, optimized, args.seeds)
+    if found is not None:
+      failed += 1
+      print("expression {}: {}\n  optimized {}\n  seed {}: {} instead of {}".format(
+        i, expr, optimized, found[0], found[2], found[1]))
+    elif args.verbose:
+      print("expression {}: {}  ->  {}".format(i, expr, optimized))
+
+  checked = 0
+  for filepath in input_files():
+    try:
+      translation = FunctionalTranslator(minic_tree(filepath)).translate()
+    except Exception:
+      continue
+    optimized = EGraphOptimizer(max_nodes=args.nodes, time_limit=None).rewrite(translation)
+    checked += 1
+    for seed in range(args.seeds):
+      expected, got = evaluate(translation, seed), evaluate(optimized, seed)
+      if not isinstance(expected, str) and expected != got:
+        failed += 1
+        print("{}: differs on seed {}:\n  original  {}\n  optimized {}".format(filepath, seed, expected, got))
+        break
+    else:
+      if args.verbose:
+        print("{}: ok".format(filepath))
+  print("{} expressions and {} blocks checked, {} differ".format(args.expressions, checked, failed))
+  sys.exit(1 if failed else 0)
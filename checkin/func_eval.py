@@ -0,0 +1,229 @@
+import random
+import zlib
+
+import func_ast as func
+
+# Reference evaluator of func_ast translations, for the regression checks of
+# this directory (ssa_check.py, egraph_check.py).
+#
+#   outputs = evaluate(funcdef, seed)   # {output variable: value}, or the
+#                                       # name of the error that stopped it
+#   value = Evaluator().eval(expr, env)
+#
+# Integers follow C: division and modulo truncate towards zero, comparisons
+# and logical operators give 0 or 1 (overflow is not modelled). The free
+# variables of the function get small random values from the seed. Any value
+# can also be used as an array: its elements are random as well, and an array
+# update gives a new value with the element changed. A call gives a value that
+# only depends on the function and its arguments. Evaluation stops after a
+# number of steps, for the loops that do not end on the random inputs.
+
+
+class OutOfSteps(Exception):
+  pass
+
+
+class Value(int):
+  # An integer, and the array of the same name: the elements that were set,
+  # the others come from seed.
+  def __new__(cls, value, seed, items=None):
+    self = int.__new__(cls, value)
+    self.seed = seed
+    self.items = dict(items or {})
+    return self
+
+  def get(self, i):
+    i = int(i)
+    if i in self.items:
+      return self.items[i]
+    seed = hash((self.seed, i)) & 0xffff
+    return Value(seed % 7 - 2, seed)
+
+  def set(self, i, value):
+    new = Value(int(self), self.seed, self.items)
+    new.items[int(i)] = value
+    return new
+
+  # What the value looks like from outside: the integer, and the elements set
+  # if any.
+  def observed(self):
+    if not self.items:
+      return int(self)
+    return int(self), tuple(sorted([(i, observed(item)) for i, item in self.items.items()]))
+
+
+def observed(value):
+  if isinstance(value, Value):
+    return value.observed()
+  if isinstance(value, tuple):
+    return tuple([observed(item) for item in value])
+  return value
+
+
+def _truncate(a, b):
+  q = abs(a) // abs(b)
+  return q if (a < 0) == (b < 0) else -q
+
+OPERATORS = {
+  '+': lambda a, b: a + b,
+  '-': lambda a, b: a - b,
+  '*': lambda a, b: a * b,
+  '/': _truncate,
+  '%': lambda a, b: a - b * _truncate(a, b),
+  '<': lambda a, b: int(a < b),
+  '>': lambda a, b: int(a > b),
+  '<=': lambda a, b: int(a <= b),
+  '>=': lambda a, b: int(a >= b),
+  '==': lambda a, b: int(a == b),
+  '!=': lambda a, b: int(a != b),
+  '&': lambda a, b: a & b,
+  '|': lambda a, b: a | b,
+  '^': lambda a, b: a ^ b,
+  '<<': lambda a, b: a << b,
+  '>>': lambda a, b: a >> b,
+}
+
+UNARY_OPERATORS = {
+  '-': lambda a: -a,
+  '+': lambda a: a,
+  '!': lambda a: int(not a),
+  '~': lambda a: ~a,
+}
+
+
+def constant(value):
+  if value.startswith("'"):
+    return ord(value[1:-1].encode().decode('unicode_escape'))
+  try:
+    return int(value.rstrip('uUlL'), 0)
+  except ValueError:
+    return float(value.rstrip('fFlL'))
+
+
+def call(name, args):
+  text = repr((name, [int(arg) for arg in args]))
+  return zlib.crc32(text.encode()) % 17 - 8
+
+
+class Evaluator(object):
+  def __init__(self, steps=20000):
+    self.steps = steps
+
+  def tick(self):
+    self.steps -= 1
+    if self.steps < 0:
+      raise OutOfSteps()
+
+  def eval(self, node, env):
+    self.tick()
+    if isinstance(node, str):
+      return env[node]
+    cls = node.__class__
+    if cls is func.ID:
+      return env[node.name]
+    if cls is func.Constant:
+      # Substituted expressions are wrapped in a Constant.
+      if isinstance(node.value, func.Node):
+        return self.eval(node.value, env)
+      return constant(str(node.value))
+    if cls is func.BinaryOp:
+      if node.op == '&&':
+        return int(bool(self.eval(node.left, env)) and bool(self.eval(node.right, env)))
+      if node.op == '||':
+        return int(bool(self.eval(node.left, env)) or bool(self.eval(node.right, env)))
+      return OPERATORS[node.op](self.eval(node.left, env), self.eval(node.right, env))
+    if cls is func.UnaryOp:
+      return UNARY_OPERATORS[node.op](self.eval(node.expr, env))
+    if cls is func.ArrayRef:
+      return self.eval(node.name, env).get(self.eval(node.subscript, env))
+    if cls is func.If:
+      return self.eval(node.iftrue if self.eval(node.cond, env) else node.iffalse, env)
+    if cls is func.FuncCall:
+      return call(node.name.name, [self.eval(arg, env) for arg in node.args.args])
+    if cls is func.ReturnTuple:
+      values = tuple([self.eval(expr, env) for expr in node.exprs])
+      return values[0] if len(values) == 1 else values
+    if cls is func.Binding:
+      env = dict(env)
+      # Binding chains can be long, evaluate them iteratively.
+      while isinstance(node, func.Binding):
+        self.tick()
+        self.bind(node.id, self.eval(node.expr1, env), env, env)
+        node = node.expr2
+      return self.eval(node, env)
+    if cls is func.ParallelBinding:
+      # Every binding of the group sees the values from before the group.
+      new = dict(env)
+      for binding in node.bindings:
+        self.bind(binding.id, self.eval(binding.expr1, env), new, env)
+      return self.eval(node.expr2, new)
+    if cls is func.RecursiveFunction:
+      return self.eval(node.expr2, self.define(node, env))
+    if cls is func.ArgsRecList:
+      return env[node.loop_id](*[env[arg] for arg in node.args])
+    raise TypeError("cannot evaluate {}".format(cls.__name__))
+
+  # Environment with the function of a let rec, which sees the environment it
+  # is defined in.
+  def define(self, node, env):
+    name, params, body = node.args.loop_id, list(node.args.args), node.expr1
+    env = dict(env)
+    def function(*values):
+      scope = dict(env)
+      scope.update(zip(params, values))
+      return self.eval(body, scope)
+    env[name] = function
+    return env
+
+  # Binds the value of a binding to its left hand side in env, the subscripts
+  # of an array update are evaluated in old.
+  def bind(self, lhs, value, env, old):
+    if isinstance(lhs, func.ReturnTuple):
+      values = value if isinstance(value, tuple) else (value,)
+      for name, item in zip(lhs.exprs, values):
+        env[name if isinstance(name, str) else name.name] = item
+      return
+    if isinstance(value, tuple) and len(value) == 1:
+      value = value[0]
+    if isinstance(lhs, func.ID):
+      env[lhs.name] = value
+      return
+    if not isinstance(lhs, func.ArrayRef):
+      raise TypeError("cannot bind {}".format(lhs.__class__.__name__))
+    subscripts = []
+    while isinstance(lhs, func.ArrayRef):
+      subscripts.append(self.eval(lhs.subscript, old))
+      lhs = lhs.name
+    subscripts.reverse()
+    arrays = [env[lhs.name]]
+    for subscript in subscripts[:-1]:
+      arrays.append(arrays[-1].get(subscript))
+    for array, subscript in reversed(list(zip(arrays, subscripts))):
+      value = array.set(subscript, value)
+    env[lhs.name] = value
+
+
+# Environment of the free variables of funcdef, with random values from seed.
+def inputs(funcdef, seed):
+  from transform_func import free_names
+  env = {}
+  for name in sorted(free_names(funcdef.body) | set(funcdef.input_args.args)):
+    rnd = random.Random('{}/{}'.format(seed, name))
+    env[name] = Value(rnd.randint(0, 5), rnd.randint(0, 1 << 20))
+  return env
+
+
+# The values of the output variables of funcdef on the inputs from seed, or
+# the error that stopped it ("steps", "division by zero" or "unbound <name>").
+def evaluate(funcdef, seed, steps=20000):
+  try:
+    result = Evaluator(steps).eval(funcdef.body, inputs(funcdef, seed))
+  except (OutOfSteps, RecursionError):
+    return "steps"
+  except ZeroDivisionError:
+    return "division by zero"
+  except KeyError as e:
+    return "unbound {}".format(e.args[0])
+  names = [name if isinstance(name, str) else str(name) for name in funcdef.output_vars.exprs]
+  values = result if isinstance(result, tuple) and len(names) > 1 else (result,)
+  return dict(zip(names, [observed(value) for value in values]))
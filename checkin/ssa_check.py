@@ -0,0 +1,75 @@
+import sys
+import os
+sys.path.extend(['.', '..'])
+
+# Regression check of the SSA translation (--ssa): on every code block of
+# ./inputs, the SSA translation and the default one are evaluated on the same
+# random inputs (see func_eval.py) and have to give the same outputs. The SSA
+# translation is not simplified, so it is compared with the unsimplified
+# default translation.
+#
+#   python3 checkin/ssa_check.py [--seeds N] [-v]
+#
+# Inputs where a loop does not end within the step budget are not compared;
+# blocks that either translation does not support are skipped. The script
+# exits with status 1 if any block differs.
+
+INPUTS = "./inputs"
+
+
+def input_files():
+  from run import directory_inputs
+  for directory, subdirectories, _ in os.walk(INPUTS):
+    subdirectories.sort()
+    for filepath in sorted(directory_inputs(directory)):
+      if os.path.isfile(filepath):
+        yield filepath
+
+
+def minic_tree(filepath):
+  from func_utils import wrap_function
+  from preprocess import get_parser, preprocess
+  from minic.c_ast_to_minic import transform
+  with open(filepath, 'r') as fin:
+    source = fin.read()
+  return transform(get_parser().parse(preprocess(wrap_function(source), filepath), filepath))
+
+
+if __name__ == "__main__":
+  import argparse
+  from func_eval import evaluate
+  from transform_func import FunctionalTranslator
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--seeds', type=int, default=10, help="random inputs per block (default: %(default)s)")
+  parser.add_argument('-v', '--verbose', action='store_true')
+  args = parser.parse_args()
+  sys.setrecursionlimit(max(sys.getrecursionlimit(), 100000))
+
+  checked, skipped, failed = 0, 0, []
+  for filepath in input_files():
+    try:
+      mast = minic_tree(filepath)
+      default = FunctionalTranslator(mast, False).translate(False)
+      ssa = FunctionalTranslator(mast, ssa=True).translate()
+    except Exception as e:
+      skipped += 1
+      if args.verbose:
+        print("{}: skipped ({})".format(filepath, e.__class__.__name__))
+      continue
+    differences = []
+    for seed in range(args.seeds):
+      expected, got = evaluate(default, seed), evaluate(ssa, seed)
+      if "steps" in (expected, got):
+        continue
+      if expected != got:
+        differences.append((seed, expected, got))
+    checked += 1
+    if differences:
+      failed.append(filepath)
+      seed, expected, got = differences[0]
+      print("{}: differs on {} of {} inputs, e.g. seed {}:\n  default {}\n  ssa     {}".format(
+        filepath, len(differences), args.seeds, seed, expected, got))
+    elif args.verbose:
+      print("{}: ok".format(filepath))
+  print("{} blocks checked, {} skipped, {} differ".format(checked, skipped, len(failed)))
+  sys.exit(1 if failed else 0)
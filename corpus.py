@@ -0,0 +1,104 @@
+import mmap
+import struct
+
+# Corpus files: many code blocks in one file, with an index, so that a large
+# batch is read from one memory-mapped file instead of a file per block.
+#
+#   write_corpus("blocks.corpus", [(name, source), ...])
+#   with Corpus("blocks.corpus") as corpus:
+#     for name, source in corpus:
+#       ...
+#     corpus.source(i), corpus.name(i)    # block i
+#
+# Layout (integers little-endian):
+#
+#   MAGIC
+#   name and source of each block, UTF-8, back to back
+#   index: (name offset, name length, source offset, source length) of each block
+#   trailer: index offset, number of blocks, MAGIC
+#
+# The index is at the end so that the blocks are written as they come. A block
+# is read straight from the mapping: only its pages are touched, and block()
+# is a slice of the mapping, without a copy. The name of a block is the path
+# of the file it was packed from (see run.py --pack), which is used for its
+# output and for the #include files and errors of its preprocessing.
+
+MAGIC = b"CCORPUS1"
+ENTRY = struct.Struct('<QIQI')
+TRAILER = struct.Struct('<QQ8s')
+
+
+def write_corpus(path, blocks):
+  """ Writes the (name, source) pairs of blocks to the corpus file path.
+      Returns the number of blocks.
+  """
+  index = bytearray()
+  count = 0
+  with open(path, 'wb') as fout:
+    fout.write(MAGIC)
+    offset = len(MAGIC)
+    for name, source in blocks:
+      name, source = name.encode('utf-8'), source.encode('utf-8')
+      index += ENTRY.pack(offset, len(name), offset + len(name), len(source))
+      fout.write(name)
+      fout.write(source)
+      offset += len(name) + len(source)
+      count += 1
+    fout.write(index)
+    fout.write(TRAILER.pack(offset, count, MAGIC))
+  return count
+
+
+class Corpus(object):
+  def __init__(self, path):
+    self.path = path
+    with open(path, 'rb') as fin:
+      try:
+        self.map = mmap.mmap(fin.fileno(), 0, access=mmap.ACCESS_READ)
+      except ValueError:
+        # Empty file
+        raise ValueError("{} is not a corpus file".format(path))
+    size = len(self.map)
+    if size < len(MAGIC) + TRAILER.size or self.map[:len(MAGIC)] != MAGIC:
+      self.map.close()
+      raise ValueError("{} is not a corpus file".format(path))
+    self.index_offset, self.count, magic = TRAILER.unpack_from(self.map, size - TRAILER.size)
+    if magic != MAGIC or self.index_offset + self.count * ENTRY.size != size - TRAILER.size:
+      self.map.close()
+      raise ValueError("{} is not a corpus file (truncated?)".format(path))
+
+  def __len__(self):
+    return self.count
+
+  def entry(self, i):
+    if not 0 <= i < self.count:
+      raise IndexError("block {} of a corpus of {}".format(i, self.count))
+    return ENTRY.unpack_from(self.map, self.index_offset + i * ENTRY.size)
+
+  def name(self, i):
+    name_offset, name_length, offset, length = self.entry(i)
+    return self.map[name_offset:name_offset + name_length].decode('utf-8')
+
+  def block(self, i):
+    """ The UTF-8 source of block i, as a memoryview of the mapping (to be
+        released before the corpus is closed).
+    """
+    name_offset, name_length, offset, length = self.entry(i)
+    return memoryview(self.map)[offset:offset + length]
+
+  def source(self, i):
+    with self.block(i) as block:
+      return str(block, 'utf-8')
+
+  def __iter__(self):
+    for i in range(self.count):
+      yield self.name(i), self.source(i)
+
+  def close(self):
+    self.map.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
@@ -0,0 +1,175 @@
+from array import array
+
+from minic.minic_ast import Assignment, Block, Decl, FileAST, FuncDef, ID, InitList, NodeVisitor
+from transform_func import AST_C
+
+# Def-use (dependency) graph of the statements of a minic block.
+#
+#   graph = def_use_graph(block)        # Block or FuncDef
+#   graphs = def_use_graph(file_ast)    # FileAST: {function name: graph}
+#   graph = DefUseGraph(items, item_accesses)
+#
+# The last form builds the graph of any sequence, given the accesses of its
+# items in the form of accesses() below (parallel_bindings in transform_func
+# uses it for the bindings of a func_ast chain).
+#
+# The nodes are the statements of the block, in order, with the variables they
+# read and write as AST_C records them (an array update writes the array and
+# reads its subscripts, a nested if or loop accesses everything its body
+# does). An edge i -> j (i before j) has a mask of the dependencies between
+# the two statements:
+#
+#   FLOW    j reads a variable written by i
+#   ANTI    j writes a variable read by i
+#   OUTPUT  j writes a variable written by i
+#
+# Only an assignment to a whole variable replaces its previous value, so a
+# read depends on every write since the last one (array updates and writes in
+# if statements or loops do not replace the earlier writes).
+#
+# The edges are kept in compressed adjacency arrays, in both directions:
+# the successors of i are targets[offsets[i]:offsets[i + 1]] with their masks
+# in kinds[...], and the same with pred_offsets, sources and pred_kinds for
+# the predecessors.
+
+FLOW = 1
+ANTI = 2
+OUTPUT = 4
+ALL = FLOW | ANTI | OUTPUT
+
+KIND_NAMES = ((FLOW, "flow"), (ANTI, "anti"), (OUTPUT, "output"))
+
+
+class _Accesses(AST_C):
+  # AST_C without the translation, only the read and written sets are kept.
+  def visit(self, node):
+    return NodeVisitor.visit(self, node)
+
+  def visit_Assignment(self, assignment):
+    self.record_assignment(assignment)
+
+  def visit_If(self, node):
+    self.generic_visit(node)
+
+  def visit_For(self, node):
+    self.generic_visit(node)
+
+  def visit_While(self, node):
+    self.generic_visit(node)
+
+
+# Returns (read variables, written variables, replaced variables) of a minic statement.
+def accesses(stmt):
+  visitor = _Accesses()
+  visitor.visit(stmt)
+  kills = frozenset()
+  if isinstance(stmt, Assignment) and isinstance(stmt.lvalue, ID):
+    kills = frozenset([stmt.lvalue.name])
+  elif isinstance(stmt, Decl) and stmt.init is not None and not isinstance(stmt.init, InitList):
+    kills = frozenset([stmt.name])
+  return frozenset(visitor.read_set), frozenset(visitor.written_set), kills
+
+
+class DefUseGraph(object):
+  def __init__(self, statements, accesses=accesses):
+    self.statements = list(statements)
+    self.reads = []
+    self.writes = []
+
+    # Edges as {target: mask} for each statement, packed below.
+    succs = [dict() for _ in self.statements]
+    # Statements whose write of each variable can still be read, and
+    # statements that read each variable since it was last written.
+    reaching = {}
+    readers = {}
+    for j, stmt in enumerate(self.statements):
+      reads, writes, kills = accesses(stmt)
+      self.reads.append(reads)
+      self.writes.append(writes)
+      for var in reads:
+        for i in reaching.get(var, ()):
+          succs[i][j] = succs[i].get(j, 0) | FLOW
+      for var in writes:
+        for i in readers.get(var, ()):
+          if i != j:
+            succs[i][j] = succs[i].get(j, 0) | ANTI
+        for i in reaching.get(var, ()):
+          succs[i][j] = succs[i].get(j, 0) | OUTPUT
+      for var in reads:
+        readers.setdefault(var, []).append(j)
+      for var in writes:
+        readers[var] = []
+        if var in kills:
+          reaching[var] = [j]
+        else:
+          reaching.setdefault(var, []).append(j)
+
+    self.offsets, self.targets, self.kinds = _pack(succs)
+    preds = [dict() for _ in self.statements]
+    for i, targets in enumerate(succs):
+      for j, mask in targets.items():
+        preds[j][i] = mask
+    self.pred_offsets, self.sources, self.pred_kinds = _pack(preds)
+
+  def __len__(self):
+    return len(self.statements)
+
+  def successors(self, i, kinds=ALL):
+    """ Statements that depend on statement i through one of kinds. """
+    return [self.targets[k] for k in range(self.offsets[i], self.offsets[i + 1]) if self.kinds[k] & kinds]
+
+  def predecessors(self, j, kinds=ALL):
+    """ Statements that statement j depends on through one of kinds. """
+    return [self.sources[k] for k in range(self.pred_offsets[j], self.pred_offsets[j + 1]) if self.pred_kinds[k] & kinds]
+
+  def edges(self, kinds=ALL):
+    """ Yields (i, j, mask) for every edge with one of kinds. """
+    for i in range(len(self.statements)):
+      for k in range(self.offsets[i], self.offsets[i + 1]):
+        if self.kinds[k] & kinds:
+          yield i, self.targets[k], self.kinds[k]
+
+  def backward_slice(self, j, kinds=FLOW | OUTPUT):
+    """ Indices of the statements statement j depends on, directly or not,
+        including j, in order.
+    """
+    seen = set([j])
+    stack = [j]
+    while stack:
+      for i in self.predecessors(stack.pop(), kinds):
+        if not i in seen:
+          seen.add(i)
+          stack.append(i)
+    return sorted(seen)
+
+  def __str__(self):
+    lines = []
+    for i, j, mask in self.edges():
+      lines.append("{} -> {} {}".format(i, j, '+'.join([name for kind, name in KIND_NAMES if mask & kind])))
+    return '\n'.join(lines)
+
+
+# Compressed adjacency arrays of a list of {node: mask}, in node order.
+def _pack(adjacency):
+  offsets = array('l', [0])
+  nodes = array('l')
+  kinds = array('b')
+  for edges in adjacency:
+    for node in sorted(edges):
+      nodes.append(node)
+      kinds.append(edges[node])
+    offsets.append(len(nodes))
+  return offsets, nodes, kinds
+
+
+def def_use_graph(node):
+  """ Def-use graph of the statements of a Block or of the body of a FuncDef.
+      For a FileAST, a dict of the graphs of its function definitions by name.
+  """
+  if isinstance(node, FileAST):
+    return dict((ext.decl.name, def_use_graph(ext)) for ext in node.ext if isinstance(ext, FuncDef))
+  if isinstance(node, FuncDef):
+    node = node.body
+  if isinstance(node, Block):
+    return DefUseGraph(node.block_items or [])
+  return DefUseGraph([node])
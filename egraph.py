@@ -0,0 +1,489 @@
+import time
+
+import func_ast as func
+from rewrite import FOLD, ExpressionRewriter, Var, constant, int_value, node_symbol, operands, rebuild
+
+# Equality saturation over func_ast expressions.
+#
+#   optimizer = EGraphOptimizer(max_nodes=5000, time_limit=0.5)
+#   funcdef = optimizer.rewrite(funcdef)
+#
+# Each expression of the translation is added to an e-graph: a union-find of
+# equivalence classes of nodes, where a node is an operator (BinaryOp, UnaryOp,
+# If, ArrayRef, ...) applied to classes instead of expressions. The equalities
+# of RULES are applied to every match in the graph, and the graph is rebuilt
+# to restore congruence (nodes with the same operator and equivalent operands
+# are merged) until nothing new is found, or the graph has more than max_nodes
+# nodes, or max_iterations rounds or time_limit seconds have gone by. The
+# cheapest expression of the class of the original one is then extracted.
+# Nothing is ever removed from the graph, so unlike greedy rewriting the order
+# of the rules does not matter: every expression found along the way is still
+# there when extracting.
+#
+# The constant value of a class, if any, is kept along with it (constant
+# folding), and so is whether all of its expressions are free of function
+# calls (rules that drop or duplicate an operand require it).
+#
+# The rules are Equality(name, pattern, replacement, guard), with patterns as
+# in rewrite.py. The replacement is a pattern, or a function of (egraph,
+# matches) returning a class or None, the matches being the classes of the
+# pattern variables; the guard is a function of (egraph, matches) as well.
+#
+# Expressions substituted by simplify (wrapped in a Constant) are unwrapped,
+# and parentheses (1-element tuples) are dropped and put back where the
+# extracted expression needs them. Let bindings and loops inside expressions
+# are optimized separately and are opaque to the e-graph.
+
+
+# Cost of a node of each class (and operator), for the extraction
+COSTS = {
+  func.BinaryOp: 1,
+  func.UnaryOp: 1,
+  func.If: 2,
+  func.ArrayRef: 2,
+  func.FuncCall: 4,
+}
+OP_COSTS = {'*': 2, '/': 8, '%': 8}
+
+
+def node_cost(symbol):
+  if len(symbol) > 1 and symbol[1] in OP_COSTS and symbol[0] is func.BinaryOp:
+    return OP_COSTS[symbol[1]]
+  return COSTS.get(symbol[0], 1)
+
+
+class EGraph(object):
+  def __init__(self):
+    # Union-find over class ids
+    self.parent = []
+    # Node (symbol, canonical class of each operand) -> class
+    self.memo = {}
+    # Class -> its nodes, the nodes using it as an operand (with their class)
+    self.nodes = {}
+    self.uses = {}
+    # Class -> constant value, and the class of each value
+    self.constants = {}
+    self.values = {}
+    # Classes with a function call in one of their expressions
+    self.impure = set()
+    # A func_ast node for each symbol, the leaves as they are and the others
+    # to rebuild with the extracted operands
+    self.templates = {}
+    # Classes to repair on rebuild
+    self.pending = []
+    self.unions = 0
+
+  def __len__(self):
+    return len(self.memo)
+
+  def find(self, cls):
+    parent = self.parent
+    while parent[cls] != cls:
+      parent[cls] = parent[parent[cls]]
+      cls = parent[cls]
+    return cls
+
+  def canonical(self, node):
+    return (node[0], tuple([self.find(child) for child in node[1]]))
+
+  def add_node(self, node, template):
+    """ Class of a node (symbol, operand classes), added if new. """
+    node = self.canonical(node)
+    cls = self.memo.get(node)
+    if cls is not None:
+      return self.find(cls)
+    cls = len(self.parent)
+    self.parent.append(cls)
+    self.memo[node] = cls
+    self.nodes[cls] = [node]
+    self.uses[cls] = []
+    symbol, children = node
+    self.templates.setdefault(symbol, template)
+    for child in children:
+      self.uses[child].append((node, cls))
+
+    if symbol[0] is func.FuncCall or any([child in self.impure for child in children]):
+      self.impure.add(cls)
+    value = self.fold(symbol, children)
+    if value is not None:
+      self.constants[cls] = value
+      other = self.values.get(value)
+      if other is None:
+        self.values[value] = cls
+      else:
+        cls = self.union(cls, other)
+      if symbol[0] is not func.Constant:
+        cls = self.union(cls, self.add_node(((func.Constant, str(value)), ()), constant(value)))
+    return cls
+
+  def fold(self, symbol, children):
+    if symbol[0] is func.Constant:
+      return int_value(func.Constant(symbol[1]))
+    values = [self.constants.get(child) for child in children]
+    if None in values or not values:
+      return None
+    if symbol[0] is func.BinaryOp and symbol[1] in FOLD:
+      return FOLD[symbol[1]](values[0], values[1])
+    if symbol[0] is func.UnaryOp:
+      if symbol[1] == '-':
+        return -values[0]
+      if symbol[1] == '!':
+        return int(not values[0])
+    return None
+
+  def add(self, expr, opaque):
+    """ Class of a func_ast expression. Nodes that are not expressions are
+        passed to opaque and added as leaves.
+    """
+    # Post-order walk, the class of each operand on the results stack.
+    results = []
+    stack = [(expr, False)]
+    while stack:
+      node, done = stack.pop()
+      if done:
+        count = len(operands(node))
+        children = results[len(results) - count:]
+        del results[len(results) - count:]
+        results.append(self.add_node((node_symbol(node), tuple(children)), node))
+        continue
+      node = _unwrap(node)
+      if isinstance(node, (func.Binding, func.ParallelBinding, func.RecursiveFunction, func.ArgsRecList)):
+        node = opaque(node)
+        cls = self.add_node(((func.Node, id(node)), ()), node)
+        self.taint(cls)
+        results.append(cls)
+        continue
+      stack.append((node, True))
+      for child in reversed(operands(node)):
+        stack.append((child, False))
+    return results[0]
+
+  def union(self, a, b):
+    a, b = self.find(a), self.find(b)
+    if a == b:
+      return a
+    if len(self.uses[a]) < len(self.uses[b]):
+      a, b = b, a
+    self.parent[b] = a
+    self.unions += 1
+    self.nodes[a] += self.nodes.pop(b)
+    self.uses[a] += self.uses.pop(b)
+    if (a in self.impure) != (b in self.impure):
+      # The users of the pure one are not any more.
+      self.impure.discard(a)
+      self.impure.discard(b)
+      self.taint(a)
+    if b in self.constants:
+      self.constants[a] = self.constants.pop(b)
+      self.values[self.constants[a]] = a
+    self.pending.append(a)
+    return a
+
+  # Marks a class and the classes using it as having a call.
+  def taint(self, cls):
+    stack = [cls]
+    while stack:
+      cls = self.find(stack.pop())
+      if not cls in self.impure:
+        self.impure.add(cls)
+        stack.extend([user for node, user in self.uses[cls]])
+
+  def rebuild(self):
+    """ Restores congruence: merges the nodes whose operands became equivalent. """
+    while self.pending:
+      todo = set([self.find(cls) for cls in self.pending])
+      self.pending = []
+      for cls in todo:
+        self.repair(self.find(cls))
+
+  def repair(self, cls):
+    uses = self.uses[cls]
+    for node, user in uses:
+      if node in self.memo:
+        del self.memo[node]
+    merged = {}
+    for node, user in uses:
+      node = self.canonical(node)
+      if node in merged:
+        self.union(user, merged[node])
+      merged[node] = self.find(user)
+      self.memo[node] = merged[node]
+    self.uses[self.find(cls)] = list(merged.items())
+
+  def classes(self):
+    return list(self.nodes)
+
+  def class_nodes(self, cls):
+    # Canonical and without duplicates
+    nodes = []
+    seen = set()
+    for node in self.nodes[cls]:
+      node = self.canonical(node)
+      if not node in seen:
+        seen.add(node)
+        nodes.append(node)
+    self.nodes[cls] = nodes
+    return nodes
+
+  # Pattern matching
+
+  def match(self, pattern, cls, matches):
+    """ Yields the matches of pattern in class cls, extending matches. """
+    cls = self.find(cls)
+    if isinstance(pattern, Var):
+      if pattern.constant and not cls in self.constants:
+        return
+      if pattern.name in matches:
+        if self.find(matches[pattern.name]) == cls:
+          yield matches
+        return
+      matches = dict(matches)
+      matches[pattern.name] = cls
+      yield matches
+      return
+    symbol = node_symbol(pattern)
+    subpatterns = operands(pattern)
+    for node in list(self.nodes[cls]):
+      if node[0] == symbol:
+        for found in self.match_all(subpatterns, node[1], matches):
+          yield found
+
+  def match_all(self, patterns, classes, matches):
+    if not patterns:
+      yield matches
+      return
+    for found in self.match(patterns[0], classes[0], matches):
+      for rest in self.match_all(patterns[1:], classes[1:], found):
+        yield rest
+
+  def instantiate(self, pattern, matches):
+    if isinstance(pattern, Var):
+      return self.find(matches[pattern.name])
+    children = tuple([self.instantiate(child, matches) for child in operands(pattern)])
+    return self.add_node((node_symbol(pattern), children), pattern)
+
+  # Extraction
+
+  def extract(self, cls, cost=node_cost):
+    """ The cheapest expression of class cls. """
+    best = {}
+    changed = True
+    while changed:
+      changed = False
+      for c in self.classes():
+        for node in self.class_nodes(c):
+          total = cost(node[0])
+          for child in node[1]:
+            child = self.find(child)
+            if not child in best:
+              total = None
+              break
+            total += best[child][0]
+          if total is not None and (not c in best or total < best[c][0]):
+            best[c] = (total, node)
+            changed = True
+
+    built = {}
+    stack = [(self.find(cls), False)]
+    while stack:
+      c, done = stack.pop()
+      if c in built:
+        continue
+      node = best[c][1]
+      children = [self.find(child) for child in node[1]]
+      if not done:
+        stack.append((c, True))
+        stack.extend([(child, False) for child in children if not child in built])
+        continue
+      template = self.templates[node[0]]
+      if children:
+        built[c] = _parenthesize(rebuild(template, [built[child] for child in children]))
+      else:
+        built[c] = template
+    return built[self.find(cls)]
+
+
+def _unwrap(node):
+  while True:
+    if isinstance(node, func.Constant) and isinstance(node.value, func.Node):
+      node = node.value
+    elif isinstance(node, func.ReturnTuple) and len(node.exprs) == 1:
+      node = node.exprs[0]
+    else:
+      return node
+
+
+# C precedence of the binary operators
+PRECEDENCE = {
+  '||': 1, '&&': 2, '|': 3, '^': 4, '&': 5,
+  '==': 6, '!=': 6,
+  '<': 7, '<=': 7, '>': 7, '>=': 7,
+  '<<': 8, '>>': 8,
+  '+': 9, '-': 9,
+  '*': 10, '/': 10, '%': 10,
+}
+
+def _precedence(node):
+  if isinstance(node, func.BinaryOp):
+    return PRECEDENCE.get(node.op, 0)
+  if isinstance(node, func.If):
+    return 0
+  return 20
+
+def _group(node, parent, right):
+  precedence = _precedence(node)
+  if precedence < parent or (right and precedence == parent):
+    return func.ReturnTuple([node])
+  return node
+
+# Puts back the parentheses an operator needs around its operands.
+def _parenthesize(node):
+  if isinstance(node, func.BinaryOp):
+    precedence = _precedence(node)
+    return func.BinaryOp(node.op, _group(node.left, precedence, False), _group(node.right, precedence, True))
+  if isinstance(node, func.UnaryOp):
+    return func.UnaryOp(node.op, _group(node.expr, 20, False))
+  return node
+
+
+class Equality(object):
+  def __init__(self, name, pattern, replacement, guard=None):
+    self.name = name
+    self.pattern = pattern
+    self.replacement = replacement
+    self.guard = guard
+
+  def apply(self, egraph, matches):
+    """ The class equal to a match of the pattern, or None. """
+    if self.guard is not None and not self.guard(egraph, matches):
+      return None
+    if callable(self.replacement):
+      return self.replacement(egraph, matches)
+    return egraph.instantiate(self.replacement, matches)
+
+
+def _pure(*names):
+  return lambda egraph, matches: not any([egraph.find(matches[name]) in egraph.impure for name in names])
+
+def _choose(value):
+  def choose(egraph, matches):
+    if bool(egraph.constants[egraph.find(matches['c'])]) != value:
+      return None
+    return matches['a']
+  return choose
+
+
+A, B, C = Var('a'), Var('b'), Var('c')
+K = Var('c', constant=True)
+ZERO, ONE, TWO = func.Constant('0'), func.Constant('1'), func.Constant('2')
+
+def _bin(op, left, right):
+  return func.BinaryOp(op, left, right)
+
+RULES = [
+  Equality("add-commute", _bin('+', A, B), _bin('+', B, A)),
+  Equality("mul-commute", _bin('*', A, B), _bin('*', B, A)),
+  Equality("eq-commute", _bin('==', A, B), _bin('==', B, A)),
+  Equality("ne-commute", _bin('!=', A, B), _bin('!=', B, A)),
+  Equality("add-assoc", _bin('+', _bin('+', A, B), C), _bin('+', A, _bin('+', B, C))),
+  Equality("add-assoc-left", _bin('+', A, _bin('+', B, C)), _bin('+', _bin('+', A, B), C)),
+  Equality("mul-assoc", _bin('*', _bin('*', A, B), C), _bin('*', A, _bin('*', B, C))),
+  Equality("mul-assoc-left", _bin('*', A, _bin('*', B, C)), _bin('*', _bin('*', A, B), C)),
+  Equality("add-sub-assoc", _bin('-', _bin('+', A, B), C), _bin('+', A, _bin('-', B, C))),
+  Equality("sub-add-assoc", _bin('+', A, _bin('-', B, C)), _bin('-', _bin('+', A, B), C)),
+  Equality("sub-sub", _bin('-', A, _bin('+', B, C)), _bin('-', _bin('-', A, B), C)),
+  Equality("sub-sub-left", _bin('-', _bin('-', A, B), C), _bin('-', A, _bin('+', B, C))),
+  Equality("add-zero", _bin('+', A, ZERO), A),
+  Equality("sub-zero", _bin('-', A, ZERO), A),
+  Equality("mul-one", _bin('*', A, ONE), A),
+  Equality("div-one", _bin('/', A, ONE), A),
+  Equality("mul-zero", _bin('*', A, ZERO), ZERO, _pure('a')),
+  Equality("sub-self", _bin('-', A, A), ZERO, _pure('a')),
+  Equality("add-self", _bin('+', A, A), _bin('*', A, TWO), _pure('a')),
+  Equality("factor", _bin('+', _bin('*', A, B), _bin('*', A, C)), _bin('*', A, _bin('+', B, C)), _pure('a')),
+  Equality("factor-sub", _bin('-', _bin('*', A, B), _bin('*', A, C)), _bin('*', A, _bin('-', B, C)), _pure('a')),
+  Equality("factor-one", _bin('+', _bin('*', A, B), A), _bin('*', A, _bin('+', B, ONE)), _pure('a')),
+  Equality("neg-neg", func.UnaryOp('-', func.UnaryOp('-', A)), A),
+  Equality("add-neg", _bin('+', A, func.UnaryOp('-', B)), _bin('-', A, B)),
+  Equality("sub-neg", _bin('-', A, func.UnaryOp('-', B)), _bin('+', A, B)),
+  Equality("zero-sub", _bin('-', ZERO, A), func.UnaryOp('-', A)),
+  Equality("lt-gt", _bin('<', A, B), _bin('>', B, A)),
+  Equality("gt-lt", _bin('>', A, B), _bin('<', B, A)),
+  Equality("le-ge", _bin('<=', A, B), _bin('>=', B, A)),
+  Equality("ge-le", _bin('>=', A, B), _bin('<=', B, A)),
+  Equality("not-lt", func.UnaryOp('!', _bin('<', A, B)), _bin('>=', A, B)),
+  Equality("not-le", func.UnaryOp('!', _bin('<=', A, B)), _bin('>', A, B)),
+  Equality("not-gt", func.UnaryOp('!', _bin('>', A, B)), _bin('<=', A, B)),
+  Equality("not-ge", func.UnaryOp('!', _bin('>=', A, B)), _bin('<', A, B)),
+  Equality("not-eq", func.UnaryOp('!', _bin('==', A, B)), _bin('!=', A, B)),
+  Equality("not-ne", func.UnaryOp('!', _bin('!=', A, B)), _bin('==', A, B)),
+  Equality("if-not", func.If(func.UnaryOp('!', C), A, B), func.If(C, B, A)),
+  Equality("if-same", func.If(C, A, A), A, _pure('c')),
+  Equality("if-true", func.If(K, A, B), _choose(True)),
+  Equality("if-false", func.If(K, B, A), _choose(False)),
+]
+
+
+class EGraphOptimizer(ExpressionRewriter):
+  # Each expression of the translation is optimized in its own e-graph.
+  def __init__(self, rules=None, cost=node_cost, max_nodes=5000, max_iterations=20, time_limit=1.0):
+    ExpressionRewriter.__init__(self)
+    self.rules = RULES if rules is None else rules
+    self.cost = cost
+    self.max_nodes = max_nodes
+    self.max_iterations = max_iterations
+    self.time_limit = time_limit
+    # Expressions optimized, and those stopped by a limit before saturating
+    self.expressions = 0
+    self.stopped = 0
+
+  # The applications counted in applied are the new equalities.
+  def normalize(self, node):
+    if isinstance(node, (func.Binding, func.ParallelBinding, func.RecursiveFunction)):
+      return self.walk(node)
+    if isinstance(node, func.ReturnTuple):
+      # The tuples returned by the blocks and their branches
+      return func.ReturnTuple([self.normalize(expr) for expr in node.exprs])
+    if not operands(_unwrap(node)):
+      return node
+    return self.optimize(node)
+
+  def optimize(self, expr):
+    """ The cheapest expression equivalent to expr found within the limits. """
+    self.expressions += 1
+    egraph = EGraph()
+    root = egraph.add(expr, self.walk)
+    deadline = None if self.time_limit is None else time.monotonic() + self.time_limit
+    saturated = False
+    for _ in range(self.max_iterations):
+      size, unions = len(egraph), egraph.unions
+      # Find every match first, then apply them.
+      found = []
+      for cls in egraph.classes():
+        for rule in self.rules:
+          for matches in egraph.match(rule.pattern, cls, {}):
+            found.append((rule, cls, matches))
+        if deadline is not None and time.monotonic() > deadline:
+          found = []
+          break
+      if not found:
+        saturated = deadline is None or time.monotonic() <= deadline
+        break
+      for rule, cls, matches in found:
+        new = rule.apply(egraph, matches)
+        if new is None:
+          continue
+        if egraph.find(new) != egraph.find(cls):
+          egraph.union(cls, new)
+          self.applied[rule.name] = self.applied.get(rule.name, 0) + 1
+        if len(egraph) > self.max_nodes:
+          break
+      egraph.rebuild()
+      if len(egraph) == size and egraph.unions == unions:
+        saturated = True
+        break
+      if len(egraph) > self.max_nodes or (deadline is not None and time.monotonic() > deadline):
+        break
+    if not saturated:
+      self.stopped += 1
+    return egraph.extract(root, self.cost)
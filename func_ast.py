@@ -10,6 +10,13 @@ class Node(object):
         """
         pass
 
+    def __iter__(self):
+        """ Iterates over the children that are Nodes, in the order
+            of children(), without building their names or a
+            container. Generated by child_iterator.
+        """
+        return iter(())
+
     def show(self, buf=sys.stdout, offset=0, attrnames=False, nodenames=False, showcoord=False, _my_node_name=None):
         """ Pretty print the Node and all its attributes and
             children (recursively) to a buffer.
@@ -61,6 +68,33 @@ class Node(object):
                 _my_node_name=child_name)
 
 
+def child_iterator(*fields):
+    """ Class decorator generating the __iter__ of a node class from
+        the attributes that hold its children (a child or a list of
+        children), in the order of children(). Values that are not
+        Nodes (e.g. names) are skipped. The source of __iter__ is
+        generated for the fields, so that it runs as fast as one
+        written by hand for the class.
+    """
+    lines = ['def __iter__(self):']
+    for field in fields:
+        lines += ['    child = self.%s' % field,
+                  '    if isinstance(child, Node):',
+                  '        yield child',
+                  '    elif child is not None and not isinstance(child, str):',
+                  '        for item in child:',
+                  '            if isinstance(item, Node):',
+                  '                yield item']
+    namespace = {'Node': Node}
+    exec('\n'.join(lines), namespace)
+    __iter__ = namespace['__iter__']
+
+    def generate(cls):
+        cls.__iter__ = __iter__
+        return cls
+    return generate
+
+
 class NodeVisitor(object):
     """ A base NodeVisitor class for visiting c_ast nodes.
         Subclass it and define your own visit_XXX methods, where
@@ -105,10 +139,11 @@ class NodeVisitor(object):
         """ Called if no explicit visitor function exists for a
             node. Implements preorder visiting of the node.
         """
-        for c_name, c in node.children():
+        for c in node:
             self.visit(c)
 
 
+@child_iterator('name', 'subscript')
 class ArrayRef(Node):
     __slots__ = ('name', 'subscript', 'coord', '__weakref__')
 
@@ -128,12 +163,13 @@ class ArrayRef(Node):
         if self.name is not None: nodelist.append(("name", self.name))
         if self.subscript is not None: nodelist.append(("subscript", self.subscript))
         return tuple(nodelist)
-    
+
     def __str__(self):
         return "{}[{}]".format(str(self.name), self.subscript)
 
     attr_names = ()
 
+@child_iterator('expr')
 class UnaryOp(Node):
     __slots__ = ('op', 'expr', 'coord', '__weakref__')
 
@@ -153,6 +189,7 @@ class UnaryOp(Node):
     attr_names = ('op', )
 
 
+@child_iterator('left', 'right')
 class BinaryOp(Node):
     __slots__ = ('op', 'left', 'right', 'coord', '__weakref__')
 
@@ -191,6 +228,7 @@ class Constant(Node):
     attr_names = ('type', 'value', )
 
 
+@child_iterator('exprs')
 class ExprList(Node):
     __slots__ = ('exprs', 'coord', '__weakref__')
 
@@ -210,6 +248,7 @@ class ExprList(Node):
     attr_names = ()
 
 
+@child_iterator('name', 'args')
 class FuncCall(Node):
     __slots__ = ('name', 'args', 'coord', '__weakref__')
 
@@ -230,13 +269,15 @@ class FuncCall(Node):
     attr_names = ()
 
 
+@child_iterator('body', 'input_args', 'output_vars')
 class FuncDef(Node):
-    __slots__ = ('input_args', 'output_vars', 'body', 'coord', '__weakref__')
+    __slots__ = ('input_args', 'output_vars', 'body', 'name', 'coord', '__weakref__')
 
-    def __init__(self, input_args, output_vars, body, coord=None):
+    def __init__(self, input_args, output_vars, body, name="code_block", coord=None):
         self.input_args = input_args
         self.output_vars = output_vars
         self.body = body
+        self.name = name
         self.coord = coord
 
     def children(self):
@@ -247,9 +288,9 @@ class FuncDef(Node):
         return tuple(nodelist)
 
     def __str__(self):
-        return "fun code_block{} return {} = \n {}".format(self.input_args, self.output_vars, self.body)
+        return "fun {}{} return {} = \n {}".format(self.name, self.input_args, self.output_vars, self.body)
 
-    attr_names = ()
+    attr_names = ('name', )
 
 
 class ID(Node):
@@ -275,6 +316,7 @@ class ID(Node):
     attr_names = ('name', )
 
 
+@child_iterator('cond', 'iftrue', 'iffalse')
 class If(Node):
     __slots__ = ('cond', 'iftrue', 'iffalse', 'coord', '__weakref__')
     def __init__(self, cond, iftrue, iffalse, coord=None):
@@ -296,6 +338,7 @@ class If(Node):
     attr_names = ()
 
 
+@child_iterator('args')
 class ArgsList(Node):
     __slots__ = ('args', 'coord', '__weakref__')
 
@@ -315,6 +358,7 @@ class ArgsList(Node):
 
     attr_names = ()
 
+@child_iterator('args')
 class ArgsRecList(Node):
     __slots__ = ('loop_id', 'args', 'coord', '__weakref__')
 
@@ -335,6 +379,7 @@ class ArgsRecList(Node):
         return "{} {}".format(self.loop_id, ' '.join(args))
 
 
+@child_iterator('id', 'expr1', 'expr2')
 class Binding(Node):
     __slots__ = ('id', 'expr1', 'expr2', 'coord', '__weakref__')
 
@@ -350,13 +395,38 @@ class Binding(Node):
         if self.expr1 is not None: nodelist.append(("expr", self.expr1))
         if self.expr2 is not None: nodelist.append(("expr", self.expr2))
         return tuple(nodelist)
-    
+
     def __str__(self):
         return "let {} = {} in {}".format(self.id, self.expr1, self.expr2)
 
     attr_names = ()
 
 
+@child_iterator('bindings', 'expr2')
+class ParallelBinding(Node):
+    __slots__ = ('bindings', 'expr2', 'coord', '__weakref__')
+
+    def __init__(self, bindings, expr2, coord=None):
+        # Bindings evaluated simultaneously, their expr2 is not used.
+        self.bindings = bindings
+        self.expr2 = expr2
+        self.coord = coord
+
+    def children(self):
+        nodelist = []
+        for i, child in enumerate(self.bindings or []):
+            nodelist.append(("bindings[%d]" % i, child))
+        if self.expr2 is not None: nodelist.append(("expr", self.expr2))
+        return tuple(nodelist)
+
+    def __str__(self):
+        bindings = ["{} = {}".format(binding.id, binding.expr1) for binding in self.bindings]
+        return "let {} in {}".format(' and '.join(bindings), self.expr2)
+
+    attr_names = ()
+
+
+@child_iterator('args', 'expr1', 'expr2')
 class RecursiveFunction(Node):
     __slots__ = ('id', 'args', 'expr1', 'expr2', 'coord', '__weakref__')
 
@@ -372,13 +442,14 @@ class RecursiveFunction(Node):
         if self.expr1 is not None: nodelist.append(("expr1", self.args))
         if self.expr2 is not None: nodelist(("expr2", self.expr2))
         return tuple(nodelist)
-  
+
     def __str__(self):
         return "let rec {} = {} in {}".format(self.args, self.expr1, self.expr2)
 
     attr_names = ()
 
 
+@child_iterator('exprs')
 class ReturnTuple(Node):
     __slots__ = ('exprs', 'coord')
 
@@ -5,16 +5,29 @@ sys.path.extend(['.', '..'])
 
 #ast = parse_file('./tutorial.c')
 
+# Wraps a code block into a main function so it can be parsed as a C file.
+# The block is kept on its own lines so that preprocessor directives and line
+# comments in it stay at the start/end of a line.
+def wrap_function(code):
+  opening = "int main(int argc, char** argv) {"
+  end = "}"
+  return opening + "\n" + code + "\n" + end
+
 def function_wrapper(filepath):
   function = ""
   with open(filepath, "r") as file:
-    opening = "int main(int argc, char** argv) {"
-    end = "}"
-    function = opening + file.read() + end
+    function = wrap_function(file.read())
 
   output_c = filepath + "_out.c" if not filepath.endswith(".txt") else filepath.replace(".txt", "_out.c")
 
   with open(output_c, "w") as file:
     file.write(function)
   
-  return output_c
\ No newline at end of file
+  return output_c
+
+# Short one-line description of an error raised while translating an input.
+# Unsupported constructs carry the whole pycparser node, only its class is kept.
+def describe_error(e):
+  if e.args and hasattr(e.args[0], '__slots__'):
+    return "{}: Unsupported construct {}".format(e.__class__.__name__, e.args[0].__class__.__name__)
+  return "{}: {}".format(e.__class__.__name__, e)
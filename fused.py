@@ -0,0 +1,102 @@
+from pycparser import c_ast
+from minic.c_ast_to_minic import HANDLERS, INCREMENTS, ErrorUnsupportedConstruct
+from transform_func import AST_C, FunctionalTranslator
+
+# Translation of a pycparser tree straight to func_ast, without building its
+# minic conversion first.
+#
+#   ftranslator = fused_translator(ast)       # None: use the minic tree
+#   print(ftranslator.translate())
+#
+# FusedAST_C is AST_C reading the pycparser nodes (which have the same names
+# and fields as the minic ones, except Compound for Block), and doing the
+# desugarings of c_ast_to_minic on the statements it visits: x op= e is
+# translated as x = x op e, and x++, ++x, x--, --x as x = x + 1 and x = x - 1.
+#
+# The translation has to be the same as through minic, so the constructs the
+# minic conversion does not take as they are (the unsupported ones, and those
+# where it fails or changes the tree in a way AST_C then sees) are not
+# translated here: FusedAST_C raises ErrorUnsupportedConstruct, and
+# fused_translator leaves the block to the usual pipeline, which then gives
+# the same result or error as without fusion. Other errors are the ones the
+# translation of the minic tree raises too, and are not caught. The options
+# that work on the minic tree (ssa, minimal_loops, closed_form) also go
+# through it.
+
+# Options of FunctionalTranslator that need the minic tree
+MINIC_OPTIONS = ("ssa", "minimal_loops", "closed_form")
+
+# pycparser classes visited as they are; the minic conversion of
+# NamedInitializer fails on its list of names.
+SUPPORTED = frozenset([cls for cls in HANDLERS if cls.__module__.endswith('c_ast')]) - \
+  frozenset([c_ast.NamedInitializer])
+
+ONE = c_ast.Constant('int', '1')
+
+
+# The assignment x = ... that a pycparser assignment or increment is
+# converted to, other nodes as they are.
+def desugar(node):
+  if node.__class__ is c_ast.Assignment and node.op != '=':
+    return c_ast.Assignment('=', node.lvalue, c_ast.BinaryOp(node.op[:-1], node.lvalue, node.rvalue))
+  if node.__class__ is c_ast.UnaryOp and node.op in INCREMENTS:
+    return c_ast.Assignment('=', node.expr, c_ast.BinaryOp(node.op[-1], node.expr, ONE))
+  return node
+
+
+class FusedAST_C(AST_C):
+  nodes = c_ast
+
+  # Increments inside expressions are assignments in minic, which AST_C
+  # does not translate.
+  def expr(self, _class, value):
+    if _class is c_ast.UnaryOp and value.op in INCREMENTS:
+      raise ErrorUnsupportedConstruct(value)
+    return AST_C.expr(self, _class, value)
+
+  def generic_visit(self, node):
+    if not node.__class__ in SUPPORTED:
+      raise ErrorUnsupportedConstruct(node)
+    AST_C.generic_visit(self, node)
+
+  def visit_Compound(self, compound):
+    self.generic_visit(compound)
+
+  def visit_Assignment(self, assignment):
+    AST_C.visit_Assignment(self, desugar(assignment))
+
+  def visit_UnaryOp(self, unaryop):
+    assignment = desugar(unaryop)
+    if assignment is unaryop:
+      self.generic_visit(unaryop)
+    else:
+      self.visit_Assignment(assignment)
+
+  def visit_For(self, for_loop):
+    next = desugar(for_loop.next)
+    if not next.__class__ is c_ast.Assignment or not next.lvalue.__class__ is c_ast.ID:
+      raise ErrorUnsupportedConstruct(for_loop.next)
+    AST_C.visit_For(self, c_ast.For(for_loop.init, for_loop.cond, next, for_loop.stmt))
+
+  def visit_Decl(self, decl):
+    if decl.init is None or isinstance(decl.init, c_ast.InitList):
+      self.generic_visit(decl)
+    else:
+      self.visit_Assignment(c_ast.Assignment('=', c_ast.ID(decl.name), decl.init))
+
+  # The type names are not visited, but the minic conversion of the other
+  # types (struct, union, enum) fails.
+  def visit_TypeDecl(self, type_decl):
+    if not type_decl.type.__class__ in SUPPORTED:
+      raise ErrorUnsupportedConstruct(type_decl.type)
+
+
+# FunctionalTranslator of the pycparser tree ast, or None if the block has to
+# be translated from its minic tree.
+def fused_translator(ast, simplify=True, **options):
+  if any([options.get(option) for option in MINIC_OPTIONS]):
+    return None
+  try:
+    return FunctionalTranslator(ast, simplify, fused=True, **options)
+  except ErrorUnsupportedConstruct:
+    return None
@@ -20,6 +20,13 @@ class Node(object):
         """
         pass
 
+    def __iter__(self):
+        """ Iterates over the children that are Nodes, in the order
+            of children(), without building their names or a
+            container. Generated by child_iterator.
+        """
+        return iter(())
+
     def show(self, buf=sys.stdout, offset=0, attrnames=False, nodenames=False, showcoord=False, _my_node_name=None):
         """ Pretty print the Node and all its attributes and
             children (recursively) to a buffer.
@@ -71,6 +78,33 @@ class Node(object):
                 _my_node_name=child_name)
 
 
+def child_iterator(*fields):
+    """ Class decorator generating the __iter__ of a node class from
+        the attributes that hold its children (a child or a list of
+        children), in the order of children(). Values that are not
+        Nodes (e.g. names) are skipped. The source of __iter__ is
+        generated for the fields, so that it runs as fast as one
+        written by hand for the class.
+    """
+    lines = ['def __iter__(self):']
+    for field in fields:
+        lines += ['    child = self.%s' % field,
+                  '    if isinstance(child, Node):',
+                  '        yield child',
+                  '    elif child is not None and not isinstance(child, str):',
+                  '        for item in child:',
+                  '            if isinstance(item, Node):',
+                  '                yield item']
+    namespace = {'Node': Node}
+    exec('\n'.join(lines), namespace)
+    __iter__ = namespace['__iter__']
+
+    def generate(cls):
+        cls.__iter__ = __iter__
+        return cls
+    return generate
+
+
 class NodeVisitor(object):
     """ A base NodeVisitor class for visiting c_ast nodes.
         Subclass it and define your own visit_XXX methods, where
@@ -115,10 +149,11 @@ class NodeVisitor(object):
         """ Called if no explicit visitor function exists for a
             node. Implements preorder visiting of the node.
         """
-        for c_name, c in node.children():
+        for c in node:
             self.visit(c)
 
 
+@child_iterator('type', 'dim')
 class ArrayDecl(Node):
     __slots__ = ('type', 'dim', 'coord', '__weakref__')
     def __init__(self, type, dim, coord=None):
@@ -135,6 +170,7 @@ class ArrayDecl(Node):
     attr_names = ('dim_quals', )
 
 
+@child_iterator('name', 'subscript')
 class ArrayRef(Node):
     __slots__ = ('name', 'subscript', 'coord', '__weakref__')
     def __init__(self, name, subscript, coord=None):
@@ -151,6 +187,7 @@ class ArrayRef(Node):
     attr_names = ()
 
 
+@child_iterator('lvalue', 'rvalue')
 class Assignment(Node):
     __slots__ = ('lvalue', 'rvalue', 'coord', '__weakref__')
 
@@ -166,6 +203,7 @@ class Assignment(Node):
         return tuple(nodelist)
 
 
+@child_iterator('left', 'right')
 class BinaryOp(Node):
     __slots__ = ('op', 'left', 'right', 'coord', '__weakref__')
 
@@ -184,6 +222,7 @@ class BinaryOp(Node):
     attr_names = ('op', )
 
 
+@child_iterator('block_items')
 class Block(Node):
     __slots__ = ('block_items', 'coord', '__weakref__')
 
@@ -215,6 +254,7 @@ class Constant(Node):
     attr_names = ('type', 'value', )
 
 
+@child_iterator('type', 'init')
 class Decl(Node):
     __slots__ = ('name', 'funcspec', 'type', 'init', 'coord', '__weakref__')
 
@@ -234,6 +274,7 @@ class Decl(Node):
     attr_names = ('name', 'funcspec', )
 
 
+@child_iterator('decls')
 class DeclList(Node):
     __slots__ = ('decls', 'coord', '__weakref__')
 
@@ -251,6 +292,7 @@ class DeclList(Node):
 
 
 
+@child_iterator('cond', 'stmt')
 class DoWhile(Node):
     __slots__ = ('cond', 'stmt', 'coord', '__weakref__')
 
@@ -279,6 +321,7 @@ class EmptyStatement(Node):
     attr_names = ()
 
 
+@child_iterator('exprs')
 class ExprList(Node):
     __slots__ = ('exprs', 'coord', '__weakref__')
 
@@ -295,6 +338,7 @@ class ExprList(Node):
     attr_names = ()
 
 
+@child_iterator('ext')
 class FileAST(Node):
     __slots__ = ('ext', 'coord', '__weakref__')
 
@@ -311,6 +355,7 @@ class FileAST(Node):
     attr_names = ()
 
 
+@child_iterator('init', 'cond', 'next', 'stmt')
 class For(Node):
     __slots__ = ('init', 'cond', 'next', 'stmt', 'coord', '__weakref__')
 
@@ -332,6 +377,7 @@ class For(Node):
     attr_names = ()
 
 
+@child_iterator('name', 'args')
 class FuncCall(Node):
     __slots__ = ('name', 'args', 'coord', '__weakref__')
 
@@ -349,6 +395,7 @@ class FuncCall(Node):
     attr_names = ()
 
 
+@child_iterator('args', 'type')
 class FuncDecl(Node):
     __slots__ = ('args', 'type', 'coord', '__weakref__')
 
@@ -366,6 +413,7 @@ class FuncDecl(Node):
     attr_names = ()
 
 
+@child_iterator('decl', 'body', 'param_decls')
 class FuncDef(Node):
     __slots__ = ('decl', 'param_decls', 'body', 'coord', '__weakref__')
 
@@ -413,6 +461,7 @@ class IdentifierType(Node):
     attr_names = ('names', )
 
 
+@child_iterator('cond', 'iftrue', 'iffalse')
 class If(Node):
     __slots__ = ('cond', 'iftrue', 'iffalse', 'coord', '__weakref__')
     def __init__(self, cond, iftrue, iffalse, coord=None):
@@ -431,6 +480,7 @@ class If(Node):
     attr_names = ()
 
 
+@child_iterator('exprs')
 class InitList(Node):
     __slots__ = ('exprs', 'coord', '__weakref__')
 
@@ -447,6 +497,7 @@ class InitList(Node):
     attr_names = ()
 
 
+@child_iterator('stmt')
 class Label(Node):
     __slots__ = ('name', 'stmt', 'coord', '__weakref__')
 
@@ -463,6 +514,7 @@ class Label(Node):
     attr_names = ('name', )
 
 
+@child_iterator('expr', 'name')
 class NamedInitializer(Node):
     __slots__ = ('name', 'expr', 'coord', '__weakref__')
 
@@ -481,6 +533,7 @@ class NamedInitializer(Node):
     attr_names = ()
 
 
+@child_iterator('params')
 class ParamList(Node):
     __slots__ = ('params', 'coord', '__weakref__')
 
@@ -497,6 +550,7 @@ class ParamList(Node):
     attr_names = ()
 
 
+@child_iterator('type')
 class PtrDecl(Node):
     __slots__ = ('type', 'coord', '__weakref__')
 
@@ -512,6 +566,7 @@ class PtrDecl(Node):
     attr_names = ('quals', )
 
 
+@child_iterator('expr')
 class Return(Node):
     __slots__ = ('expr', 'coord', '__weakref__')
 
@@ -527,6 +582,7 @@ class Return(Node):
     attr_names = ()
 
 
+@child_iterator('cond', 'iftrue', 'iffalse')
 class TernaryOp(Node):
     __slots__ = ('cond', 'iftrue', 'iffalse', 'coord', '__weakref__')
 
@@ -546,6 +602,7 @@ class TernaryOp(Node):
     attr_names = ()
 
 
+@child_iterator('type')
 class Typename(Node):
     __slots__ = ('name', 'type', 'coord', '__weakref__')
 
@@ -562,6 +619,7 @@ class Typename(Node):
     attr_names = ('name', )
 
 
+@child_iterator('type')
 class TypeDecl(Node):
     __slots__ = ('declname', 'type', 'coord', '__weakref__')
 
@@ -578,6 +636,7 @@ class TypeDecl(Node):
     attr_names = ('name', )
 
 
+@child_iterator('expr')
 class UnaryOp(Node):
     __slots__ = ('op', 'expr', 'coord', '__weakref__')
 
@@ -594,6 +653,7 @@ class UnaryOp(Node):
     attr_names = ('op', )
 
 
+@child_iterator('decls')
 class Union(Node):
     __slots__ = ('name', 'decls', 'coord', '__weakref__')
 
@@ -611,6 +671,7 @@ class Union(Node):
     attr_names = ('name', )
 
 
+@child_iterator('cond', 'stmt')
 class While(Node):
     __slots__ = ('cond', 'stmt', 'coord', '__weakref__')
 
@@ -0,0 +1,134 @@
+import os
+import sys
+
+# Output sinks for batch translation. Each translated input is written as one
+# record (input path, input text, translation, elapsed time, error) and the
+# sinks buffer records so a large batch is written in a few large writes:
+#
+#   TextSink       the human readable File:/Input:/Output: format
+#   JsonLinesSink  one JSON object per input with its path, SHA-1, translation,
+#                  elapsed time and error (and the input itself with echo)
+#   FilesSink      one <input name>.func file per input, written in bulk
+#
+# echo=False leaves the input text out of the text and JSON lines formats. The
+# input text is None for an input that could not be read: it is not echoed,
+# and its SHA-1 is null.
+
+
+class Sink(object):
+  def __init__(self, buffer_size=1 << 16):
+    self.buffer_size = buffer_size
+    self.buffered = 0
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def write(self, path, source, translation, elapsed=None, error=None):
+    self.buffered += self._add(path, source, translation, elapsed, error)
+    if self.buffered >= self.buffer_size:
+      self.flush()
+
+  def flush(self):
+    self.buffered = 0
+
+  def close(self):
+    self.flush()
+
+
+class _StreamSink(Sink):
+  def __init__(self, outfile=None, echo=True, buffer_size=1 << 16, close_outfile=False):
+    Sink.__init__(self, buffer_size)
+    self.outfile = outfile or sys.stdout
+    self.echo = echo
+    self.close_outfile = close_outfile
+    self.chunks = []
+
+  def _add(self, path, source, translation, elapsed, error):
+    chunk = self._format(path, source, translation, elapsed, error)
+    self.chunks.append(chunk)
+    return len(chunk)
+
+  def flush(self):
+    if self.chunks:
+      self.outfile.write(''.join(self.chunks))
+      self.outfile.flush()
+      self.chunks = []
+    Sink.flush(self)
+
+  def close(self):
+    Sink.close(self)
+    if self.close_outfile:
+      self.outfile.close()
+
+
+class TextSink(_StreamSink):
+  def _format(self, path, source, translation, elapsed, error):
+    lines = ["File: {} ".format(os.path.basename(path))]
+    if self.echo and source is not None:
+      lines += ["Input:", source]
+    if error is None:
+      lines.append("Output:\n{}\n----------".format(translation))
+    else:
+      lines.append("Error: {}\n----------".format(error))
+    return '\n'.join(lines) + '\n'
+
+
+class JsonLinesSink(_StreamSink):
+  def __init__(self, outfile=None, echo=True, buffer_size=1 << 16, close_outfile=False):
+    # Only the structured formats need these.
+    import hashlib
+    import json
+    _StreamSink.__init__(self, outfile, echo, buffer_size, close_outfile)
+    self.sha1 = hashlib.sha1
+    self.dumps = json.dumps
+
+  def _format(self, path, source, translation, elapsed, error):
+    record = {
+      "path": path,
+      "sha1": None if source is None else self.sha1(source.encode('utf-8')).hexdigest(),
+      "translation": translation,
+      "elapsed": elapsed,
+      "error": error,
+    }
+    if self.echo:
+      record["input"] = source
+    return self.dumps(record) + '\n'
+
+
+# Writes the translation (or the error) of each input to
+# <directory>/<input name>.func, or next to the input if no directory is
+# given. The files are written when the buffer is full or the sink is closed.
+class FilesSink(Sink):
+  def __init__(self, directory=None, buffer_size=1 << 20):
+    Sink.__init__(self, buffer_size)
+    self.directory = directory
+    self.files = []
+
+  def _add(self, path, source, translation, elapsed, error):
+    directory = self.directory or os.path.dirname(path)
+    content = translation + '\n' if error is None else "Error: {}\n".format(error)
+    self.files.append((os.path.join(directory, os.path.basename(path) + '.func'), content))
+    return len(content)
+
+  def flush(self):
+    if self.files and self.directory:
+      os.makedirs(self.directory, exist_ok=True)
+    for filepath, content in self.files:
+      with open(filepath, 'w') as fout:
+        fout.write(content)
+    self.files = []
+    Sink.flush(self)
+
+
+# Sink for the run.py --format/--out/--no-echo options. out is a file for
+# text and json, a directory for files.
+def make_sink(format='text', out=None, echo=True):
+  if format == 'files':
+    return FilesSink(out)
+  outfile = open(out, 'w') if out else None
+  if format == 'json':
+    return JsonLinesSink(outfile, echo, close_outfile=outfile is not None)
+  return TextSink(outfile, echo, close_outfile=outfile is not None)
@@ -0,0 +1,57 @@
+from func_utils import wrap_function
+from preprocess import get_parser, parse, preprocess
+from minic.c_ast_to_minic import transform
+from transform_func import FunctionalTranslator
+from fused import fused_translator
+
+# Translation of C source text held in memory, without going through files.
+# Used by the long-lived front-ends (server, async API) that receive source
+# text instead of paths.
+
+
+# Stages of translate_block, in order.
+STAGES = ("preprocess", "parse", "minic", "translate", "emit")
+
+
+def _no_stage(name):
+  pass
+
+
+# Translates a code block the same way run.py -f does for a file. simplify can
+# be True, False or "both"; with "both" a dict with the simplified and the
+# unsimplified translation (from a single traversal) is returned. stage is
+# called with the name of each stage when it starts. statistics, if given, is
+# called with the TranslationStats of the block. With fused, the pycparser
+# tree is translated without a minic tree when it can be (see fused.py), the
+# "minic" stage only comes after the "translate" stage for the blocks where it
+# cannot. options are passed on to FunctionalTranslator (e.g. memo=True).
+def translate_block(source, simplify=True, filepath='', stage=_no_stage, statistics=None, fused=False, **options):
+  stage("preprocess")
+  text = preprocess(wrap_function(source), filepath)
+  stage("parse")
+  ast = get_parser().parse(text, filepath)
+  ftranslator = None
+  if fused:
+    stage("translate")
+    ftranslator = fused_translator(ast, simplify is not False, **options)
+  if ftranslator is None:
+    stage("minic")
+    mast = transform(ast)
+    stage("translate")
+    ftranslator = FunctionalTranslator(mast, simplify is not False, **options)
+  if statistics is not None:
+    statistics(ftranslator.statistics())
+  if simplify == "both":
+    simplified, unsimplified = ftranslator.translate(True), ftranslator.translate(False)
+    stage("emit")
+    return {"simplified": str(simplified), "unsimplified": str(unsimplified)}
+  translation = ftranslator.translate()
+  stage("emit")
+  return str(translation)
+
+
+# Translates every function of a translation unit given as source text.
+# Returns a list of (function name, translation, error) in source order.
+def translate_unit_source(source, simplify=True, filepath='', workers=1):
+  from translation_unit import function_defs, translate_functions
+  return translate_functions(function_defs(parse(source, filepath)), simplify, workers)
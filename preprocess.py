@@ -0,0 +1,456 @@
+import os
+import re
+from collections import OrderedDict
+
+from pycparser import c_parser
+
+# Lightweight built-in C preprocessor, used instead of spawning cpp through
+# pycparser's use_cpp. It handles comments, line continuations, object-like and
+# simple function-like macros (no '#' or '##' in the body), local includes and
+# conditional compilation. System includes (<...>) that cannot be found in the
+# include directories are skipped. The output keeps the line numbers of the
+# input and marks included files with "# line file" markers, which pycparser
+# understands.
+
+
+class ErrorUnsupportedDirective(ValueError):
+  def __init__(self, directive):
+    ValueError.__init__(self, "Unsupported preprocessor directive %s" % directive)
+
+
+_STRING_OR_COMMENT = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|/\*|//')
+_WORD = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|[A-Za-z_]\w*|\d[\w.]*')
+_DIRECTIVE = re.compile(r'\s*#\s*(\w*)\s*(.*?)\s*$', re.S)
+_DEFINE = re.compile(r'([A-Za-z_]\w*)(?:\(([^)]*)\))?\s*(.*)$', re.S)
+_INCLUDE = re.compile(r'(?:"([^"]+)"|<([^>]+)>)')
+_DEFINED = re.compile(r'\bdefined\s*(?:\(\s*([A-Za-z_]\w*)\s*\)|([A-Za-z_]\w*))')
+_TOKEN = re.compile(r'\s*(?:(0[xX][0-9a-fA-F]+|\d+)[uUlL]*(?![\w.])|([A-Za-z_]\w*)|'
+  r'(<<|>>|<=|>=|==|!=|&&|\|\||[-+*/%<>!~&|^?:()]))')
+
+
+class Preprocessor(object):
+  def __init__(self, include_dirs=(), defines=None, cache_size=1024):
+    self.include_dirs = list(include_dirs)
+    self.defines = dict(defines or {})
+    self.cache_size = cache_size
+    # content hash -> (output, [(included path, mtime)])
+    self.cache = OrderedDict()
+
+  # Preprocesses the source text of filepath. Results are cached by the hash
+  # of the text, and reused as long as none of the files it includes has
+  # changed.
+  def preprocess(self, text, filepath=''):
+    # Nothing to do without directives or comments.
+    if '#' not in text and '/' not in text and '\\\n' not in text:
+      return text
+
+    # Only needed past the fast path above.
+    import hashlib
+    key = hashlib.sha1(text.encode('utf-8')).hexdigest() + os.path.dirname(filepath)
+    entry = self.cache.get(key)
+    if entry is not None and all(_mtime(path) == mtime for path, mtime in entry[1]):
+      self.cache.move_to_end(key)
+      return entry[0]
+
+    state = _State(self.defines)
+    output = ''.join(self._lines(text.splitlines(True), filepath, state))
+    self.cache[key] = (output, [(path, _mtime(path)) for path in state.included])
+    if len(self.cache) > self.cache_size:
+      self.cache.popitem(last=False)
+    return output
+
+  # Preprocesses an iterable of lines lazily (not cached).
+  def lines(self, lines, filepath=''):
+    return self._lines(lines, filepath, _State(self.defines))
+
+  def _lines(self, lines, filepath, state):
+    depth = len(state.conditions)
+    lineno = 0
+    in_comment = False
+    logical = ''
+    for line in lines:
+      lineno += 1
+      # Join continuation lines, keeping the line count with empty lines.
+      if line.endswith('\\\n'):
+        logical += line[:-2]
+        state.pending += 1
+        continue
+      logical += line
+      code, in_comment = _strip_comments(logical, in_comment)
+      logical = ''
+
+      directive = _DIRECTIVE.match(code) if code.lstrip().startswith('#') else None
+      if directive is not None:
+        for out in self._directive(directive.group(1), directive.group(2), filepath, lineno, state):
+          yield out
+        yield '\n' * (state.pending + 1)
+      elif state.active():
+        yield state.expand(code) + '\n' * state.pending
+      else:
+        yield '\n' * (state.pending + 1)
+      state.pending = 0
+
+    if logical:
+      code, in_comment = _strip_comments(logical, in_comment)
+      if state.active():
+        yield state.expand(code)
+    if len(state.conditions) > depth:
+      raise ErrorUnsupportedDirective("#if without #endif in %s" % filepath)
+
+  def _directive(self, name, rest, filepath, lineno, state):
+    # Conditionals are evaluated even in skipped regions to track nesting.
+    if name in ('ifdef', 'ifndef'):
+      state.push((rest.split() or [''])[0] in state.macros if name == 'ifdef'
+        else (rest.split() or [''])[0] not in state.macros)
+    elif name == 'if':
+      state.push(state.active() and state.evaluate(rest))
+    elif name == 'elif':
+      state.elif_(lambda: state.evaluate(rest))
+    elif name == 'else':
+      state.elif_(lambda: True)
+    elif name == 'endif':
+      if not state.conditions:
+        raise ErrorUnsupportedDirective("#endif without #if")
+      state.conditions.pop()
+    elif not state.active():
+      pass
+    elif name == 'define':
+      state.define(rest)
+    elif name == 'undef':
+      state.macros.pop(rest.strip(), None)
+    elif name == 'include':
+      path = self._find_include(rest, filepath)
+      if path is not None:
+        state.included.append(path)
+        with open(path, 'r') as fin:
+          included = fin.read()
+        yield '# 1 "%s"\n' % path
+        for out in self._lines(included.splitlines(True), path, state):
+          yield out
+        yield '\n# %d "%s"' % (lineno + 1, filepath)
+    elif name in ('pragma', 'line', '') or name.isdigit():
+      yield '# %s %s' % (name, rest) if name else ''
+    elif name == 'error':
+      raise ErrorUnsupportedDirective("#error %s" % rest)
+    elif name != 'warning':
+      raise ErrorUnsupportedDirective("#" + name)
+
+  def _find_include(self, rest, filepath):
+    match = _INCLUDE.match(rest)
+    if match is None:
+      raise ErrorUnsupportedDirective("#include " + rest)
+    local, system = match.groups()
+    dirs = ([os.path.dirname(filepath) or '.'] if local else []) + self.include_dirs
+    for directory in dirs:
+      path = os.path.join(directory, local or system)
+      if os.path.isfile(path):
+        return path
+    if local:
+      raise IOError("Included file %s not found" % local)
+    return None
+
+
+# Macros and conditional stack of one preprocessing run.
+class _State(object):
+  def __init__(self, defines):
+    # name -> (parameters or None, body)
+    self.macros = dict((name, (None, str(value))) for name, value in defines.items())
+    # Stack of [active, taken, enclosing active] for each open conditional
+    self.conditions = []
+    self.included = []
+    self.pending = 0
+
+  def active(self):
+    return not self.conditions or self.conditions[-1][0]
+
+  def push(self, value):
+    enclosing = self.active()
+    self.conditions.append([enclosing and value, enclosing and value, enclosing])
+
+  def elif_(self, value):
+    if not self.conditions:
+      raise ErrorUnsupportedDirective("#else without #if")
+    condition = self.conditions[-1]
+    condition[0] = condition[2] and not condition[1] and value()
+    condition[1] = condition[1] or condition[0]
+
+  def define(self, rest):
+    match = _DEFINE.match(rest)
+    if match is None:
+      raise ErrorUnsupportedDirective("#define " + rest)
+    name, params, body = match.groups()
+    if '#' in body:
+      raise ErrorUnsupportedDirective("#define %s with # or ##" % name)
+    if params is not None:
+      params = [param.strip() for param in params.split(',') if param.strip()]
+      if '...' in params:
+        raise ErrorUnsupportedDirective("#define %s with variadic arguments" % name)
+    self.macros[name] = (params, body.strip())
+
+  def expand(self, text, hidden=frozenset()):
+    if not self.macros:
+      return text
+    out = []
+    pos = 0
+    for match in _WORD.finditer(text):
+      word = match.group()
+      if match.start() < pos or word not in self.macros or word in hidden:
+        continue
+      params, body = self.macros[word]
+      if params is None:
+        out.append(text[pos:match.start()])
+        out.append(self.expand(body, hidden | {word}))
+        pos = match.end()
+        continue
+      args, end = _arguments(text, match.end())
+      # A function-like macro name without arguments is left as is.
+      if args is None:
+        continue
+      if args == [''] and not params:
+        args = []
+      if len(args) != len(params):
+        raise ErrorUnsupportedDirective("macro %s called with %d arguments" % (word, len(args)))
+      values = dict(zip(params, [self.expand(arg, hidden) for arg in args]))
+      body = _WORD.sub(lambda m: values.get(m.group(), m.group()), body)
+      out.append(text[pos:match.start()])
+      out.append(self.expand(body, hidden | {word}))
+      pos = end
+    out.append(text[pos:])
+    return ''.join(out)
+
+  def evaluate(self, condition):
+    condition = _DEFINED.sub(lambda m: '1' if (m.group(1) or m.group(2)) in self.macros else '0', condition)
+    return _Condition(self.expand(condition)).evaluate() != 0
+
+
+def _truncate(a, b):
+  q = abs(a) // abs(b)
+  return q if (a < 0) == (b < 0) else -q
+
+# Binary operators of #if conditions by precedence, lowest first.
+_PRECEDENCE = dict((op, level) for level, ops in enumerate([
+  ('||',), ('&&',), ('|',), ('^',), ('&',), ('==', '!='), ('<', '<=', '>', '>='), ('<<', '>>'), ('+', '-'),
+  ('*', '/', '%')]) for op in ops)
+
+_BINARY = {
+  '*': lambda a, b: a * b,
+  '/': _truncate,
+  '%': lambda a, b: a - b * _truncate(a, b),
+  '+': lambda a, b: a + b,
+  '-': lambda a, b: a - b,
+  '<<': lambda a, b: a << b,
+  '>>': lambda a, b: a >> b,
+  '<': lambda a, b: int(a < b),
+  '<=': lambda a, b: int(a <= b),
+  '>': lambda a, b: int(a > b),
+  '>=': lambda a, b: int(a >= b),
+  '==': lambda a, b: int(a == b),
+  '!=': lambda a, b: int(a != b),
+  '&': lambda a, b: a & b,
+  '^': lambda a, b: a ^ b,
+  '|': lambda a, b: a | b,
+}
+
+_UNARY = {
+  '-': lambda a: -a,
+  '+': lambda a: a,
+  '!': lambda a: int(not a),
+  '~': lambda a: ~a,
+}
+
+# Wraps a value around to a 64-bit signed integer (intmax_t).
+def _wrap(value):
+  return ((value + (1 << 63)) & ((1 << 64) - 1)) - (1 << 63)
+
+
+# Constant expression of an #if, after the macros are expanded, evaluated
+# with the operators, precedence and integer arithmetic of C: values are
+# 64-bit signed integers, division and modulo truncate towards zero,
+# comparisons and logical operators give 0 or 1. Identifiers left after
+# expansion are 0, like in cpp. The operands of && and || and the branches of
+# ?: that are not used are parsed but not evaluated, so 0 && 1 / 0 is 0.
+class _Condition(object):
+  def __init__(self, text):
+    self.text = text
+    self.tokens = []
+    pos, end = 0, len(text.rstrip())
+    while pos < end:
+      match = _TOKEN.match(text, pos)
+      if match is None:
+        raise self.error()
+      number, identifier, op = match.groups()
+      if op is not None:
+        self.tokens.append(op)
+      else:
+        self.tokens.append(0 if identifier is not None else _integer(number, self))
+      pos = match.end()
+    self.pos = 0
+
+  def error(self):
+    return ErrorUnsupportedDirective("#if " + self.text.strip())
+
+  def evaluate(self):
+    value = self.conditional(True)
+    if self.pos != len(self.tokens):
+      raise self.error()
+    return value
+
+  def peek(self):
+    return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+  def take(self, token=None):
+    if self.pos >= len(self.tokens) or token is not None and self.tokens[self.pos] != token:
+      raise self.error()
+    self.pos += 1
+    return self.tokens[self.pos - 1]
+
+  # The expressions of the parsing functions are only evaluated when live,
+  # otherwise their value is 0.
+  def conditional(self, live):
+    cond = self.binary(0, live)
+    if self.peek() != '?':
+      return cond
+    self.take()
+    iftrue = self.conditional(live and cond != 0)
+    self.take(':')
+    iffalse = self.conditional(live and cond == 0)
+    return iftrue if cond != 0 else iffalse
+
+  # Binary operators of precedence level or above, left associative.
+  def binary(self, level, live):
+    left = self.unary(live)
+    while isinstance(self.peek(), str) and _PRECEDENCE.get(self.peek(), -1) >= level:
+      op = self.take()
+      if op in ('&&', '||'):
+        right = self.binary(_PRECEDENCE[op] + 1, live and (left != 0) == (op == '&&'))
+        left = int(left != 0 and right != 0) if op == '&&' else int(left != 0 or right != 0)
+        continue
+      right = self.binary(_PRECEDENCE[op] + 1, live)
+      if op in ('/', '%') and right == 0 or op in ('<<', '>>') and not 0 <= right < 64:
+        if live:
+          raise self.error()
+        left = 0
+      else:
+        left = _wrap(_BINARY[op](left, right))
+    return left
+
+  def unary(self, live):
+    token = self.take()
+    if not isinstance(token, str):
+      return token
+    if token in _UNARY:
+      return _wrap(_UNARY[token](self.unary(live)))
+    if token == '(':
+      value = self.conditional(live)
+      self.take(')')
+      return value
+    raise self.error()
+
+
+# Value of an integer constant of an #if (the suffixes are left out).
+def _integer(number, condition):
+  try:
+    if number[:2] in ('0x', '0X'):
+      return _wrap(int(number, 16))
+    return _wrap(int(number, 8 if number.startswith('0') else 10))
+  except ValueError:
+    raise condition.error()
+
+
+def _mtime(path):
+  try:
+    return os.path.getmtime(path)
+  except OSError:
+    return None
+
+
+# Replaces the comments of a line with a space. in_comment tells whether the
+# line starts inside a block comment, the state at the end of the line is
+# returned with the code.
+def _strip_comments(line, in_comment):
+  out = []
+  pos = 0
+  while True:
+    if in_comment:
+      end = line.find('*/', pos)
+      if end < 0:
+        return ''.join(out) + ('\n' if line.endswith('\n') else ''), True
+      out.append(' ')
+      pos = end + 2
+      in_comment = False
+    match = _STRING_OR_COMMENT.search(line, pos)
+    if match is None:
+      out.append(line[pos:])
+      return ''.join(out), False
+    out.append(line[pos:match.start()])
+    if match.group() == '//':
+      out.append('\n' if line.endswith('\n') else '')
+      return ''.join(out), False
+    if match.group() == '/*':
+      in_comment = True
+      pos = match.end()
+    else:
+      out.append(match.group())
+      pos = match.end()
+
+
+# Parses the parenthesized arguments of a function-like macro call starting at
+# pos. Returns (arguments, end position) or (None, pos) if no '(' follows.
+def _arguments(text, pos):
+  start = pos
+  while start < len(text) and text[start].isspace():
+    start += 1
+  if start >= len(text) or text[start] != '(':
+    return None, pos
+  args = []
+  depth = 0
+  arg_start = start + 1
+  i = start
+  while i < len(text):
+    c = text[i]
+    if c in '"\'':
+      match = _WORD.match(text, i)
+      i = match.end() if match else i + 1
+      continue
+    if c == '(':
+      depth += 1
+    elif c == ')':
+      depth -= 1
+      if depth == 0:
+        args.append(text[arg_start:i].strip())
+        return args, i + 1
+    elif c == ',' and depth == 1:
+      args.append(text[arg_start:i].strip())
+      arg_start = i + 1
+    i += 1
+  raise ErrorUnsupportedDirective("unterminated macro call")
+
+
+_preprocessor = Preprocessor()
+_parser = None
+
+
+def preprocess(text, filepath=''):
+  return _preprocessor.preprocess(text, filepath)
+
+
+# The parser shared by parse and parse_file, built on first use.
+def get_parser():
+  global _parser
+  if _parser is None:
+    _parser = c_parser.CParser()
+  return _parser
+
+
+# Preprocesses and parses C source text. Local includes are resolved relative
+# to filepath.
+def parse(text, filepath='', parser=None):
+  return (parser or get_parser()).parse(preprocess(text, filepath), filepath)
+
+
+# Replacement for pycparser.parse_file that preprocesses with the built-in
+# preprocessor instead of cpp, and reuses one parser across calls.
+def parse_file(filepath, parser=None):
+  with open(filepath, 'r') as fin:
+    text = fin.read()
+  return parse(text, filepath, parser)
@@ -0,0 +1,386 @@
+import func_ast as func
+
+# Term rewriting over func_ast.
+#
+#   rewriter = Rewriter()                    # the rules of ALGEBRA
+#   rewriter.add(Rule("double", BinaryOp('+', X, X), lambda m: ...))
+#   funcdef = rewriter.rewrite(funcdef)
+#
+# A rule has a pattern, a func_ast expression where pattern variables (Var)
+# stand for any subexpression (or, with constant=True, any constant), and a
+# replacement: a template instantiated with the matched variables, or a
+# function of the matches that returns the replacement or None when the rule
+# does not apply. A variable used twice in a pattern matches equal
+# subexpressions. An optional guard function of the matches can reject a match.
+#
+# The rules are indexed in a discrimination tree keyed by the node class and
+# operator (or name, or constant) of the pattern nodes in preorder, pattern
+# variables being wildcards, so only the rules whose pattern shape fits a node
+# are tried on it. Expressions are rewritten bottom-up: the children first,
+# then the rules on the node until none applies, so the result is a normal
+# form. Every rule application counts as a step, and each call of rewrite
+# stops applying rules once max_steps steps are done. The fragment is copied.
+#
+# The traversal of the translations (ExpressionRewriter) and the helpers on
+# expressions (node_symbol, operands, rebuild, FOLD) are shared with the
+# e-graph optimizer of egraph.py.
+
+
+class Var(object):
+  def __init__(self, name, constant=False):
+    self.name = name
+    self.constant = constant
+
+  def __str__(self):
+    return "?" + self.name
+
+
+class Rule(object):
+  def __init__(self, name, pattern, replacement, guard=None):
+    self.name = name
+    self.pattern = pattern
+    self.replacement = replacement
+    self.guard = guard
+
+  def apply(self, node):
+    """ The replacement of node, or None if the rule does not match. """
+    matches = {}
+    if not _match(self.pattern, node, matches):
+      return None
+    if self.guard is not None and not self.guard(matches):
+      return None
+    if callable(self.replacement):
+      return self.replacement(matches)
+    return _instantiate(self.replacement, matches)
+
+
+# Wildcard edge of the discrimination tree
+_ANY = '*'
+
+
+def node_symbol(node):
+  cls = node.__class__
+  if cls is func.BinaryOp or cls is func.UnaryOp:
+    return (cls, node.op)
+  if cls is func.Constant:
+    return (cls, node.value)
+  if cls is func.ID:
+    return (cls, node.name)
+  if cls is str:
+    return (func.ID, node)
+  if cls is func.ArgsList:
+    return (cls, len(node.args))
+  if cls is func.ReturnTuple:
+    return (cls, len(node.exprs))
+  return (cls,)
+
+
+def operands(node):
+  cls = node.__class__
+  if cls is func.BinaryOp:
+    return [node.left, node.right]
+  if cls is func.UnaryOp:
+    return [node.expr]
+  if cls is func.If:
+    return [node.cond, node.iftrue, node.iffalse]
+  if cls is func.ArrayRef:
+    return [node.name, node.subscript]
+  if cls is func.FuncCall:
+    return [node.name, node.args]
+  if cls is func.ArgsList:
+    return list(node.args)
+  if cls is func.ReturnTuple:
+    return list(node.exprs)
+  return []
+
+
+def rebuild(node, children):
+  cls = node.__class__
+  if cls is func.BinaryOp:
+    return func.BinaryOp(node.op, children[0], children[1])
+  if cls is func.UnaryOp:
+    return func.UnaryOp(node.op, children[0])
+  if cls is func.If:
+    return func.If(children[0], children[1], children[2])
+  if cls is func.ArrayRef:
+    return func.ArrayRef(children[0], children[1])
+  if cls is func.FuncCall:
+    return func.FuncCall(children[0], children[1])
+  if cls is func.ArgsList:
+    return func.ArgsList(children)
+  if cls is func.ReturnTuple:
+    return func.ReturnTuple(children)
+  return node
+
+
+# Structural key of an expression, for the variables used twice in a pattern.
+def term_key(node):
+  if isinstance(node, (func.Binding, func.ParallelBinding, func.RecursiveFunction, func.ArgsRecList)):
+    return (id(node),)
+  return node_symbol(node) + tuple([term_key(child) for child in operands(node)])
+
+
+def _match(pattern, node, matches):
+  if isinstance(pattern, Var):
+    if pattern.constant and not is_constant(node):
+      return False
+    if pattern.name in matches:
+      return term_key(matches[pattern.name]) == term_key(node)
+    matches[pattern.name] = node
+    return True
+  if node_symbol(pattern) != node_symbol(node):
+    return False
+  return all([_match(sub, child, matches) for sub, child in zip(operands(pattern), operands(node))])
+
+
+def _instantiate(template, matches):
+  if isinstance(template, Var):
+    return matches[template.name]
+  children = operands(template)
+  if not children:
+    return template
+  return rebuild(template, [_instantiate(child, matches) for child in children])
+
+
+class DiscriminationTree(object):
+  def __init__(self):
+    # symbol -> subtree, and the (number, rule) whose pattern ends here
+    self.edges = {}
+    self.rules = []
+
+  def insert(self, pattern, rule, number=0):
+    tree = self
+    stack = [pattern]
+    while stack:
+      node = stack.pop()
+      if isinstance(node, Var):
+        symbol = _ANY
+      else:
+        symbol = node_symbol(node)
+        stack.extend(reversed(operands(node)))
+      tree = tree.edges.setdefault(symbol, DiscriminationTree())
+    tree.rules.append((number, rule))
+
+  def candidates(self, node):
+    """ The rules whose pattern can match node, by number. """
+    found = []
+    # (subtree, the terms still to match in preorder)
+    work = [(self, [node])]
+    while work:
+      tree, terms = work.pop()
+      if not terms:
+        found.extend(tree.rules)
+        continue
+      term, rest = terms[-1], terms[:-1]
+      if _ANY in tree.edges:
+        work.append((tree.edges[_ANY], rest))
+      subtree = tree.edges.get(node_symbol(term))
+      if subtree is not None:
+        work.append((subtree, rest + list(reversed(operands(term)))))
+    return [rule for _, rule in sorted(set(found), key=lambda entry: entry[0])]
+
+
+# Copies a func_ast fragment with each of its expressions replaced by
+# normalize(expression), which subclasses define. The let bindings and loops
+# found inside an expression are for normalize to pass back to walk; start is
+# called at the beginning of each rewrite.
+class ExpressionRewriter(object):
+  def __init__(self):
+    # rule name -> number of applications
+    self.applied = {}
+
+  def rewrite(self, node):
+    self.start()
+    return self.walk(node)
+
+  def start(self):
+    pass
+
+  def walk(self, node):
+    if isinstance(node, func.FuncDef):
+      return func.FuncDef(node.input_args, node.output_vars, self.walk(node.body), node.name)
+    if isinstance(node, func.Binding):
+      # Binding chains can be long, walk them iteratively.
+      chain = []
+      while isinstance(node, func.Binding):
+        chain.append(node)
+        node = node.expr2
+      node = self.walk(node)
+      for binding in reversed(chain):
+        node = func.Binding(self.lhs(binding.id), self.walk(binding.expr1), node)
+      return node
+    if isinstance(node, func.ParallelBinding):
+      return func.ParallelBinding([func.Binding(self.lhs(binding.id), self.walk(binding.expr1), None)
+        for binding in node.bindings], self.walk(node.expr2))
+    if isinstance(node, func.RecursiveFunction):
+      return func.RecursiveFunction(node.args, self.walk(node.expr1), node.expr2)
+    return self.normalize(node)
+
+  def lhs(self, node):
+    if isinstance(node, func.ArrayRef):
+      return func.ArrayRef(self.lhs(node.name), self.normalize(node.subscript))
+    return node
+
+  def normalize(self, node):
+    raise NotImplementedError()
+
+
+class Rewriter(ExpressionRewriter):
+  def __init__(self, rules=None, max_steps=100000):
+    ExpressionRewriter.__init__(self)
+    self.tree = DiscriminationTree()
+    self.rules = []
+    self.max_steps = max_steps
+    self.steps = 0
+    # Nodes in normal form, by id (kept alive with them)
+    self.normal = {}
+    for rule in ALGEBRA if rules is None else rules:
+      self.add(rule)
+
+  def add(self, rule):
+    self.tree.insert(rule.pattern, rule, len(self.rules))
+    self.rules.append(rule)
+
+  # Each rewrite has a budget of max_steps rule applications. The nodes left
+  # as they were when the budget of a previous one ran out are not in normal
+  # form.
+  def start(self):
+    self.steps = 0
+    self.normal = {}
+
+  def normalize(self, node):
+    if not isinstance(node, func.Node) or id(node) in self.normal:
+      return node
+    if isinstance(node, (func.Binding, func.ParallelBinding, func.RecursiveFunction)):
+      return self.walk(node)
+    if isinstance(node, func.Constant) and isinstance(node.value, func.Node):
+      # Expressions substituted by simplify are wrapped in a Constant.
+      return self.normalize(node.value)
+
+    children = operands(node)
+    if children:
+      rewritten = [self.normalize(child) for child in children]
+      if any([new is not old for new, old in zip(rewritten, children)]):
+        node = rebuild(node, rewritten)
+
+    if self.steps < self.max_steps:
+      for rule in self.tree.candidates(node):
+        replacement = rule.apply(node)
+        if replacement is not None:
+          self.steps += 1
+          self.applied[rule.name] = self.applied.get(rule.name, 0) + 1
+          return self.normalize(replacement)
+    self.normal[id(node)] = node
+    return node
+
+
+# Helpers for rules
+
+def is_constant(node):
+  return isinstance(node, func.Constant) and not isinstance(node.value, func.Node)
+
+def int_value(node):
+  """ The value of an integer constant, or None. """
+  if not is_constant(node):
+    return None
+  try:
+    return int(str(node.value).rstrip('uUlL'), 0)
+  except ValueError:
+    return None
+
+def is_pure(node):
+  """ Whether dropping or duplicating an expression is safe: no calls. """
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    if isinstance(node, func.FuncCall):
+      return False
+    stack.extend(operands(node))
+  return True
+
+def _truncate(a, b):
+  # C integer division truncates toward zero.
+  quotient = abs(a) // abs(b)
+  return quotient if (a < 0) == (b < 0) else -quotient
+
+FOLD = {
+  '+': lambda a, b: a + b,
+  '-': lambda a, b: a - b,
+  '*': lambda a, b: a * b,
+  '/': lambda a, b: _truncate(a, b) if b else None,
+  '%': lambda a, b: a - b * _truncate(a, b) if b else None,
+  '<': lambda a, b: int(a < b),
+  '<=': lambda a, b: int(a <= b),
+  '>': lambda a, b: int(a > b),
+  '>=': lambda a, b: int(a >= b),
+  '==': lambda a, b: int(a == b),
+  '!=': lambda a, b: int(a != b),
+  '&&': lambda a, b: int(bool(a) and bool(b)),
+  '||': lambda a, b: int(bool(a) or bool(b)),
+}
+
+def constant(value):
+  return func.Constant(str(value))
+
+def _fold(op):
+  def fold(matches):
+    a, b = int_value(matches['c1']), int_value(matches['c2'])
+    if a is None or b is None:
+      return None
+    value = FOLD[op](a, b)
+    return None if value is None else constant(value)
+  return fold
+
+# x + k, or x - (-k) for a negative k
+def _offset(x, k):
+  if k == 0:
+    return x
+  return func.BinaryOp('+', x, constant(k)) if k > 0 else func.BinaryOp('-', x, constant(-k))
+
+def _reassociate(sign1, sign2):
+  def reassociate(matches):
+    a, b = int_value(matches['c1']), int_value(matches['c2'])
+    if a is None or b is None:
+      return None
+    return _offset(matches['x'], sign1 * a + sign2 * b)
+  return reassociate
+
+def _pure(*names):
+  return lambda matches: all([is_pure(matches[name]) for name in names])
+
+def _truth(value):
+  def choose(matches):
+    test = int_value(matches['c1'])
+    if test is None or bool(test) != value:
+      return None
+    return matches['a']
+  return choose
+
+
+X, Y, A = Var('x'), Var('y'), Var('a')
+C1, C2 = Var('c1', constant=True), Var('c2', constant=True)
+ZERO, ONE = func.Constant('0'), func.Constant('1')
+
+ALGEBRA = [
+  Rule("add-zero", func.BinaryOp('+', X, ZERO), X),
+  Rule("sub-zero", func.BinaryOp('-', X, ZERO), X),
+  Rule("mul-one", func.BinaryOp('*', X, ONE), X),
+  Rule("div-one", func.BinaryOp('/', X, ONE), X),
+  Rule("mul-zero", func.BinaryOp('*', X, ZERO), ZERO, _pure('x')),
+  Rule("sub-self", func.BinaryOp('-', X, X), ZERO, _pure('x')),
+  Rule("add-cancel", func.BinaryOp('+', X, func.BinaryOp('-', Y, X)), Y, _pure('x')),
+  Rule("add-cancel-left", func.BinaryOp('+', func.BinaryOp('-', Y, X), X), Y, _pure('x')),
+  # The same with the difference grouped in parentheses (a 1-element tuple)
+  Rule("add-cancel-group", func.BinaryOp('+', X, func.ReturnTuple([func.BinaryOp('-', Y, X)])), Y, _pure('x')),
+  # Constants go to the right of + and *, for the rules below.
+  Rule("add-commute", func.BinaryOp('+', C1, X), func.BinaryOp('+', X, C1), lambda m: not is_constant(m['x'])),
+  Rule("mul-commute", func.BinaryOp('*', C1, X), func.BinaryOp('*', X, C1), lambda m: not is_constant(m['x'])),
+  Rule("neg-neg", func.UnaryOp('-', func.UnaryOp('-', X)), X),
+  Rule("add-consts", func.BinaryOp('+', func.BinaryOp('+', X, C1), C2), _reassociate(1, 1)),
+  Rule("sub-add-consts", func.BinaryOp('+', func.BinaryOp('-', X, C1), C2), _reassociate(-1, 1)),
+  Rule("add-sub-consts", func.BinaryOp('-', func.BinaryOp('+', X, C1), C2), _reassociate(1, -1)),
+  Rule("sub-consts", func.BinaryOp('-', func.BinaryOp('-', X, C1), C2), _reassociate(-1, -1)),
+  Rule("if-same", func.If(Y, X, X), X, _pure('y')),
+  Rule("if-true", func.If(C1, A, Y), _truth(True)),
+  Rule("if-false", func.If(C1, Y, A), _truth(False)),
+] + [Rule("fold" + op, func.BinaryOp(op, C1, C2), _fold(op)) for op in sorted(FOLD)]
@@ -1,28 +1,194 @@
 import sys
 import os
+import time
 sys.path.extend(['.', '..'])
 
-from pycparser import parse_file
-from minic.c_ast_to_minic import transform
-from transform_func import *
-from func_utils import function_wrapper
+# Heavy modules (pycparser, the translator, multiprocessing, the server) are
+# imported by the mode that needs them, after the arguments are read, so a
+# one-shot translation only loads what it uses. bench/startup.py checks the
+# modules loaded by each mode and the startup time.
 
-def get_output(directory_path):
-  output_c = function_wrapper(directory_path)
-  mast = transform(parse_file(output_c))
-  print("File: {} \nInput:".format(directory_path.split('/'[-1])))
-  with open(directory_path, 'r') as fin:
-    print(fin.read())
-  ftranslator = FunctionalTranslator(mast, True)
-  print("Output:\n{}\n----------".format(ftranslator))
+# Translates the code block source of the input filepath. Returns (source,
+# translation, elapsed seconds, error). options are passed on to
+# FunctionalTranslator, statistics to translate_block.
+def translate_source(source, filepath, simplify=True, options=None, statistics=None):
+  from pipeline import translate_block
+  from func_utils import describe_error
+
+  start = time.perf_counter()
+  try:
+    translation, error = translate_block(source, simplify, filepath, statistics=statistics, **(options or {})), None
+  except Exception as e:
+    translation, error = None, describe_error(e)
+  return source, translation, time.perf_counter() - start, error
+
+# The (filepath, source) of each file in filepaths, each file is read once.
+def file_inputs(filepaths):
+  for filepath in filepaths:
+    with open(filepath, 'r') as fin:
+      yield filepath, fin.read()
+
+# Translates the (filepath, source) inputs, from file_inputs or a
+# corpus.Corpus. With stats, the TranslationStats of each input (and their
+# total) are printed to stderr.
+def get_output(inputs, sink, options=None, stats=False):
+  total, count = None, 0
+  for filepath, source in inputs:
+    block_stats = []
+    source, translation, elapsed, error = translate_source(source, filepath, True, options,
+      block_stats.append if stats else None)
+    sink.write(filepath, source, translation, elapsed, error)
+    for block in block_stats:
+      print_stats(filepath, block)
+      total = block if total is None else total.add(block)
+      count += 1
+  if count > 1:
+    print_stats("total", total)
+
+def print_stats(title, stats):
+  print("Statistics: {}\n  {}".format(title, str(stats).replace('\n', '\n  ')), file=sys.stderr)
+
+# Translates the inputs in worker processes, each input limited to timeout
+# seconds and each worker to memory_limit megabytes. With corpus (the path of
+# a corpus file), its blocks are translated instead of the files.
+def get_output_limited(filepaths, sink, workers=None, timeout=None, memory_limit=None, options=None, corpus=None):
+  from batch import BatchTranslator
+  translator = BatchTranslator(workers, timeout, memory_limit and memory_limit << 20, True, **(options or {}))
+  results = translator.translate(filepaths) if corpus is None else translator.translate_corpus(corpus)
+  for filepath, source, translation, elapsed, error in results:
+    sink.write(filepath, source, translation, elapsed, error)
+
+# The code block files of a directory, without the files written next to
+# them: the wrapped blocks (_out.c) and the translations of --format files
+# (.func).
+def directory_inputs(directory_path):
+  directory = os.fsencode(directory_path)
+  for file in os.listdir(directory):
+    filename = os.fsdecode(file)
+    if not filename.endswith(("_out.c", ".func")):
+      yield os.path.join(directory_path, filename)
+
+def parse_args(argv):
+  import argparse
+  parser = argparse.ArgumentParser(description="Translate C code blocks into functional code.")
+  mode = parser.add_mutually_exclusive_group()
+  mode.add_argument('-f', metavar='FILE', dest='file', help="translate the code block in FILE")
+  mode.add_argument('-d', metavar='DIR', dest='directory', default="./inputs/final_inputs",
+    help="translate every code block in DIR (default: %(default)s)")
+  mode.add_argument('-c', metavar='FILE', dest='corpus',
+    help="translate every code block of the corpus file FILE (see --pack)")
+  mode.add_argument('-u', metavar='FILE', dest='unit', help="translate every function of the C file FILE")
+  mode.add_argument('-s', metavar='FILE', dest='stream', help="like -u, streaming one function at a time")
+  mode.add_argument('--server', metavar='SOCKET', nargs='?', const='',
+    help="serve JSON lines requests on stdin, or on the Unix socket SOCKET")
+  parser.add_argument('-j', metavar='N', dest='workers', type=int, help="worker processes for -u, -f, -d and -c")
+  parser.add_argument('--timeout', metavar='SECONDS', type=float,
+    help="wall-clock limit for each input of -f, -d and -c, which then run in worker processes")
+  parser.add_argument('--memory-limit', metavar='MB', type=int,
+    help="memory limit of each worker process for -f, -d and -c")
+  parser.add_argument('--pack', metavar='FILE',
+    help="write the code blocks of -f or -d to the corpus file FILE instead of translating them")
+  parser.add_argument('--format', choices=['text', 'json', 'files'], default='text',
+    help="text (default), json lines, or one FILE.func file per input")
+  parser.add_argument('-o', '--out', help="output file (text, json) or directory (files)")
+  parser.add_argument('--no-echo', dest='echo', action='store_false', help="do not echo the inputs")
+  parser.add_argument('--memo', action='store_true', help="translate repeated if statements and loops once")
+  parser.add_argument('--parallel', action='store_true', help="group independent bindings into let ... and ...")
+  parser.add_argument('--hoist', action='store_true', help="move loop-invariant expressions out of the loops")
+  parser.add_argument('--minimal-loops', action='store_true',
+    help="only pass the variables a loop modifies and still needs through its recursive function")
+  parser.add_argument('--closed-form', action='store_true',
+    help="replace counting and accumulating for loops by their closed form")
+  parser.add_argument('--rewrite', action='store_true', help="simplify the expressions with algebraic rewrite rules")
+  parser.add_argument('--egraph', action='store_true',
+    help="replace the expressions by the cheapest equivalent ones found by equality saturation")
+  parser.add_argument('--egraph-nodes', metavar='N', type=int, default=5000,
+    help="e-graph size limit for each expression (default: %(default)s)")
+  parser.add_argument('--egraph-time', metavar='SECONDS', type=float, default=1.0,
+    help="equality saturation time limit for each expression (default: %(default)s)")
+  parser.add_argument('--ssa', action='store_true',
+    help="translate through SSA form, passing only the variables that change and are needed")
+  parser.add_argument('--fused', action='store_true',
+    help="translate the pycparser tree directly when possible, without converting it to minic")
+  parser.add_argument('--stats', action='store_true',
+    help="print what the translation and its simplification did to each input to stderr (-f, -d and -c)")
+  parser.add_argument('--visit-profile', action='store_true',
+    help="print the calls and time of each visitor method and c_ast_to_minic handler to stderr (-f, -d and -c)")
+  parser.add_argument('--visit-stacks', metavar='FILE',
+    help="write the visitor handler timings to FILE as collapsed stacks, for flame graphs (-f, -d and -c)")
+  args = parser.parse_args(argv)
+  if args.pack and (args.corpus or args.unit or args.stream or args.server is not None):
+    parser.error("--pack takes the code blocks of -f or -d")
+  if (args.visit_profile or args.visit_stacks) and (args.workers or args.timeout or args.memory_limit):
+    parser.error("--visit-profile and --visit-stacks profile this process, not worker processes")
+  if args.stats and (args.workers or args.timeout or args.memory_limit):
+    parser.error("--stats is not available with worker processes")
+  return args
+
+# FunctionalTranslator (and translate_block) options set on the command line.
+def translator_options(args):
+  options = {}
+  if args.memo:
+    options['memo'] = True
+  if args.parallel:
+    options['parallel'] = True
+  if args.ssa:
+    options['ssa'] = True
+  if args.hoist:
+    options['hoist'] = True
+  if args.minimal_loops:
+    options['minimal_loops'] = True
+  if args.closed_form:
+    options['closed_form'] = True
+  if args.rewrite:
+    options['rewrite'] = True
+  if args.egraph:
+    options['egraph'] = {'max_nodes': args.egraph_nodes, 'time_limit': args.egraph_time}
+  if args.fused:
+    options['fused'] = True
+  return options
 
 if __name__ == "__main__":
-  if len(sys.argv) == 3 and sys.argv[1] == '-f':
-    get_output(sys.argv[2])
+  args = parse_args(sys.argv[1:])
+  if args.unit is not None:
+    # Whole translation unit: python3 run.py -u file.c [-j workers]
+    from translation_unit import print_unit
+    print_unit(args.unit, True, args.workers)
+  elif args.stream is not None:
+    # Streaming translation unit, one function in memory at a time: python3 run.py -s file.c
+    from translation_unit import print_stream
+    print_stream(args.stream)
+  elif args.server is not None:
+    # JSON lines translation server on stdin/stdout or on a Unix socket:
+    # python3 run.py --server [socket_path]
+    from server import main
+    main(args.server or None)
+  elif args.pack is not None:
+    # Many code blocks in one file: python3 run.py -d DIR --pack FILE, then python3 run.py -c FILE
+    from corpus import write_corpus
+    filepaths = [args.file] if args.file else directory_inputs(args.directory)
+    count = write_corpus(args.pack, file_inputs(filepaths))
+    print("{} code blocks written to {}".format(count, args.pack), file=sys.stderr)
   else:
-    directory_path = "./inputs/final_inputs"
-    directory = os.fsencode(directory_path)
-    for file in os.listdir(directory):
-      filename = os.fsdecode(file)
-      if not filename.endswith("_out.c"):
-        get_output(os.path.join(directory_path, filename))
\ No newline at end of file
+    from output import make_sink
+    filepaths = [args.file] if args.file else directory_inputs(args.directory)
+    options = translator_options(args)
+    profile = None
+    if args.visit_profile or args.visit_stacks:
+      from visit_profile import VisitProfile
+      profile = VisitProfile().start()
+    with make_sink(args.format, args.out, args.echo) as sink:
+      if args.workers or args.timeout or args.memory_limit:
+        get_output_limited(filepaths, sink, args.workers, args.timeout, args.memory_limit, options, args.corpus)
+      elif args.corpus is not None:
+        from corpus import Corpus
+        with Corpus(args.corpus) as corpus:
+          get_output(corpus, sink, options, args.stats)
+      else:
+        get_output(file_inputs(filepaths), sink, options, args.stats)
+    if profile is not None:
+      profile.stop()
+      if args.visit_profile:
+        print(profile.table(), file=sys.stderr)
+      if args.visit_stacks:
+        profile.write_stacks(args.visit_stacks)
\ No newline at end of file
@@ -0,0 +1,107 @@
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+
+from func_utils import describe_error
+from pipeline import translate_block, translate_unit_source
+from preprocess import get_parser
+
+# Long-lived translation server. Requests are JSON objects, one per line:
+#
+#   {"id": 1, "source": "b = a + 3;", "simplify": true}
+#
+# Fields:
+#   source    C code to translate (required)
+#   id        echoed back in the response
+#   simplify  true (default), false or "both"
+#   mode      "block" (default): source is a code block, as in run.py -f
+#             "unit": source is a whole C file, every function is translated
+#   path      path used to resolve local includes and in error messages
+#
+# Each request gets one JSON line back with "id", "elapsed" (seconds) and
+# either "translation" ("translations" for "both", "functions" for units)
+# or "error". The parser is built once at startup and reused, so a request
+# only pays for the translation itself.
+
+# The parser and the preprocessor cache are shared, requests from concurrent
+# socket connections are translated one at a time.
+_lock = threading.Lock()
+
+
+def handle_request(request):
+  response = {"id": request.get("id")} if isinstance(request, dict) else {"id": None}
+  start = time.perf_counter()
+  try:
+    if not isinstance(request, dict) or not isinstance(request.get("source"), str):
+      raise ValueError("request must be an object with a \"source\" string")
+    simplify = request.get("simplify", True)
+    path = request.get("path", "")
+    mode = request.get("mode", "block")
+    with _lock:
+      if mode == "block":
+        translation = translate_block(request["source"], simplify, path)
+        response["translations" if simplify == "both" else "translation"] = translation
+      elif mode == "unit":
+        response["functions"] = [{"name": name, "translation": translation, "error": error}
+          for name, translation, error in translate_unit_source(request["source"], simplify is not False, path)]
+      else:
+        raise ValueError("unknown mode {}".format(mode))
+  except Exception as e:
+    response["error"] = describe_error(e)
+  response["elapsed"] = time.perf_counter() - start
+  return response
+
+
+def handle_line(line):
+  try:
+    request = json.loads(line)
+  except ValueError as e:
+    return {"id": None, "error": describe_error(e)}
+  return handle_request(request)
+
+
+# Serves JSON lines from infile, writing one response line per request.
+def serve(infile=sys.stdin, outfile=sys.stdout):
+  for line in infile:
+    if line.strip():
+      outfile.write(json.dumps(handle_line(line)) + "\n")
+      outfile.flush()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+  def handle(self):
+    for line in self.rfile:
+      if line.strip():
+        self.wfile.write((json.dumps(handle_line(line.decode("utf-8"))) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+  daemon_threads = True
+
+
+# Serves JSON lines on a Unix socket, one thread per connection.
+def serve_socket(socket_path):
+  if os.path.exists(socket_path):
+    os.remove(socket_path)
+  with _Server(socket_path, _Handler) as server:
+    try:
+      server.serve_forever()
+    finally:
+      os.remove(socket_path)
+
+
+def main(socket_path=None):
+  # Warm up: build the parser before the first request arrives.
+  get_parser()
+  if socket_path is None:
+    serve()
+  else:
+    serve_socket(socket_path)
+
+
+if __name__ == "__main__":
+  main(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,346 @@
+from minic.minic_ast import *
+from minic.c_ast_to_minic import ErrorUnsupportedConstruct
+import func_ast as func
+from def_use import accesses
+from transform_func import AST_C
+
+# SSA form of a minic block, and its translation to func_ast.
+#
+#   ssa = SSA(block)                  # Block, FuncDef or FileAST
+#   print(ssa)                        # basic blocks with versioned variables
+#   funcdef = ssa.translate()         # func_ast.FuncDef
+#
+# The block is turned into a control flow graph of basic blocks, then the
+# dominator tree and the dominance frontiers are computed (Cooper, Harvey and
+# Kennedy), phi nodes are placed at the iterated dominance frontier of the
+# definitions of each variable, for the variables live there only (pruned
+# SSA), and the variables are renamed.
+#
+# The translation follows the if statements and loops of the block: an if
+# statement returns the variables with a phi node where its branches join, and
+# a loop passes the variables with a phi node at its header to its recursive
+# function. These are the variables that change and are still needed, instead
+# of every variable written by the branches or the loop body. Renaming is not
+# needed for the translation: without copy propagation the versions of a
+# variable never overlap, so let bindings of the original names (which shadow
+# each other) have the same meaning.
+
+
+class BasicBlock(object):
+  def __init__(self, index):
+    self.index = index
+    # Assignments and other simple statements, in order
+    self.statements = []
+    # Condition of the branch that ends the block, if any
+    self.cond = None
+    self.succs = []
+    self.preds = []
+    # Variables read before being written in the block, and written in the block
+    self.uses = set()
+    self.defs = set()
+    self.live_in = set()
+    self.live_out = set()
+    # variable -> [version, [version from each predecessor]]
+    self.phis = {}
+    # Versions of the variables written by each statement, after renaming
+    self.versions = []
+
+
+class _IfRegion(object):
+  def __init__(self, cond, iftrue, iffalse, join):
+    self.cond = cond
+    self.iftrue = iftrue
+    self.iffalse = iffalse
+    self.join = join
+
+
+class _LoopRegion(object):
+  def __init__(self, cond, header, body):
+    self.cond = cond
+    self.header = header
+    self.body = body
+
+
+def _statements(node):
+  if isinstance(node, FileAST):
+    stmts = []
+    for ext in node.ext:
+      if isinstance(ext, FuncDef):
+        stmts += _statements(ext)
+    return stmts
+  if isinstance(node, FuncDef):
+    return _statements(node.body)
+  if isinstance(node, Block):
+    return node.block_items or []
+  if isinstance(node, DeclList):
+    return node.decls or []
+  return [] if node is None else [node]
+
+
+class SSA(object):
+  def __init__(self, node, outputs=None):
+    self.blocks = []
+    self.entry = self.new_block()
+    # The statements and if statements and loops of the block, for the translation.
+    self.regions = []
+    # id of each loop statement -> its header block
+    self.loops = {}
+    self.exit = self.build(_statements(node), self.entry, self.regions)
+
+    self.order = self.reverse_postorder()
+    self.written = set()
+    for block in self.order:
+      self.local_accesses(block)
+      self.written |= block.defs
+    # Every written variable is returned by default, as AST_C does.
+    self.outputs = set(self.written if outputs is None else outputs)
+
+    self.liveness()
+    self.idom = self.dominators()
+    self.frontiers = self.dominance_frontiers()
+    self.place_phis()
+    self.rename()
+
+  def new_block(self):
+    block = BasicBlock(len(self.blocks))
+    self.blocks.append(block)
+    return block
+
+  def link(self, source, target):
+    source.succs.append(target)
+    target.preds.append(source)
+
+  # Adds the statements to the control flow graph starting at block current,
+  # and returns the block where they end.
+  def build(self, stmts, current, regions):
+    for stmt in stmts:
+      if isinstance(stmt, (Block, DeclList)):
+        current = self.build(_statements(stmt), current, regions)
+
+      elif isinstance(stmt, If):
+        current.cond = stmt.cond
+        join = self.new_block()
+        branches = []
+        for branch in (stmt.iftrue, stmt.iffalse):
+          start = self.new_block()
+          self.link(current, start)
+          branch_regions = []
+          self.link(self.build(_statements(branch), start, branch_regions), join)
+          branches.append(branch_regions)
+        regions.append(_IfRegion(stmt.cond, branches[0], branches[1], join))
+        current = join
+
+      elif isinstance(stmt, (For, While)):
+        if isinstance(stmt, For):
+          current = self.build([stmt.init], current, regions)
+        header = self.new_block()
+        header.cond = stmt.cond
+        self.loops[id(stmt)] = header
+        self.link(current, header)
+        body = self.new_block()
+        self.link(header, body)
+        body_regions = []
+        # The increment of a for loop is the last statement of its body.
+        end = self.build(_statements(stmt.stmt) + ([stmt.next] if isinstance(stmt, For) else []), body, body_regions)
+        self.link(end, header)
+        current = self.new_block()
+        self.link(header, current)
+        regions.append(_LoopRegion(stmt.cond, header, body_regions))
+
+      elif isinstance(stmt, DoWhile):
+        raise ErrorUnsupportedConstruct(stmt)
+
+      elif stmt is not None:
+        current.statements.append(stmt)
+        regions.append(stmt)
+    return current
+
+  def reverse_postorder(self):
+    order = []
+    seen = set([self.entry.index])
+    stack = [(self.entry, iter(self.entry.succs))]
+    while stack:
+      block, succs = stack[-1]
+      succ = next(succs, None)
+      if succ is None:
+        stack.pop()
+        order.append(block)
+      elif not succ.index in seen:
+        seen.add(succ.index)
+        stack.append((succ, iter(succ.succs)))
+    order.reverse()
+    return order
+
+  def local_accesses(self, block):
+    for stmt in block.statements + ([block.cond] if block.cond is not None else []):
+      reads, writes, kills = accesses(stmt)
+      block.uses |= reads - block.defs
+      block.defs |= writes
+
+  def liveness(self):
+    self.exit.live_out = set(self.outputs)
+    changed = True
+    while changed:
+      changed = False
+      for block in reversed(self.order):
+        live_out = set(block.live_out)
+        for succ in block.succs:
+          live_out |= succ.live_in
+        live_in = block.uses | (live_out - block.defs)
+        if live_in != block.live_in or live_out != block.live_out:
+          block.live_in, block.live_out = live_in, live_out
+          changed = True
+
+  def dominators(self):
+    number = dict((block.index, i) for i, block in enumerate(self.order))
+    idom = {self.entry.index: self.entry}
+
+    def intersect(a, b):
+      while a is not b:
+        while number[a.index] > number[b.index]:
+          a = idom[a.index]
+        while number[b.index] > number[a.index]:
+          b = idom[b.index]
+      return a
+
+    changed = True
+    while changed:
+      changed = False
+      for block in self.order[1:]:
+        new_idom = None
+        for pred in block.preds:
+          if pred.index in idom:
+            new_idom = pred if new_idom is None else intersect(pred, new_idom)
+        if idom.get(block.index) is not new_idom:
+          idom[block.index] = new_idom
+          changed = True
+    return idom
+
+  def dominance_frontiers(self):
+    frontiers = dict((block.index, set()) for block in self.order)
+    for block in self.order:
+      if len(block.preds) < 2:
+        continue
+      for pred in block.preds:
+        runner = pred
+        while runner is not self.idom[block.index]:
+          frontiers[runner.index].add(block)
+          runner = self.idom[runner.index]
+    return frontiers
+
+  def place_phis(self):
+    for var in self.written:
+      work = [block for block in self.order if var in block.defs]
+      placed = set()
+      while work:
+        block = work.pop()
+        for frontier in self.frontiers[block.index]:
+          if frontier.index in placed or not var in frontier.live_in:
+            continue
+          placed.add(frontier.index)
+          frontier.phis[var] = [None, [None] * len(frontier.preds)]
+          work.append(frontier)
+
+  def rename(self):
+    # Version 0 of every variable is its value on entry.
+    counters = {}
+    stacks = {}
+
+    def define(var):
+      counters[var] = counters.get(var, 0) + 1
+      stacks.setdefault(var, [0]).append(counters[var])
+      return counters[var]
+
+    children = dict((block.index, []) for block in self.order)
+    for block in self.order[1:]:
+      children[self.idom[block.index].index].append(block)
+
+    stack = [(self.entry, None)]
+    while stack:
+      block, pushed = stack.pop()
+      if pushed is not None:
+        # Leaving the block: restore the versions of its dominator.
+        for var in pushed:
+          stacks[var].pop()
+        continue
+      pushed = []
+      for var in sorted(block.phis):
+        block.phis[var][0] = define(var)
+        pushed.append(var)
+      block.versions = []
+      for stmt in block.statements:
+        writes = sorted(accesses(stmt)[1])
+        block.versions.append(dict((var, define(var)) for var in writes))
+        pushed += writes
+      for succ in block.succs:
+        for var, phi in succ.phis.items():
+          phi[1][succ.preds.index(block)] = stacks.get(var, [0])[-1]
+      stack.append((block, pushed))
+      for child in reversed(children[block.index]):
+        stack.append((child, None))
+
+  def __str__(self):
+    lines = []
+    for block in self.order:
+      lines.append("b{}: <- {}".format(block.index, ', '.join(["b{}".format(pred.index) for pred in block.preds])))
+      for var in sorted(block.phis):
+        version, args = block.phis[var]
+        lines.append("  {}_{} = phi({})".format(var, version, ', '.join(["{}_{}".format(var, arg) for arg in args])))
+      for stmt, versions in zip(block.statements, block.versions):
+        lines.append("  {} <- {}".format(', '.join(["{}_{}".format(var, version) for var, version in sorted(versions.items())]),
+          stmt.__class__.__name__))
+      if block.cond is not None:
+        lines.append("  branch -> {}".format(', '.join(["b{}".format(succ.index) for succ in block.succs])))
+    return '\n'.join(lines)
+
+  # Translation to func_ast
+
+  def translate(self, name="code_block"):
+    self.ast_c = AST_C()
+    body = self.translate_regions(self.regions, func.ReturnTuple(sorted(self.outputs)), 0)
+    return func.FuncDef(func.ArgsList(sorted(self.entry.live_in)), func.ReturnTuple(sorted(self.outputs)), body, name)
+
+  def expr(self, node):
+    return self.ast_c.expr(node.__class__, node)
+
+  # Binding chain of the regions ending with tail. Loops are numbered from num_loops.
+  def translate_regions(self, regions, tail, num_loops):
+    bindings = []
+    for region in regions:
+      if isinstance(region, _IfRegion):
+        variables = sorted(region.join.phis)
+        if not variables:
+          continue
+        returned = func.ReturnTuple(variables)
+        bindings.append((_lhs(variables), func.If(self.expr(region.cond),
+          self.translate_regions(region.iftrue, returned, num_loops),
+          self.translate_regions(region.iffalse, returned, num_loops))))
+
+      elif isinstance(region, _LoopRegion):
+        variables = sorted(region.header.phis)
+        if not variables:
+          continue
+        inner_id = func.ArgsRecList("loop{}".format(num_loops), variables)
+        body = self.translate_regions(region.body, inner_id, num_loops + 1)
+        if_expr = func.If(self.expr(region.cond), body, func.ReturnTuple(variables))
+        bindings.append((_lhs(variables), func.RecursiveFunction(inner_id, if_expr, inner_id)))
+        num_loops += 1
+
+      elif isinstance(region, Decl):
+        if region.init is not None and not isinstance(region.init, InitList):
+          bindings.append((func.ID(region.name), self.expr(region.init)))
+
+      elif isinstance(region, Assignment):
+        if isinstance(region.lvalue, ID):
+          bindings.append((func.ID(region.lvalue.name), self.expr(region.rvalue)))
+        else:
+          bindings.append((self.expr(region.lvalue), self.expr(region.rvalue)))
+
+    node = tail
+    for lhs, expr1 in reversed(bindings):
+      node = func.Binding(lhs, expr1, node)
+    return node
+
+
+def _lhs(variables):
+  return func.ReturnTuple(variables) if len(variables) > 1 else func.ID(variables[0])
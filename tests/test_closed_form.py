@@ -0,0 +1,54 @@
+from func_eval import evaluate
+from func_utils import wrap_function
+from minic.c_ast_to_minic import transform
+from preprocess import get_parser, preprocess
+from transform_func import FunctionalTranslator
+
+# Closed-form summarization of induction loops (closed_form=True): the loops
+# over integers are summarized and give the same outputs as the recursive
+# translation, the others are left to it.
+
+
+def translations(source):
+  mast = transform(get_parser().parse(preprocess(wrap_function(source))))
+  return FunctionalTranslator(mast).translate(), FunctionalTranslator(mast, closed_form=True).translate()
+
+
+def summarized(source):
+  return not "let rec" in str(translations(source)[1])
+
+
+def test_integer_loops_are_summarized():
+  for source in ["for (i = 0; i < n; i++) s = s + i;",
+                 "for (i = k; i <= 10; i = i + 3) { s = s + (2 * i + 1); t = t - 1; }",
+                 "int m; for (j = 0; j < m; j++) y = y + 1;"]:
+    assert summarized(source), source
+
+
+def test_summary_matches_the_recursive_translation():
+  for source in ["for (i = 0; i < n; i++) s = s + i;",
+                 "for (i = k; i <= 10; i = i + 3) { s = s + (2 * i + 1); t = t - 1; }",
+                 "for (i = 5; i < n; i = i + 2) { s = s + n * i; c = 7; }"]:
+    default, closed = translations(source)
+    for seed in range(20):
+      assert evaluate(closed, seed) == evaluate(default, seed), (source, seed)
+
+
+def test_loop_that_does_not_run():
+  default, closed = translations("n = 0; for (i = 3; i < n; i++) s = s + i;")
+  for seed in range(5):
+    assert evaluate(closed, seed) == evaluate(default, seed)
+
+
+def test_float_bounds_are_not_summarized():
+  for source in ["for (j = 0; j < 2.5; j++) y = y + 1;",
+                 "for (j = 0.5; j < n; j++) y = y + 1;",
+                 "x = 2.5; for (j = 0; j < x; j++) y = y + 1;",
+                 "double x; for (j = 0; j < x; j++) y = y + 1;",
+                 "float j; for (j = 0; j < n; j++) y = y + 1;"]:
+    assert not summarized(source), source
+
+
+def test_non_constant_bounds_are_not_summarized():
+  assert not summarized("for (i = 0; i < n * 2; i++) s = s + i;")
+  assert not summarized("for (i = 0; i < f(n); i++) s = s + i;")
@@ -0,0 +1,49 @@
+from func_eval import evaluate
+from func_utils import wrap_function
+from minic.c_ast_to_minic import transform
+from pipeline import translate_block
+from preprocess import get_parser, preprocess
+from transform_func import FunctionalTranslator
+
+# Loop-invariant hoisting (hoist=True): the invariant expressions that are
+# safe to compute when the loop does not run move in front of the let rec,
+# the others stay in the loop.
+
+
+# The part of a translation in front of its first loop, and the loop.
+def split(source):
+  text = translate_block(source, hoist=True)
+  return text[:text.index("let rec")], text[text.index("let rec"):]
+
+
+def test_invariant_arithmetic_is_hoisted():
+  outside, loop = split("for (i = 0; i < n; i++) s = s + (b + c) * i;")
+  assert "b + c" in outside
+  assert not "b + c" in loop
+
+
+def test_array_reads_stay_in_the_loop():
+  outside, loop = split("for (i = 0; i < n; i++) s = s + a[k];")
+  assert not "a[k]" in outside
+  assert "a[k]" in loop
+
+
+def test_invariant_subscripts_are_hoisted():
+  outside, loop = split("for (i = 0; i < n; i++) s = s + a[k + 1];")
+  assert "k + 1" in outside
+  assert "a[inv0]" in loop
+
+
+def test_divisions_and_calls_stay_in_the_loop():
+  outside, loop = split("for (i = 0; i < n; i++) s = s + b / c + f(b) + b % c;")
+  for expr in ("b / c", "f(b)", "b % c"):
+    assert not expr in outside
+    assert expr in loop
+
+
+def test_hoisting_keeps_the_outputs():
+  source = "for (i = 0; i < n; i++) { s = s + a[k] * (b + c); for (j = 0; j < i; j++) t = t + (b + c) * j; }"
+  mast = transform(get_parser().parse(preprocess(wrap_function(source))))
+  default, hoisted = FunctionalTranslator(mast).translate(), FunctionalTranslator(mast, hoist=True).translate()
+  for seed in range(20):
+    assert evaluate(hoisted, seed) == evaluate(default, seed)
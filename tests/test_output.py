@@ -0,0 +1,58 @@
+import io
+import json
+
+from output import FilesSink, JsonLinesSink, TextSink
+
+# Output sinks, including for the inputs that could not be read (no source).
+
+READ_ERROR = "UnicodeDecodeError: invalid start byte (stage read)"
+
+
+def test_text_sink():
+  out = io.StringIO()
+  with TextSink(out) as sink:
+    sink.write("dir/a", "x = 1;", "fun a() = 1", 0.5)
+    sink.write("dir/b", None, None, 0.0, READ_ERROR)
+  text = out.getvalue()
+  assert "File: a \nInput:\nx = 1;\nOutput:\nfun a() = 1\n" in text
+  assert "File: b \nError: {}\n".format(READ_ERROR) in text
+
+
+def test_json_lines_sink():
+  out = io.StringIO()
+  with JsonLinesSink(out) as sink:
+    sink.write("dir/a", "x = 1;", "fun a() = 1", 0.5)
+    sink.write("dir/b", None, None, 0.0, READ_ERROR)
+  first, second = [json.loads(line) for line in out.getvalue().splitlines()]
+  assert first["input"] == "x = 1;" and len(first["sha1"]) == 40 and first["error"] is None
+  assert second["input"] is None and second["sha1"] is None and second["error"] == READ_ERROR
+
+
+def test_no_echo():
+  out = io.StringIO()
+  with JsonLinesSink(out, echo=False) as sink:
+    sink.write("dir/a", "x = 1;", "fun a() = 1", 0.5)
+  assert not "input" in json.loads(out.getvalue())
+
+
+def test_files_sink(tmp_path):
+  with FilesSink(str(tmp_path / "out")) as sink:
+    sink.write("dir/a", "x = 1;", "fun a() = 1", 0.5)
+    sink.write("dir/b", None, None, 0.0, READ_ERROR)
+  assert (tmp_path / "out" / "a.func").read_text() == "fun a() = 1\n"
+  assert (tmp_path / "out" / "b.func").read_text() == "Error: {}\n".format(READ_ERROR)
+
+
+def test_unreadable_input_in_a_batch(tmp_path):
+  from batch import BatchTranslator
+  good, bad = tmp_path / "good", tmp_path / "bad"
+  good.write_text("x = 1;\n")
+  bad.write_bytes(b"y = \xff;\n")
+  out = io.StringIO()
+  with JsonLinesSink(out) as sink:
+    for result in BatchTranslator(timeout=30).translate([str(good), str(bad)]):
+      sink.write(*result)
+  first, second = [json.loads(line) for line in out.getvalue().splitlines()]
+  assert first["error"] is None and first["input"] == "x = 1;\n"
+  assert second["sha1"] is None and second["input"] is None
+  assert second["error"].startswith("UnicodeDecodeError") and second["error"].endswith("(stage read)")
@@ -0,0 +1,51 @@
+import pytest
+
+from preprocess import ErrorUnsupportedDirective, Preprocessor
+
+# #if conditions of the built-in preprocessor, evaluated as C constant
+# expressions.
+
+
+def taken(condition, defines=None):
+  text = "#if {}\nyes\n#else\nno\n#endif\n".format(condition)
+  return "yes" in Preprocessor(defines=defines).preprocess(text)
+
+
+def test_c_precedence():
+  # & binds looser than == in C: A & (2 == 2)
+  assert taken("A & 2 == 2", {'A': 1})
+  assert not taken("A & 2 == 2", {'A': 2})
+  assert taken("1 + 2 * 3 == 7")
+  assert taken("1 << 2 + 1 == 8")
+  assert taken("(1 | 2 ^ 3) == 1")
+
+
+def test_comparisons_do_not_chain():
+  # (3 > 2) > 1 is 1 > 1
+  assert not taken("3 > 2 > 1")
+  assert taken("1 < 2 < 3")
+
+
+def test_division_truncates():
+  assert taken("-7 / 2 == -3")
+  assert taken("-7 % 2 == -1")
+  assert taken("7 % -2 == 1")
+
+
+def test_logical_operators_and_conditional():
+  assert taken("0 && 1 / 0 || 1")
+  assert taken("1 || 1 / 0")
+  assert taken("(1 ? 2 : 1 / 0) == 2")
+  assert taken("!0 && ~0 == -1")
+
+
+def test_macros_and_literals():
+  assert taken("defined(A) && !defined B && A == 0x10", {'A': 16})
+  assert taken("UNDEFINED + 1 == 1")
+  assert taken("010 == 8 && 10UL == 10")
+
+
+@pytest.mark.parametrize("condition", ["2 ** 100000000", "1 / 0", "1 % 0", "1 << 64", "1.5", "(1", "1 2", "'a'"])
+def test_unsupported_conditions(condition):
+  with pytest.raises(ErrorUnsupportedDirective):
+    taken(condition)
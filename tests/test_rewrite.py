@@ -0,0 +1,26 @@
+import func_ast as func
+from rewrite import Rewriter
+
+# Term rewriting (rewrite=True).
+
+
+# let y = x + 0 + ... + 0 in (y), with zeros additions of 0
+def block(zeros):
+  expr = func.ID('x')
+  for _ in range(zeros):
+    expr = func.BinaryOp('+', expr, func.Constant('0'))
+  return func.FuncDef(func.ArgsList(['x']), func.ReturnTuple(['y']),
+    func.Binding(func.ID('y'), expr, func.ReturnTuple(['y'])), 'f')
+
+
+def test_rewrite_to_normal_form():
+  assert str(Rewriter().rewrite(block(3)).body) == "let y = x in (y)"
+
+
+def test_each_rewrite_has_its_own_budget():
+  rewriter = Rewriter(max_steps=2)
+  assert str(rewriter.rewrite(block(3)).body) == "let y = x + 0 in (y)"
+  assert rewriter.steps == 2
+  # A budget spent on an earlier translation does not stop the next one.
+  assert str(rewriter.rewrite(block(2)).body) == "let y = x in (y)"
+  assert rewriter.applied == {'add-zero': 4}
@@ -0,0 +1,36 @@
+import pytest
+
+from func_utils import wrap_function
+from minic.c_ast_to_minic import transform
+from preprocess import get_parser, preprocess
+from transform_func import FunctionalTranslator, TranslationMemo, TranslationOptions
+
+# FunctionalTranslator on its own.
+
+
+def translator(source, **options):
+  return FunctionalTranslator(transform(get_parser().parse(preprocess(wrap_function(source)))), **options)
+
+
+def test_block_without_bindings():
+  for source in ["", ";", "int x;"]:
+    ftranslator = translator(source)
+    assert str(ftranslator.translate(False)) == str(ftranslator.translate(True)) == "fun code_block() return () = \n ()"
+    stats = ftranslator.statistics()
+    assert stats.size_before == stats.size_after
+
+
+def test_options_as_object_or_keywords():
+  source = "for (i = 0; i < n; i++) s = s + (a + b) * i;"
+  memo = TranslationMemo()
+  by_object = translator(source, options=TranslationOptions(hoist=True, memo=memo))
+  assert by_object.memo is memo
+  assert str(by_object.translate()) == str(translator(source, hoist=True).translate())
+  assert "inv0" in str(by_object.translate())
+
+
+def test_unknown_options():
+  with pytest.raises(TypeError):
+    translator("x = 1;", hoisting=True)
+  with pytest.raises(TypeError):
+    translator("x = 1;", options=TranslationOptions(), hoist=True)
@@ -1,11 +1,28 @@
+from collections import Counter
 from minic.minic_ast import *
+import minic.minic_ast as mc
 import func_ast as func
 
 class AST_C(NodeVisitor):
-  def __init__(self, simplify=True):
+  # Module of the classes of the visited nodes, read by the class checks of
+  # the translation of statements and expressions (see fused.py).
+  nodes = mc
+
+  def __init__(self, simplify=True, memo=None, loop_state=None, closed_form=None, stats=None):
     self.written_set = list()
     self.read_set = list()
     self.simplify = simplify
+    # Optional TranslationMemo shared with the AST_C of nested blocks.
+    self.memo = memo
+    # Optional map from the id of each loop to the variables it has to pass
+    # on (modified in the loop and live at its condition), see loop_state.
+    self.loop_state = loop_state
+    # Optional map from the variables of the block to whether they are
+    # integers (see integer_variables): replace the induction loops over
+    # integers by their closed form (see induction_loop).
+    self.closed_form = closed_form
+    # Counters shared with the AST_C of nested blocks (see TranslationStats).
+    self.stats = TranslationStats() if stats is None else stats
 
     # Keep track of the head binding and tail binding. For example
     # let id = expr1 in expr2, expr2 can be more bindings, so we need to keep
@@ -16,25 +33,72 @@ class AST_C(NodeVisitor):
     # Number of loops used for naming (default is 0):
     self.num_loops = 0
 
+  # With a memo table, if statements and loops that are structurally identical
+  # to one already translated reuse its bindings instead of being translated again.
+  def visit(self, node):
+    if self.memo is None or not isinstance(node, (self.nodes.If, self.nodes.For, self.nodes.While)):
+      return NodeVisitor.visit(self, node)
+
+    key = self.memo.key(node)
+    if self.loop_state is not None:
+      # The same loops can pass on different variables in another context.
+      key = (key, tuple([tuple(sorted(self.loop_state.get(id(loop), ()))) for loop in loops(node)]))
+    entry = self.memo.entries.get(key)
+    if entry is None:
+      self.memo.misses += 1
+      tail = self.tail_binding
+      num_written, num_read, num_loops = len(self.written_set), len(self.read_set), self.num_loops
+      counts = self.stats.as_dict()
+      NodeVisitor.visit(self, node)
+
+      bindings = []
+      curr = self.head_binding if tail is None else tail.expr2
+      while isinstance(curr, func.Binding):
+        bindings.append((curr.id, curr.expr1))
+        curr = curr.expr2
+      # What translating the node added to the counters, except the bindings
+      # created again when they are reused.
+      stats = TranslationStats()
+      for field in TranslationStats.COUNTERS:
+        setattr(stats, field, getattr(self.stats, field) - counts[field])
+      stats.bindings_created -= len(bindings)
+      self.memo.entries[key] = (num_loops, bindings, self.written_set[num_written:],
+        self.read_set[num_read:], self.num_loops - num_loops, stats)
+    else:
+      self.memo.hits += 1
+      num_loops, bindings, written_set, read_set, new_loops, stats = entry
+      self.stats.add(stats)
+      # The loops of the reused bindings are named after the loop number they
+      # were translated with, shift them to the current one.
+      copies = {}
+      for lhs, expr1 in bindings:
+        if self.num_loops != num_loops:
+          expr1 = renumber_loops(expr1, self.num_loops - num_loops, copies)
+        self.__create_binding(lhs, expr1, None)
+      self.written_set += written_set
+      self.read_set += read_set
+      self.num_loops += new_loops
+
   def expr(self, _class, value):
+    nodes = self.nodes
     return {
-        Constant: (lambda orig: func.Constant(orig.value)),
-        ID: (lambda orig: func.ID(orig.name)),
-        ArrayRef: (lambda orig: func.ArrayRef(
+        nodes.Constant: (lambda orig: func.Constant(orig.value)),
+        nodes.ID: (lambda orig: func.ID(orig.name)),
+        nodes.ArrayRef: (lambda orig: func.ArrayRef(
           self.expr(orig.name.__class__, orig.name), 
           self.expr(orig.subscript.__class__, orig.subscript))),
-        ExprList: (lambda orig: func.ArgsList([self.expr(x.__class__, x) for x in orig.exprs])),
-        FuncCall: (lambda orig: func.FuncCall(
+        nodes.ExprList: (lambda orig: func.ArgsList([self.expr(x.__class__, x) for x in orig.exprs])),
+        nodes.FuncCall: (lambda orig: func.FuncCall(
           self.expr(orig.name.__class__, orig.name), 
           self.expr(orig.args.__class__, orig.args))),
-        UnaryOp: (lambda orig: func.UnaryOp(
+        nodes.UnaryOp: (lambda orig: func.UnaryOp(
           orig.op,
           self.expr(orig.expr.__class__, orig.expr)
         )),
-        BinaryOp: (lambda orig: func.BinaryOp(orig.op, 
+        nodes.BinaryOp: (lambda orig: func.BinaryOp(orig.op, 
           self.expr(orig.left.__class__ , orig.left), 
           self.expr(orig.right.__class__, orig.right))),
-        TernaryOp: (lambda orig: func.If(
+        nodes.TernaryOp: (lambda orig: func.If(
           self.expr(orig.cond.__class__, orig.cond), 
           self.expr(orig.iftrue.__class__, orig.iftrue),
           self.expr(orig.iffalse.__class__, orig.iffalse)
@@ -53,7 +117,7 @@ class AST_C(NodeVisitor):
     # When the iftrue or iffalse blocks are not None then visit that branch
     # and update the written_set and read_set.
     if not condition.iftrue is None:
-      iftrue_ast = AST_C(self.simplify)
+      iftrue_ast = self.__class__(self.simplify, self.memo, self.loop_state, self.closed_form, self.stats)
       iftrue_ast.visit(condition.iftrue)
 
       self.written_set +=  iftrue_ast.written_set 
@@ -61,7 +125,7 @@ class AST_C(NodeVisitor):
       if_written_set.update(iftrue_ast.written_set)
 
     if not condition.iffalse is None:
-      iffalse_ast = AST_C(self.simplify)
+      iffalse_ast = self.__class__(self.simplify, self.memo, self.loop_state, self.closed_form, self.stats)
       iffalse_ast.visit(condition.iffalse)
 
       self.written_set += iffalse_ast.written_set
@@ -89,12 +153,17 @@ class AST_C(NodeVisitor):
     self.__create_binding(lhs, if_expr, None)
   
   def visit_For(self, for_loop):
+    if self.closed_form is not None:
+      summary = self.induction_loop(for_loop)
+      if summary is not None:
+        return self.summarize_loop(for_loop, summary)
+
     # Initialize loop variable
     self.visit_Assignment(for_loop.init)
   
     # Visit loop statement to get all the written variables
     for_written_set = set()
-    body_ast = AST_C(self.simplify)
+    body_ast = self.__class__(self.simplify, self.memo, self.loop_state, self.closed_form, self.stats)
     # Use the current loop number incremented by one if there is a nested loop inside
     body_ast.set_num_loops(self.num_loops + 1)
     body_ast.visit(for_loop.stmt)
@@ -107,7 +176,7 @@ class AST_C(NodeVisitor):
     increment_id = func.ID(for_loop.next.lvalue.name)
     increment_expr = self.expr(for_loop.next.rvalue.__class__, for_loop.next.rvalue)
     self.written_set.append(for_loop.next.lvalue.name)
-    self.written_set.append(for_loop.next.lvalue.name)
+    for_written_set = self.loop_variables(for_loop, for_written_set)
 
     outer_id = func.ReturnTuple(for_written_set) if len(for_written_set) > 1 else func.ID(next(iter(for_written_set)))
     inner_id = func.ArgsRecList("loop{}".format(self.num_loops), for_written_set)
@@ -128,12 +197,13 @@ class AST_C(NodeVisitor):
     # Do not need to worry about incrementation and initialization in while loop. Assume they're there and loop can terminate.
     # Visit loop statement to get all the written variables
     while_written_set = set()
-    body_ast = AST_C(self.simplify)
+    body_ast = self.__class__(self.simplify, self.memo, self.loop_state, self.closed_form, self.stats)
     body_ast.set_num_loops(self.num_loops + 1)
     body_ast.visit(while_loop.stmt)
     while_written_set.update(body_ast.written_set)
     self.written_set += body_ast.written_set
     self.read_set += body_ast.read_set
+    while_written_set = self.loop_variables(while_loop, while_written_set)
     outer_id = func.ReturnTuple(while_written_set) if len(while_written_set) > 1 else func.ID(next(iter(while_written_set)))
     inner_id = func.ArgsRecList("loop{}".format(self.num_loops), while_written_set)
     self.num_loops += 1
@@ -148,27 +218,148 @@ class AST_C(NodeVisitor):
 
     self.__create_binding(outer_id, rec_expr, None)
 
+  # Recognizes the for loops whose integer counter goes up by a constant step
+  # from an integer start to an integer bound (constants or integer variables,
+  # see integer_variables) that the loop does not modify, and whose body only
+  # assigns scalars, each at most once, with either a loop-invariant value or the variable itself plus or
+  # minus an affine function of the counter (with loop-invariant
+  # coefficients). Returns (counter, step, comparison, bound, {variable:
+  # (operator, constant part, counter coefficient)}) with the expressions in
+  # func_ast, or None. Zero parts are None.
+  def induction_loop(self, for_loop):
+    init, cond, next = for_loop.init, for_loop.cond, for_loop.next
+    if not isinstance(init, Assignment) or not isinstance(init.lvalue, ID) or not isinstance(next, Assignment):
+      return None
+    counter = init.lvalue.name
+    if not self.closed_form.get(counter, True) or not _integer(init.rvalue, self.closed_form):
+      return None
+    if not isinstance(next.lvalue, ID) or next.lvalue.name != counter or not isinstance(next.rvalue, BinaryOp) \
+        or next.rvalue.op != '+':
+      return None
+    step = next.rvalue.right if _is_id(next.rvalue.left, counter) else next.rvalue.left
+    step = _int_constant(step) if _is_id(next.rvalue.left, counter) or _is_id(next.rvalue.right, counter) else None
+    if step is None or step <= 0:
+      return None
+
+    if isinstance(cond, BinaryOp) and cond.op in ('<', '<=') and _is_id(cond.left, counter):
+      op, bound = cond.op, cond.right
+    elif isinstance(cond, BinaryOp) and cond.op in ('>', '>=') and _is_id(cond.right, counter):
+      op, bound = {'>': '<', '>=': '<='}[cond.op], cond.left
+    else:
+      return None
+    if not _integer(bound, self.closed_form):
+      return None
+
+    stmts = (for_loop.stmt.block_items or []) if isinstance(for_loop.stmt, Block) else [for_loop.stmt]
+    if not all([isinstance(stmt, Assignment) and isinstance(stmt.lvalue, ID) for stmt in stmts]):
+      return None
+    modified = set([counter] + [stmt.lvalue.name for stmt in stmts])
+    if len(modified) != len(stmts) + 1:
+      return None
+    bound = self.expr(bound.__class__, bound)
+    if not _loop_invariant(bound, modified):
+      return None
+
+    updates = {}
+    for stmt in stmts:
+      var, rvalue = stmt.lvalue.name, self.expr(stmt.rvalue.__class__, stmt.rvalue)
+      if _loop_invariant(rvalue, modified):
+        updates[var] = ('=', rvalue, None)
+        continue
+      if isinstance(rvalue, func.BinaryOp) and rvalue.op in ('+', '-') and _is_func_id(rvalue.left, var):
+        op_var, term = rvalue.op, rvalue.right
+      elif isinstance(rvalue, func.BinaryOp) and rvalue.op == '+' and _is_func_id(rvalue.right, var):
+        op_var, term = '+', rvalue.left
+      else:
+        return None
+      coefficients = _affine(term, counter, modified)
+      if coefficients is None:
+        return None
+      updates[var] = (op_var,) + coefficients
+    return counter, step, op, bound, updates
+
+  # Translates an induction loop into the values of its variables after the
+  # loop, computed from its trip count T: the counter goes up by step * T and
+  # a variable updated with c0 + c1 * counter by c0 * T + c1 * (sum of the
+  # values of the counter). The closed form is guarded by the loop condition,
+  # since the loop does not run at all when it is false.
+  def summarize_loop(self, for_loop, summary):
+    counter, step, op, bound, updates = summary
+    self.visit_Assignment(for_loop.init)
+
+    # Only for the read and written sets, the bindings are not used.
+    body_ast = AST_C(self.simplify)
+    body_ast.visit(for_loop.stmt)
+    self.written_set += body_ast.written_set
+    self.read_set += body_ast.read_set
+    self.written_set.append(counter)
+    written = self.loop_variables(for_loop, set(body_ast.written_set + [counter]))
+
+    start, step_expr = func.ID(counter), func.Constant(str(step))
+    if op == '<':
+      trips = _minus(bound, start) if step == 1 else \
+        _divide(_plus(_minus(bound, start), func.Constant(str(step - 1))), step_expr)
+    else:
+      trips = _plus(_minus(bound, start), func.Constant('1')) if step == 1 else \
+        _plus(_divide(_minus(bound, start), step_expr), func.Constant('1'))
+    # start * T + step * T * (T - 1) / 2
+    counter_sum = _plus(_times(trips, start),
+      _times(step_expr, _divide(_times(trips, _minus(trips, func.Constant('1'))), func.Constant('2'))))
+
+    values = {counter: _plus(start, _times(step_expr, trips))}
+    for var, (op_var, constant, coefficient) in updates.items():
+      if op_var == '=':
+        values[var] = constant
+      else:
+        delta = _plus(_times(constant, trips), _times(coefficient, counter_sum))
+        values[var] = _plus(func.ID(var), delta) if op_var == '+' else _minus(func.ID(var), delta)
+
+    lhs = func.ReturnTuple(written) if len(written) > 1 else func.ID(next(iter(written)))
+    closed = func.ReturnTuple([values[var] for var in written])
+    self.__create_binding(lhs, func.If(self.expr(for_loop.cond.__class__, for_loop.cond), closed, lhs), None)
+
+  # The variables written in a loop that its recursive function passes on:
+  # all of them, or with loop_state only the ones still needed.
+  def loop_variables(self, loop, written):
+    if self.loop_state is None:
+      return written
+    needed = self.loop_state.get(id(loop), written)
+    return set([var for var in written if var in needed]) or written
+
   def visit_Block(self, block):
     self.generic_visit(block)
 
   def visit_Assignment(self, assignment):
-    self.visit(assignment.rvalue)
+    self.record_assignment(assignment)
 
     expr1 = self.expr(assignment.rvalue.__class__, assignment.rvalue)
-
-    if isinstance(assignment.lvalue, ID):
+    if isinstance(assignment.lvalue, self.nodes.ID):
       written_var = func.ID(assignment.lvalue.name)
-      self.written_set.append(assignment.lvalue.name)
     else:
       written_var = self.expr(assignment.lvalue.__class__, assignment.lvalue)
+
+    self.__create_binding(written_var, expr1, None)
+
+  # Adds the variables read and written by an assignment to the read and written sets.
+  def record_assignment(self, assignment):
+    self.visit(assignment.rvalue)
+
+    if isinstance(assignment.lvalue, self.nodes.ID):
+      self.written_set.append(assignment.lvalue.name)
+    else:
       # Written Variable is the array name, all the subscripts are read
       self.visit_ArrayRef(assignment.lvalue)
       expr = assignment.lvalue
-      while not isinstance(expr, ID):
+      while not isinstance(expr, self.nodes.ID):
         expr = expr.name
       self.written_set.append(expr.name)
 
-    self.__create_binding(written_var, expr1, None)
+  # Declarations with an initializer (found in function bodies) bind the declared variable.
+  def visit_Decl(self, decl):
+    if decl.init is None or isinstance(decl.init, InitList):
+      self.generic_visit(decl)
+    else:
+      self.visit_Assignment(Assignment(ID(decl.name), decl.init))
 
   def visit_BinaryOp(self, binaryop):
     self.generic_visit(binaryop)
@@ -177,7 +368,7 @@ class AST_C(NodeVisitor):
     self.read_set.append(id.name)
 
   def visit_ArrayRef(self, array_ref):
-    if isinstance(array_ref.name, ID):
+    if isinstance(array_ref.name, self.nodes.ID):
       self.visit_ID(array_ref.name)
     else:
       self.visit_ArrayRef(array_ref.name)
@@ -187,6 +378,7 @@ class AST_C(NodeVisitor):
     self.num_loops = num
   
   def __create_binding(self, lhs, expr1, expr2):
+    self.stats.bindings_created += 1
     current_binding = func.Binding(lhs, expr1, expr2)
     if self.head_binding is None:
       self.head_binding = current_binding
@@ -195,113 +387,793 @@ class AST_C(NodeVisitor):
     self.tail_binding = current_binding
 
   def simplify_binding(self, binding, read_set, write_set, return_list):
-    head = binding
-    prev = None
-    curr = binding
+    # The bindings of the input chain are never modified. Bindings that survive
+    # are copied into a new chain and share their expressions with the input,
+    # so the unsimplified chain stays valid after simplification.
+    kept = []
     replace = {}
+    # Number of reads and writes of each variable, counted once instead of
+    # for each binding.
+    read_counts, write_counts = Counter(read_set), Counter(write_set)
+    curr = binding
     while isinstance(curr, func.Binding):
       # Since we simplify the inner body of if statements and loops first, skip this.
       if isinstance(curr.expr1, func.If) or isinstance(curr.expr1, func.RecursiveFunction):
-        prev = curr
-      
+        kept.append((curr.id, curr.expr1))
+
       # Skip array refs for now
       elif isinstance(curr.id, func.ArrayRef):
-        prev = curr
+        kept.append((curr.id, curr.expr1))
 
       elif isinstance(curr.id, func.ID):
         # Use FunctionalVistor to replace the variables with constants.
-        f_visitor = FunctionalVisitor(curr.expr1, replace)
+        visitor = FunctionalVisitor(curr.expr1, replace)
+        expr1 = visitor.node
+        self.stats.substitutions += visitor.substitutions
 
         # If the variable in expr1 does not appear until the end of the return tuple, then take out the binding.
-        if read_set.count(curr.id.name) <= 1:
-          f_visitor = FunctionalVisitor(curr.expr1)
-          
-          # Check if there are any variables in expr1 that are in the written set. If there aren't, then
-          # get rid of the binding and set the return tuple variable to the expression.
-          if all([write_set.count(var) <= 1 for var in f_visitor.var_set]):
-            replace[curr.id.name] = curr.expr1
-            if prev is None:
-              if not curr.expr2 is None:
-                head = curr.expr2
-            else:                
-              prev.expr2 = curr.expr2
-          
-           # If expr1 is just an expression without any variables, then take out the binding.
-          elif not f_visitor.var_set:
-            replace[curr.id.name] = curr.expr1
-            if prev is None:
-              if not curr.expr2 is None:
-                head = curr.expr2
-            else:                
-              prev.expr2 = curr.expr2 
-
-          else:
-            prev = curr
-
+        # Check if there are any variables in expr1 that are in the written set. If there aren't (or if expr1
+        # is just an expression without any variables), then get rid of the binding and set the return tuple
+        # variable to the expression.
+        if read_counts[curr.id.name] <= 1 and \
+            all([write_counts[var] <= 1 for var in FunctionalVisitor(expr1).var_set]):
+          replace[curr.id.name] = expr1
+          self.stats.bindings_inlined += 1
         else:
-          prev = curr      
+          kept.append((curr.id, expr1))
+
+      else:
+        kept.append((curr.id, curr.expr1))
 
       # Move to the next binding
       curr = curr.expr2
 
     # Replace each variable in the return tuple if needed
     return_tuple = func.ReturnTuple([replace[var] if var in replace else var for var in return_list])
-    if prev is None:
-      head = return_tuple
-    elif isinstance(head, func.Binding) and head.id == return_tuple:
-      head = head.expr1
-    else:
-      prev.expr2 = return_tuple 
-    
+    self.stats.substitutions += len([var for var in return_list if var in replace])
+    if not kept:
+      return return_tuple
+    if kept[0][0] == return_tuple:
+      self.stats.bindings_removed += 1
+      return kept[0][1]
+
+    head = return_tuple
+    for lhs, expr1 in reversed(kept):
+      head = func.Binding(lhs, expr1, head)
     return head
 
-  # Transforms minic block into func_ast starting with FuncDef as parent node
-  def transform(self):
+  # Transforms minic block into func_ast starting with FuncDef as parent node.
+  # The simplified translation is derived from the bindings without modifying
+  # them, so both modes can be produced from the same traversal.
+  def transform(self, simplify=None, name="code_block"):
+    if simplify is None:
+      simplify = self.simplify
     args_list = func.ArgsList(set(self.read_set + self.written_set))
     return_list = set(self.written_set)
     return_tuple = func.ReturnTuple(return_list)
     # For now only worry about let id = ... in ...
 
-    if self.simplify:
-      self.head_binding = self.simplify_binding(self.head_binding, self.written_set, self.read_set, return_list)
+    if simplify:
+      body = self.simplify_binding(self.head_binding, self.written_set, self.read_set, return_list)
+    elif self.head_binding is None:
+      # A block without bindings (e.g. empty) returns the tuple directly.
+      body = return_tuple
     else:
       self.tail_binding.expr2 = return_tuple
-    
-    return func.FuncDef(args_list, return_tuple, self.head_binding)
+      body = self.head_binding
+
+    return func.FuncDef(args_list, return_tuple, body, name)
+
+class TranslationStats(object):
+  # What the translation and its simplification did to a block. The counters
+  # are updated by AST_C as it goes, the sizes of the unsimplified (before)
+  # and simplified (after) translations are set by
+  # FunctionalTranslator.statistics. Bindings whose expression is substituted
+  # into the later ones are inlined, bindings of the whole returned tuple are
+  # removed (the tuple is replaced by their expression). The bodies of if
+  # statements are always simplified, the counters include them in both modes.
+  FIELDS = ("bindings_created", "bindings_inlined", "bindings_removed", "substitutions", "loops",
+    "nodes_before", "nodes_after", "size_before", "size_after")
+  # The fields updated by AST_C
+  COUNTERS = FIELDS[:4]
+
+  def __init__(self):
+    for field in self.FIELDS:
+      setattr(self, field, 0)
+
+  def add(self, other):
+    for field in self.FIELDS:
+      setattr(self, field, getattr(self, field) + getattr(other, field))
+    return self
+
+  def as_dict(self):
+    return dict((field, getattr(self, field)) for field in self.FIELDS)
+
+  def __str__(self):
+    return '\n'.join(["{}: {}".format(field.replace('_', ' '), getattr(self, field)) for field in self.FIELDS])
+
+# (number of nodes, number of loops) of a func_ast fragment. The names in
+# tuples and argument lists count as nodes, the Constant wrapping an
+# expression substituted by simplify does not.
+def tree_size(node):
+  nodes, loops = 0, 0
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    if isinstance(node, str):
+      nodes += 1
+    elif isinstance(node, func.Constant) and isinstance(node.value, func.Node):
+      stack.append(node.value)
+    elif isinstance(node, func.Node):
+      nodes += 1
+      if isinstance(node, func.RecursiveFunction):
+        loops += 1
+      nodes += len(names_of(node))
+      stack.extend(node)
+  return nodes, loops
+
+# The names (strings) in a tuple or argument list, which are not Nodes and
+# not among its children when it is iterated.
+def names_of(node):
+  if isinstance(node, func.ReturnTuple):
+    items = node.exprs
+  elif isinstance(node, (func.ArgsList, func.ArgsRecList)):
+    items = node.args
+  else:
+    return []
+  return [item for item in items or () if isinstance(item, str)]
+
+class TranslationMemo(object):
+  # Memo table for AST_C, keyed by the structure of the minic subtree: two
+  # subtrees have the same key when they have the same node classes,
+  # operators, names and constants.
+  def __init__(self):
+    # key -> (loop number, [(lhs, expr1)], written_set, read_set, loops, TranslationStats)
+    self.entries = {}
+    self.hits = 0
+    self.misses = 0
+
+  def key(self, node):
+    return structure(node)
+
+
+# Structural key of a minic subtree as nested tuples. The common node classes
+# are handled directly, the fields that can be None keep their position.
+def structure(node):
+  cls = node.__class__
+  if cls is ID:
+    return node.name
+  if cls is Constant:
+    return (Constant, node.value)
+  if cls is BinaryOp:
+    return (node.op, structure(node.left), structure(node.right))
+  if cls is Assignment:
+    return (Assignment, structure(node.lvalue), structure(node.rvalue))
+  if cls is ArrayRef:
+    return (ArrayRef, structure(node.name), structure(node.subscript))
+  if cls is Block:
+    return (Block,) + tuple([structure(item) for item in node.block_items or ()])
+  if node is None:
+    return None
+  if cls is If or cls is TernaryOp:
+    return (cls, structure(node.cond), structure(node.iftrue), structure(node.iffalse))
+  if cls is For:
+    return (For, structure(node.init), structure(node.cond), structure(node.next), structure(node.stmt))
+  if cls is While:
+    return (While, structure(node.cond), structure(node.stmt))
+  attrs = tuple([tuple(value) if isinstance(value, list) else value
+    for value in [getattr(node, name, None) for name in getattr(node, 'attr_names', ())]])
+  return (cls, attrs) + tuple([(name, structure(child)) for name, child in node.children()])
+
+
+def _is_id(node, name):
+  return isinstance(node, ID) and node.name == name
+
+def _is_func_id(node, name):
+  return isinstance(node, func.ID) and node.name == name
+
+def _int_constant(node):
+  if not isinstance(node, Constant) or node.type != 'int':
+    return None
+  try:
+    return int(node.value.rstrip('uUlL'), 0)
+  except ValueError:
+    return None
+
+# Whether a minic expression is an integer constant or an integer variable
+# (integers maps the variables to whether they are integers).
+def _integer(node, integers):
+  if isinstance(node, ID):
+    return integers.get(node.name, True)
+  return _int_constant(node) is not None
+
+# Whether a func_ast expression reads none of the variables in modified.
+# Function calls are not considered invariant.
+def _loop_invariant(node, modified):
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    if isinstance(node, func.ID):
+      if node.name in modified:
+        return False
+    elif isinstance(node, func.FuncCall):
+      return False
+    elif isinstance(node, func.Node):
+      stack.extend(node)
+  return True
+
+# (constant part, counter coefficient) of a func_ast expression that is an
+# affine function of counter, None for a zero part; None if it is not affine.
+def _affine(node, counter, modified):
+  if _is_func_id(node, counter):
+    return None, func.Constant('1')
+  if _loop_invariant(node, modified):
+    return node, None
+  if isinstance(node, func.BinaryOp) and node.op in ('+', '-'):
+    left, right = _affine(node.left, counter, modified), _affine(node.right, counter, modified)
+    if left is None or right is None:
+      return None
+    combine = _plus if node.op == '+' else _minus
+    return combine(left[0], right[0]), combine(left[1], right[1])
+  if isinstance(node, func.BinaryOp) and node.op == '*':
+    for factor, other in ((node.left, node.right), (node.right, node.left)):
+      if _loop_invariant(factor, modified):
+        other = _affine(other, counter, modified)
+        return None if other is None else (_times(factor, other[0]), _times(factor, other[1]))
+  return None
+
+# Builders for the closed forms, a None operand is zero. Compound operands are
+# printed in parentheses, as one element tuples like the branches of
+# translated if statements.
+def _group(node):
+  return func.ReturnTuple([node]) if isinstance(node, func.BinaryOp) else node
+
+def _plus(left, right):
+  if right is None:
+    return left
+  if left is None:
+    return right
+  return func.BinaryOp('+', left, _group(right))
+
+def _minus(left, right):
+  if right is None:
+    return left
+  if left is None:
+    return func.UnaryOp('-', _group(right))
+  return func.BinaryOp('-', left, _group(right))
+
+def _times(left, right):
+  if left is None or right is None:
+    return None
+  if isinstance(left, func.Constant) and left.value == '1':
+    return right
+  if isinstance(right, func.Constant) and right.value == '1':
+    return left
+  return func.BinaryOp('*', _group(left), _group(right))
+
+def _divide(left, right):
+  return func.BinaryOp('/', _group(left), _group(right))
+
+
+# The loops of a minic subtree, in order.
+def loops(node):
+  found = []
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    if isinstance(node, (For, While)):
+      found.append(node)
+    stack += reversed(list(node))
+  return found
+
+
+# Map from the id of each loop of a minic tree to the variables modified in
+# the loop that are live at its condition, i.e. read by the next iteration or
+# after the loop: its phi nodes in SSA form. The block returns every variable
+# it writes, so only the variables assigned again after the loop before being
+# read are left out.
+def loop_state(ast):
+  from ssa import SSA
+  return dict((key, set(header.phis)) for key, header in SSA(ast).loops.items())
+
+
+INTEGER_TYPES = set(['char', 'short', 'int', 'long', 'signed', 'unsigned', '_Bool'])
+
+# Map from the variables of a minic tree to whether they are integers: the
+# declared scalars to whether their type is an integer type, the arrays and
+# pointers to False. The variables the block does not declare are its inputs,
+# taken as integers, unless the block assigns them a constant that is not one.
+def integer_variables(ast):
+  integers = {}
+  stack = [ast]
+  while stack:
+    node = stack.pop()
+    if isinstance(node, Decl) and node.name is not None:
+      integers[node.name] = isinstance(node.type, TypeDecl) and isinstance(node.type.type, IdentifierType) \
+        and set(node.type.type.names) <= INTEGER_TYPES
+    elif isinstance(node, Assignment) and isinstance(node.lvalue, ID) and isinstance(node.rvalue, Constant) \
+        and node.rvalue.type not in ('int', 'char'):
+      integers.setdefault(node.lvalue.name, False)
+    stack.extend(node)
+  return integers
+
+
+# Copies a translated func_ast fragment with the number of every loop shifted
+# by delta. Only the nodes that can contain loops are copied, the expressions
+# are shared. copies maps the original ArgsRecList nodes to their copies, so
+# the copy shares them the same way the original does.
+def renumber_loops(node, delta, copies):
+  if isinstance(node, func.ArgsRecList):
+    if not id(node) in copies:
+      copies[id(node)] = func.ArgsRecList("loop{}".format(int(node.loop_id[4:]) + delta), node.args)
+    return copies[id(node)]
+  if isinstance(node, func.RecursiveFunction):
+    return func.RecursiveFunction(renumber_loops(node.args, delta, copies),
+      renumber_loops(node.expr1, delta, copies), renumber_loops(node.expr2, delta, copies))
+  if isinstance(node, func.If):
+    return func.If(node.cond, renumber_loops(node.iftrue, delta, copies), renumber_loops(node.iffalse, delta, copies))
+  if isinstance(node, func.Binding):
+    # Binding chains can be long, walk them iteratively.
+    chain = []
+    while isinstance(node, func.Binding):
+      chain.append(node)
+      node = node.expr2
+    node = renumber_loops(node, delta, copies)
+    for binding in reversed(chain):
+      node = func.Binding(binding.id, renumber_loops(binding.expr1, delta, copies), node)
+    return node
+  return node
+
+
+# Every name that appears in a func_ast fragment, including the ones bound
+# inside it.
+def all_names(node, names):
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    if isinstance(node, str):
+      names.add(node)
+    elif isinstance(node, func.ID):
+      names.add(node.name)
+    elif isinstance(node, func.Constant):
+      # Substituted expressions are wrapped in a Constant.
+      if isinstance(node.value, func.Node):
+        stack.append(node.value)
+    elif isinstance(node, func.Node):
+      names.update(names_of(node))
+      stack.extend(node)
+  return names
+
+# Variables written by the left hand side of a binding: the variable, the
+# array of an array update or the variables of a tuple.
+def written_names(lhs):
+  while isinstance(lhs, func.ArrayRef):
+    lhs = lhs.name
+  if isinstance(lhs, func.ID):
+    return set([lhs.name])
+  return all_names(lhs, set())
+
+# Variables whose previous value a binding replaces: all the ones it writes,
+# except for an array update, which keeps the rest of the array.
+def replaced_names(lhs):
+  if isinstance(lhs, func.ArrayRef):
+    return set()
+  return written_names(lhs)
+
+# Names a func_ast fragment reads from outside of it. The names bound inside
+# it (by a let, or as the name or the arguments of a let rec) are not read
+# from outside where they are bound.
+def free_names(node):
+  if isinstance(node, str):
+    return set([node])
+  if isinstance(node, func.ID):
+    return set([node.name])
+  if isinstance(node, func.Constant):
+    # Substituted expressions are wrapped in a Constant.
+    return free_names(node.value) if isinstance(node.value, func.Node) else set()
+  if isinstance(node, (func.Binding, func.ParallelBinding)):
+    # Binding chains can be long, walk them iteratively.
+    chain = []
+    while isinstance(node, (func.Binding, func.ParallelBinding)):
+      chain.append(node.bindings if isinstance(node, func.ParallelBinding) else [node])
+      node = node.expr2
+    names = free_names(node)
+    for bindings in reversed(chain):
+      reads, replaced = set(), set()
+      for binding in bindings:
+        reads |= binding_accesses(binding)[0]
+        replaced |= replaced_names(binding.id)
+      names = (names - replaced) | reads
+    return names
+  if isinstance(node, func.RecursiveFunction):
+    body = free_names(node.expr1) - set(node.args.args)
+    return (body | free_names(node.expr2)) - set([node.args.loop_id])
+  if not isinstance(node, func.Node):
+    return set()
+  names = set(names_of(node))
+  for child in node:
+    names |= free_names(child)
+  return names
+
+# (read, written, replaced) variables of a binding, as def_use.accesses gives
+# them for a statement: an array update reads the array and its subscripts.
+def binding_accesses(binding):
+  reads = free_names(binding.expr1)
+  if isinstance(binding.id, func.ArrayRef):
+    reads |= free_names(binding.id)
+  return reads, written_names(binding.id), replaced_names(binding.id)
+
+# Regroups every binding chain of a func_ast fragment into simultaneous
+# let ... and ... groups, from the def-use graph of the bindings of the chain
+# (see def_use.py). Each binding goes in the first group after the ones it
+# has a flow or output dependency on, and not before the ones it has an anti
+# dependency on (inside a group every binding sees the values from before the
+# group). Bindings keep their order within a group, the fragment is copied.
+def parallel_bindings(node):
+  if isinstance(node, func.If):
+    return func.If(node.cond, parallel_bindings(node.iftrue), parallel_bindings(node.iffalse))
+  if isinstance(node, func.RecursiveFunction):
+    return func.RecursiveFunction(node.args, parallel_bindings(node.expr1), node.expr2)
+  if not isinstance(node, func.Binding):
+    return node
+
+  chain = []
+  while isinstance(node, func.Binding):
+    chain.append(node)
+    node = node.expr2
+  tail = parallel_bindings(node)
+
+  from def_use import DefUseGraph, FLOW, ANTI, OUTPUT
+  graph = DefUseGraph(chain, binding_accesses)
+  groups = []
+  group_of = []
+  for j, binding in enumerate(chain):
+    group = max([group_of[i] + 1 for i in graph.predecessors(j, FLOW | OUTPUT)] +
+      [group_of[i] for i in graph.predecessors(j, ANTI)] + [0])
+    if group == len(groups):
+      groups.append([])
+    groups[group].append(func.Binding(binding.id, parallel_bindings(binding.expr1), None))
+    group_of.append(group)
+
+  node = tail
+  for group in reversed(groups):
+    if len(group) == 1:
+      group[0].expr2 = node
+      node = group[0]
+    else:
+      node = func.ParallelBinding(group, node)
+  return node
+
+
+# Moves the loop-invariant expressions out of the recursive functions of a
+# func_ast fragment. An expression is invariant when it reads none of the loop
+# arguments and none of the variables bound in the loop body; the largest
+# invariant expressions of the loop condition and body are bound to fresh
+# variables in front of the let rec and replaced by them, so they are computed
+# once instead of on every call. Inner loops are done first, so what is
+# invariant in the outer loop as well moves further out. Function calls,
+# divisions, modulos and array reads are left in place, since they may not be
+# safe to compute when the loop does not run. The fragment is copied.
+def hoist_invariants(node):
+  return _Hoister(node).visit(node)
+
+
+class _Hoister(object):
+  def __init__(self, node):
+    self.names = all_names(node, set())
+    self.count = 0
+    # Variables bound to hoisted expressions
+    self.hoisted = set()
+
+  def fresh(self):
+    while True:
+      name = "inv{}".format(self.count)
+      self.count += 1
+      if not name in self.names:
+        self.hoisted.add(name)
+        return name
+
+  # Copy of a fragment with the loops inside it hoisted.
+  def visit(self, node):
+    if isinstance(node, func.Binding):
+      chain = []
+      while isinstance(node, func.Binding):
+        chain.append(node)
+        node = node.expr2
+      node = self.visit(node)
+      for binding in reversed(chain):
+        node = func.Binding(binding.id, self.visit(binding.expr1), node)
+      return node
+    if isinstance(node, func.ParallelBinding):
+      return func.ParallelBinding([func.Binding(binding.id, self.visit(binding.expr1), None)
+        for binding in node.bindings], self.visit(node.expr2))
+    if isinstance(node, func.If):
+      return func.If(node.cond, self.visit(node.iftrue), self.visit(node.iffalse))
+    if isinstance(node, func.RecursiveFunction):
+      return self.loop(node)
+    return node
+
+  def loop(self, rec):
+    body = self.visit(rec.expr1)
+    if not isinstance(body, func.If):
+      return func.RecursiveFunction(rec.args, body, rec.expr2)
+
+    variant = set(rec.args.args)
+    stack = [body]
+    while stack:
+      node = stack.pop()
+      if isinstance(node, (func.Binding, func.ParallelBinding)):
+        for binding in node.bindings if isinstance(node, func.ParallelBinding) else [node]:
+          variant |= written_names(binding.id)
+          stack.append(binding.expr1)
+        stack.append(node.expr2)
+      elif isinstance(node, func.RecursiveFunction):
+        variant |= set(node.args.args)
+        stack.append(node.expr1)
+      elif isinstance(node, func.If):
+        stack += [node.iftrue, node.iffalse]
+
+    hoisted = []
+    # The returned variables are only built once, when the loop ends.
+    cond = self.hoist(self.rewrite(body.cond, variant, hoisted), hoisted)
+    iftrue = self.hoist(self.rewrite(body.iftrue, variant, hoisted), hoisted)
+    node = func.RecursiveFunction(rec.args, func.If(cond, iftrue, body.iffalse), rec.expr2)
+    for name, expr in reversed(hoisted):
+      node = func.Binding(func.ID(name), expr, node)
+    return node
+
+  # Returns the hoisted variable of an invariant expression, or the expression.
+  def hoist(self, rewritten, hoisted):
+    node, invariant = rewritten
+    if not invariant or isinstance(node, func.ID) or \
+        (isinstance(node, func.Constant) and not isinstance(node.value, func.Node)):
+      return node
+    for name, expr in hoisted:
+      if expr is node:
+        return func.ID(name)
+    name = self.fresh()
+    hoisted.append((name, node))
+    return func.ID(name)
+
+  # Returns (copy with the invariant parts hoisted, whether node is invariant).
+  # Invariant nodes are returned as they are, for their parent to hoist.
+  def rewrite(self, node, variant, hoisted):
+    if isinstance(node, func.ID):
+      return node, not node.name in variant
+    if isinstance(node, func.Constant):
+      if not isinstance(node.value, func.Node):
+        return node, True
+      value, invariant = self.rewrite(node.value, variant, hoisted)
+      return (node, True) if invariant else (func.Constant(value), False)
+    if isinstance(node, func.BinaryOp):
+      left, right = self.rewrite(node.left, variant, hoisted), self.rewrite(node.right, variant, hoisted)
+      if left[1] and right[1] and not node.op in ('/', '%'):
+        return node, True
+      return func.BinaryOp(node.op, self.hoist(left, hoisted), self.hoist(right, hoisted)), False
+    if isinstance(node, func.UnaryOp):
+      expr = self.rewrite(node.expr, variant, hoisted)
+      if expr[1]:
+        return node, True
+      return func.UnaryOp(node.op, expr[0]), False
+    if isinstance(node, func.ArrayRef):
+      # Left in place like divisions, the subscript may be out of bounds when
+      # the loop does not run.
+      name, subscript = self.rewrite(node.name, variant, hoisted), self.rewrite(node.subscript, variant, hoisted)
+      return func.ArrayRef(self.hoist(name, hoisted), self.hoist(subscript, hoisted)), False
+    if isinstance(node, func.If):
+      parts = [self.rewrite(part, variant, hoisted) for part in (node.cond, node.iftrue, node.iffalse)]
+      if all([invariant for _, invariant in parts]):
+        return node, True
+      return func.If(*[self.hoist(part, hoisted) for part in parts]), False
+    if isinstance(node, func.FuncCall):
+      args = node.args
+      if isinstance(args, func.ArgsList):
+        args = func.ArgsList([self.hoist(self.rewrite(arg, variant, hoisted), hoisted) for arg in args.args])
+      return func.FuncCall(node.name, args), False
+    if isinstance(node, func.ReturnTuple):
+      return func.ReturnTuple([self.hoist(self.rewrite(expr, variant, hoisted), hoisted)
+        if isinstance(expr, func.Node) else expr for expr in node.exprs]), False
+    if isinstance(node, func.Binding):
+      chain = []
+      while isinstance(node, func.Binding):
+        chain.append(node)
+        node = node.expr2
+      kept = []
+      for binding in chain:
+        expr1, invariant = self.rewrite(binding.expr1, variant, hoisted)
+        # The bindings hoisted out of an inner loop move on as they are.
+        if invariant and isinstance(binding.id, func.ID) and binding.id.name in self.hoisted:
+          hoisted.append((binding.id.name, expr1))
+        else:
+          kept.append((binding.id, self.hoist((expr1, invariant), hoisted)))
+      node = self.rewrite(node, variant, hoisted)[0]
+      for lhs, expr1 in reversed(kept):
+        node = func.Binding(lhs, expr1, node)
+      return node, False
+    if isinstance(node, func.ParallelBinding):
+      return func.ParallelBinding([func.Binding(binding.id,
+        self.hoist(self.rewrite(binding.expr1, variant, hoisted), hoisted), None) for binding in node.bindings],
+        self.rewrite(node.expr2, variant, hoisted)[0]), False
+    # Inner loops (already hoisted) and loop calls
+    return node, False
+
 
 class FunctionalVisitor(NodeVisitor):
+  # Collects the variables of a func_ast expression and substitutes the variables
+  # in replace. Substitution copies the nodes on the path to a replaced variable
+  # and shares everything else, the visited expression is left untouched.
   def __init__(self, node, replace=None):
     self.replace = replace
     self.var_set = set()
-    self.visit(node)
+    self.substitutions = 0
+    self.node = self.visit(node)
+
+  def substitute(self, node):
+    if not self.replace is None and isinstance(node, func.ID) and node.name in self.replace:
+      self.substitutions += 1
+      return func.Constant(self.replace[node.name])
+    return node
 
   def visit_BinaryOp(self, binaryop):
-    if not self.replace is None:
-      if isinstance(binaryop.left, func.ID) and binaryop.left.name in self.replace:
-        binaryop.left = func.Constant(self.replace[binaryop.left.name])
-      
-      if isinstance(binaryop.right, func.ID) and binaryop.right.name in self.replace:
-        binaryop.right = func.Constant(self.replace[binaryop.right.name])
+    left = self.visit(self.substitute(binaryop.left))
+    right = self.visit(self.substitute(binaryop.right))
+    if left is binaryop.left and right is binaryop.right:
+      return binaryop
+    return func.BinaryOp(binaryop.op, left, right)
 
-    self.generic_visit(binaryop)
-  
   def visit_ArrayRef(self, arrayref):
-    if not self.replace is None:
-      if isinstance(arrayref.subscript, func.ID) and arrayref.subscript.name in self.replace:
-        binaryop.subscript = func.Constant(self.replace[arrayref.subscript.name])
+    name = self.visit(arrayref.name)
+    subscript = self.visit(self.substitute(arrayref.subscript))
+    if name is arrayref.name and subscript is arrayref.subscript:
+      return arrayref
+    return func.ArrayRef(name, subscript)
 
-    self.generic_visit(arrayref)
-  
-  # def visit_FuncCall(self, func):
+  def visit_UnaryOp(self, unaryop):
+    expr = self.visit(unaryop.expr)
+    if expr is unaryop.expr:
+      return unaryop
+    return func.UnaryOp(unaryop.op, expr)
+
+  def visit_If(self, if_expr):
+    cond = self.visit(if_expr.cond)
+    iftrue = self.visit(if_expr.iftrue)
+    iffalse = self.visit(if_expr.iffalse)
+    if cond is if_expr.cond and iftrue is if_expr.iftrue and iffalse is if_expr.iffalse:
+      return if_expr
+    return func.If(cond, iftrue, iffalse)
+
+  def visit_FuncCall(self, funccall):
+    name = self.visit(funccall.name)
+    args = self.visit(funccall.args)
+    if name is funccall.name and args is funccall.args:
+      return funccall
+    return func.FuncCall(name, args)
+
+  def visit_ArgsList(self, args_list):
+    args = [self.visit(arg) for arg in args_list.args]
+    if all([new is old for new, old in zip(args, args_list.args)]):
+      return args_list
+    return func.ArgsList(args)
 
   def visit_ID(self, id):
     self.var_set.add(id.name)
-    
+    return id
+
+  def generic_visit(self, node):
+    NodeVisitor.generic_visit(self, node)
+    return node
+
+
+class TranslationOptions(object):
+  # The optional passes of FunctionalTranslator, all off (False) by default:
+  #
+  #   memo           translate repeated if statements and loops once (see
+  #                  TranslationMemo); True, or a TranslationMemo to share
+  #                  between translations
+  #   parallel       group independent bindings into let ... and ... (see
+  #                  parallel_bindings)
+  #   ssa            translate through the SSA form of the block (see ssa.py),
+  #                  which has no separate simplified translation
+  #   hoist          move the loop-invariant expressions out of the loops (see
+  #                  hoist_invariants)
+  #   minimal_loops  only pass the variables still needed through the
+  #                  recursive functions of loops (see loop_state)
+  #   closed_form    compute the result of induction loops over integers
+  #                  directly (see AST_C.induction_loop)
+  #   rewrite        rewrite the expressions with the algebraic rules of
+  #                  rewrite.py; True, or a rewrite.Rewriter for other rules
+  #   egraph         replace the expressions by the cheapest equivalent ones
+  #                  found by equality saturation (see egraph.py); True, a dict
+  #                  of EGraphOptimizer arguments (e.g. the limits) or an
+  #                  EGraphOptimizer
+  #   fused          translate a pycparser tree instead of its minic
+  #                  conversion (see fused.py)
+  NAMES = ("memo", "parallel", "ssa", "hoist", "minimal_loops", "closed_form", "rewrite", "egraph", "fused")
+
+  def __init__(self, **options):
+    unknown = sorted(set(options) - set(self.NAMES))
+    if unknown:
+      raise TypeError("unknown translation options: {}".format(", ".join(unknown)))
+    for name in self.NAMES:
+      setattr(self, name, options.get(name, False))
+
 
 class FunctionalTranslator:
-  def __init__(self, ast, simplify):
-    self.ast_c = AST_C(simplify)
-    self.ast_c.visit(ast)
-  
+  # Both the unsimplified and the simplified translation come from the same
+  # AST_C traversal and are cached once built. options is a
+  # TranslationOptions, or its options can be given as keywords (e.g.
+  # memo=True).
+  def __init__(self, ast, simplify=True, name="code_block", options=None, **keywords):
+    if options is None:
+      options = TranslationOptions(**keywords)
+    elif keywords:
+      raise TypeError("options given both as TranslationOptions and as keywords")
+    self.options = options
+    self.simplify = simplify
+    self.name = name
+    rewrite, egraph, memo = options.rewrite, options.egraph, options.memo
+    if rewrite is True:
+      from rewrite import Rewriter
+      rewrite = Rewriter()
+    self.rewriter = rewrite or None
+    if egraph is True or isinstance(egraph, dict):
+      from egraph import EGraphOptimizer
+      egraph = EGraphOptimizer(**(egraph if isinstance(egraph, dict) else {}))
+    self.egraph = egraph or None
+    self.parallel = options.parallel
+    self.hoist = options.hoist
+    if memo is True:
+      memo = TranslationMemo()
+    self.memo = memo or None
+    self.ssa = None
+    self.ast_c = None
+    self.stats = TranslationStats()
+    if options.ssa:
+      from ssa import SSA
+      self.ssa = SSA(ast)
+    elif options.fused:
+      from fused import FusedAST_C
+      self.ast_c = FusedAST_C(simplify, self.memo, None, None, self.stats)
+      self.ast_c.visit(ast)
+    else:
+      self.ast_c = AST_C(simplify, self.memo, loop_state(ast) if options.minimal_loops else None,
+        integer_variables(ast) if options.closed_form else None, self.stats)
+      self.ast_c.visit(ast)
+    self.translations = {}
+
+  def translate(self, simplify=None):
+    if simplify is None:
+      simplify = self.simplify
+    if not simplify in self.translations:
+      if self.ssa is not None:
+        translation = self.ssa.translate(self.name)
+      else:
+        translation = self.ast_c.transform(simplify, self.name)
+      if self.rewriter is not None:
+        translation = self.rewriter.rewrite(translation)
+      if self.egraph is not None:
+        translation = self.egraph.rewrite(translation)
+      if self.hoist:
+        translation = func.FuncDef(translation.input_args, translation.output_vars,
+          hoist_invariants(translation.body), translation.name)
+      if self.parallel:
+        translation = func.FuncDef(translation.input_args, translation.output_vars,
+          parallel_bindings(translation.body), translation.name)
+      self.translations[simplify] = translation
+    return self.translations[simplify]
+
+  def statistics(self):
+    """ The TranslationStats of the block, with the sizes of both
+        translations (built if they are not yet) and the loops of the
+        translation in the default mode.
+    """
+    before, after = self.translate(False), self.translate(True)
+    self.stats.nodes_before = tree_size(before.body)[0]
+    self.stats.nodes_after = tree_size(after.body)[0]
+    self.stats.size_before = len(str(before))
+    self.stats.size_after = len(str(after))
+    self.stats.loops = tree_size(self.translate().body)[1]
+    return self.stats
+
   def __str__(self):
-    return str(self.ast_c.transform())
\ No newline at end of file
+    return str(self.translate())
@@ -0,0 +1,192 @@
+import os
+import re
+
+from pycparser import c_ast, c_parser
+from minic.c_ast_to_minic import transform
+from transform_func import FunctionalTranslator
+from func_utils import describe_error
+from preprocess import Preprocessor, parse_file
+
+# Translates every function of a whole C file (translation unit) into its own
+# functional definition. Each function is converted to minic and translated
+# independently, so the functions are spread over a pool of worker processes
+# and the results are merged back in source order.
+
+
+# Only the function definitions are converted to minic. Top-level declarations,
+# typedefs and structs are skipped since the translator does not use them.
+def function_defs(ast):
+  return [ext for ext in ast.ext if isinstance(ext, c_ast.FuncDef)]
+
+
+# Returns (function name, translation, error). An unsupported construct in one
+# function is reported as its error and does not stop the other functions.
+def translate_function(funcdef, simplify=True):
+  name = funcdef.decl.name
+  try:
+    mfuncdef = transform(funcdef)
+    ftranslator = FunctionalTranslator(mfuncdef.body, simplify, name)
+    return (name, str(ftranslator), None)
+  except Exception as e:
+    return (name, None, describe_error(e))
+
+
+def _translate_job(job):
+  return translate_function(*job)
+
+
+def translate_functions(funcdefs, simplify=True, workers=None):
+  jobs = [(funcdef, simplify) for funcdef in funcdefs]
+  if workers is None:
+    workers = os.cpu_count() or 1
+  workers = min(workers, len(jobs))
+  if workers <= 1:
+    return [_translate_job(job) for job in jobs]
+  # Imported here so that sequential translations do not load multiprocessing.
+  from multiprocessing import Pool
+  with Pool(workers) as pool:
+    # map keeps the results in the order of the jobs, i.e. in source order.
+    return pool.map(_translate_job, jobs)
+
+
+def translate_unit(filepath, simplify=True, workers=None):
+  return translate_functions(function_defs(parse_file(filepath)), simplify, workers)
+
+
+def print_unit(filepath, simplify=True, workers=None):
+  print_results(filepath, translate_unit(filepath, simplify, workers))
+
+
+# Streaming mode. Instead of parsing the whole file, the source is split at
+# top-level function boundaries while it is read, and each function goes
+# through parse -> minic -> AST_C -> emit on its own. Only the text of the
+# current function and the typedefs seen so far (which pycparser needs to
+# parse the functions that use them) are kept, so peak memory is bounded by
+# the largest function rather than the size of the file.
+
+# Characters that can change the state of the splitter.
+_SPECIAL = re.compile(r'[{};"\'/]')
+_COMMENT = re.compile(r'/\*.*?\*/|//[^\n]*', re.S)
+_TYPEDEF = re.compile(r'\btypedef\b')
+_FUNCTION_NAME = re.compile(r'(\w+)\s*\(')
+
+_CODE, _LINE_COMMENT, _BLOCK_COMMENT, _STRING, _CHAR = range(5)
+
+
+# A top-level braced segment is a function definition when its header (the
+# text before the opening brace) ends with the parameter list. Struct, union
+# and enum definitions and initializers end with a name or '=' instead.
+def _is_function(header):
+  return _COMMENT.sub('', header).rstrip().endswith(')')
+
+
+# Splits the lines of a translation unit into top-level segments and yields
+# (is_function, text) for each of them. Declarations end with a ';' at depth
+# 0, function definitions with the '}' closing their body. Preprocessor lines
+# at depth 0 are yielded as declarations of their own.
+def split_unit(lines):
+  state = _CODE
+  depth = 0
+  segment = []
+  header = None
+  for line in lines:
+    if state == _CODE and depth == 0 and line.lstrip().startswith('#'):
+      yield (False, line)
+      continue
+    start = 0
+    i = 0
+    while i < len(line):
+      if state == _BLOCK_COMMENT:
+        end = line.find('*/', i)
+        if end < 0:
+          break
+        state = _CODE
+        i = end + 2
+        continue
+      if state == _STRING or state == _CHAR:
+        quote = '"' if state == _STRING else "'"
+        while i < len(line) and line[i] != quote:
+          i += 2 if line[i] == '\\' else 1
+        if i < len(line):
+          state = _CODE
+        i += 1
+        continue
+
+      match = _SPECIAL.search(line, i)
+      if match is None:
+        break
+      i = match.start()
+      c = line[i]
+      if c == '/':
+        if line.startswith('//', i):
+          state = _LINE_COMMENT
+          break
+        if line.startswith('/*', i):
+          state = _BLOCK_COMMENT
+          i += 2
+          continue
+      elif c == '"':
+        state = _STRING
+      elif c == "'":
+        state = _CHAR
+      elif c == '{':
+        if depth == 0:
+          header = ''.join(segment) + line[start:i]
+        depth += 1
+      elif c == '}':
+        depth -= 1
+        if depth == 0 and _is_function(header):
+          segment.append(line[start:i + 1])
+          yield (True, ''.join(segment))
+          segment = []
+          start = i + 1
+      elif c == ';' and depth == 0:
+        segment.append(line[start:i + 1])
+        yield (False, ''.join(segment))
+        segment = []
+        start = i + 1
+      i += 1
+
+    segment.append(line[start:])
+    if state == _LINE_COMMENT:
+      state = _CODE
+  if ''.join(segment).strip():
+    yield (False, ''.join(segment))
+
+
+def _function_name(text):
+  match = _FUNCTION_NAME.search(_COMMENT.sub('', text))
+  return match.group(1) if match else None
+
+
+def stream_unit(filepath, simplify=True):
+  parser = c_parser.CParser()
+  prelude = ""
+  with open(filepath, 'r') as fin:
+    for is_function, text in split_unit(Preprocessor().lines(fin, filepath)):
+      if not is_function:
+        if _TYPEDEF.search(text):
+          prelude += text
+        continue
+      try:
+        ast = parser.parse(prelude + text, filepath)
+      except Exception as e:
+        yield (_function_name(text), None, describe_error(e))
+        continue
+      result = translate_function(ast.ext[-1], simplify)
+      # Free the trees of this function before the next one is parsed.
+      del ast
+      yield result
+
+
+def print_results(filepath, results):
+  print("File: {}".format(filepath))
+  for name, translation, error in results:
+    if error is None:
+      print("{}\n----------".format(translation))
+    else:
+      print("Function: {}\nError: {}\n----------".format(name, error))
+
+
+def print_stream(filepath, simplify=True):
+  print_results(filepath, stream_unit(filepath, simplify))
@@ -0,0 +1,126 @@
+import sys
+import time
+
+# Call counts and timings of the visitor methods and of the c_ast_to_minic
+# handlers.
+#
+#   with VisitProfile() as profile:
+#     translate_block(source)
+#   print(profile.table())
+#   profile.write_stacks("stacks.txt")    # for flamegraph.pl, speedscope, ...
+#
+# While a profile runs, NodeVisitor.visit (of minic_ast and func_ast) and
+# c_ast_to_minic.transform are replaced by versions that time each call
+# before dispatching it as usual; the handler is named after the method it
+# dispatches to (e.g. AST_C.visit_Assignment, FunctionalVisitor.generic_visit)
+# or the pycparser node class (e.g. c_ast_to_minic.For). The originals are put
+# back when it stops, so nothing is measured or slowed down otherwise.
+#
+# For each handler the table has the number of calls, the cumulative time
+# (spent in the handler and everything it calls, counted once for recursive
+# calls) and the self time (without the handlers it calls). The collapsed
+# stacks have the self time in microseconds of each chain of handlers.
+
+# The running profile
+_active = None
+
+
+def _visit(self, node):
+  visitor = getattr(self, 'visit_' + node.__class__.__name__, self.generic_visit)
+  return _active.call(visitor.__qualname__, visitor, node)
+
+
+def _transform(x):
+  if not x.__class__.__module__.endswith('c_ast'):
+    return _active.transform(x)
+  return _active.call('c_ast_to_minic.' + x.__class__.__name__, _active.transform, x)
+
+
+class VisitProfile(object):
+  def __init__(self):
+    # handler -> [calls, cumulative seconds, self seconds]
+    self.stats = {}
+    # (handler, ...) -> self seconds
+    self.stacks = {}
+    self.frames = []
+    # Time spent in the handlers called by each frame
+    self.child_times = []
+    # handler -> number of its calls running
+    self.running = {}
+    self.patches = []
+    self.transform = None
+
+  def call(self, key, function, node):
+    self.frames.append(key)
+    self.child_times.append(0.0)
+    self.running[key] = self.running.get(key, 0) + 1
+    start = time.perf_counter()
+    try:
+      return function(node)
+    finally:
+      elapsed = time.perf_counter() - start
+      own = elapsed - self.child_times.pop()
+      path = tuple(self.frames)
+      self.frames.pop()
+      self.running[key] -= 1
+      if self.child_times:
+        self.child_times[-1] += elapsed
+      stat = self.stats.get(key)
+      if stat is None:
+        stat = self.stats[key] = [0, 0.0, 0.0]
+      stat[0] += 1
+      if not self.running[key]:
+        stat[1] += elapsed
+      stat[2] += own
+      self.stacks[path] = self.stacks.get(path, 0.0) + own
+
+  def patch(self, owner, name, replacement):
+    self.patches.append((owner, name, getattr(owner, name)))
+    setattr(owner, name, replacement)
+
+  def start(self):
+    global _active
+    if _active is not None:
+      raise RuntimeError("a visitor profile is already running")
+    import func_ast
+    from minic import c_ast_to_minic, minic_ast
+    _active = self
+    self.patch(minic_ast.NodeVisitor, 'visit', _visit)
+    self.patch(func_ast.NodeVisitor, 'visit', _visit)
+    # Also where transform was imported (e.g. pipeline), for the outermost call.
+    self.transform = c_ast_to_minic.transform
+    for module in list(sys.modules.values()):
+      if getattr(module, 'transform', None) is self.transform:
+        self.patch(module, 'transform', _transform)
+    return self
+
+  def stop(self):
+    global _active
+    while self.patches:
+      owner, name, original = self.patches.pop()
+      setattr(owner, name, original)
+    _active = None
+
+  def __enter__(self):
+    return self.start()
+
+  def __exit__(self, *exc_info):
+    self.stop()
+
+  def table(self, limit=None):
+    """ The handlers by decreasing self time, as a text table. """
+    rows = sorted(self.stats.items(), key=lambda item: (-item[1][2], item[0]))
+    lines = ["{:>10} {:>12} {:>12}  {}".format("calls", "cumulative", "self", "handler")]
+    for key, (calls, cumulative, own) in rows[:limit]:
+      lines.append("{:>10} {:>12.6f} {:>12.6f}  {}".format(calls, cumulative, own, key))
+    return '\n'.join(lines)
+
+  def collapsed_stacks(self):
+    """ Lines 'handler;handler;... microseconds' in the collapsed stack format. """
+    return ["{} {}".format(';'.join(path), int(round(own * 1e6)))
+      for path, own in sorted(self.stacks.items())]
+
+  def write_stacks(self, filepath):
+    with open(filepath, 'w') as fout:
+      for line in self.collapsed_stacks():
+        fout.write(line + '\n')